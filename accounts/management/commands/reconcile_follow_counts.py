@@ -0,0 +1,35 @@
+# accounts/management/commands/reconcile_follow_counts.py
+from django.core.management.base import BaseCommand
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from accounts.models import Follow, User
+
+
+def _count_of(field):
+    counts = (
+        Follow.objects.filter(**{field: OuterRef('pk')})
+        .order_by().values(field).annotate(total=Count('id')).values('total')
+    )
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+class Command(BaseCommand):
+    help = 'Recompute User.follower_total/following_total from Follow rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only report users whose counters drifted')
+
+    def handle(self, *args, **options):
+        drifted = (
+            User.objects.annotate(actual_followers=_count_of('following'), actual_following=_count_of('follower'))
+            .exclude(follower_total=F('actual_followers'), following_total=F('actual_following'))
+            .values_list('pk', 'actual_followers', 'actual_following')
+        )
+        fixed = 0
+        for pk, followers, following in drifted.iterator():
+            if not options['dry_run']:
+                User.objects.filter(pk=pk).update(follower_total=followers, following_total=following)
+            fixed += 1
+        verb = 'would be repaired' if options['dry_run'] else 'repaired'
+        self.stdout.write(self.style.SUCCESS(f'{fixed} user counters {verb}.'))
@@ -0,0 +1,129 @@
+# accounts/middleware.py
+import threading
+import time
+from collections import OrderedDict
+
+from channels.db import database_sync_to_async
+from channels.middleware import BaseMiddleware
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken, TokenError
+
+from .models import User
+
+# Fields served from the cached snapshot. Anything else (credits, wallet
+# balance, ...) is deferred, and the first access to any of them loads the
+# rest of the row in one query (User.refresh_from_db), so money-like fields
+# are never stale. Kept in model field order, which Model.from_db() relies on.
+USER_SNAPSHOT_FIELDS = tuple(
+    field.attname for field in User._meta.concrete_fields
+    if field.attname in {
+        'id', 'username', 'email', 'first_name', 'last_name', 'role',
+        'is_active', 'is_staff', 'is_superuser', 'profile_picture',
+    }
+)
+CLAIMS_CACHE_SIZE = 10000
+
+_claims = OrderedDict()
+_claims_lock = threading.Lock()
+
+
+def user_cache_key(user_id):
+    return f'jwt_user:{user_id}'
+
+
+def forget_token_users(user_ids):
+    """Drop the cached snapshots of ``user_ids``, for queryset updates that bypass post_save."""
+    cache.delete_many([user_cache_key(user_id) for user_id in user_ids])
+
+
+def decode_access_token(token):
+    """Validated access token claims, memoized per process until the token expires."""
+    with _claims_lock:
+        claims = _claims.get(token)
+    if claims is not None and claims['exp'] > time.time():
+        return claims
+    claims = dict(AccessToken(token).payload)  # raises TokenError
+    with _claims_lock:
+        _claims[token] = claims
+        if len(_claims) > CLAIMS_CACHE_SIZE:
+            _claims.popitem(last=False)
+    return claims
+
+
+def get_token_user(user_id):
+    """
+    A User built from a short-lived cached snapshot instead of a row fetch.
+    Fields outside USER_SNAPSHOT_FIELDS load together on first access. The
+    snapshot is dropped when the user is saved (including deactivation) or
+    deleted.
+    """
+    key = user_cache_key(user_id)
+    values = cache.get(key)
+    if values is None:
+        values = User.objects.filter(pk=user_id, is_active=True).values_list(*USER_SNAPSHOT_FIELDS).first()
+        if values is None:
+            return None
+        cache.set(key, values, getattr(settings, 'JWT_USER_CACHE_TTL', 60))
+    user = User.from_db(DEFAULT_DB_ALIAS, USER_SNAPSHOT_FIELDS, values)
+    user._from_snapshot = True
+    return user
+
+
+def authenticate_cookies(cookies):
+    """
+    Return ``(user, new_access_token)`` for the JWT cookies, or ``(None, None)``.
+    An expired access token is replaced from the refresh token without
+    touching the session table.
+    """
+    token = cookies.get('access_token')
+    if token:
+        try:
+            return get_token_user(decode_access_token(token)['user_id']), None
+        except TokenError:
+            pass
+    refresh_token = cookies.get('refresh_token')
+    if refresh_token:
+        try:
+            refresh = RefreshToken(refresh_token)
+            user = get_token_user(refresh['user_id'])
+            if user is not None:
+                return user, str(refresh.access_token)
+        except TokenError:
+            pass
+    return None, None
+
+
+class JWTAuthenticationMiddleware:
+    # Goes after django.contrib.auth's AuthenticationMiddleware; a session login still wins.
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        new_access = None
+        if not request.user.is_authenticated:
+            user, new_access = authenticate_cookies(request.COOKIES)
+            if user is not None:
+                request.user = user
+        response = self.get_response(request)
+        if new_access:
+            response.set_cookie(
+                key='access_token',
+                value=new_access,
+                httponly=True,
+                secure=not settings.DEBUG,
+                samesite='Strict'
+            )
+        return response
+
+
+class JWTWebsocketMiddleware(BaseMiddleware):
+    # Same cookie auth for websockets; wrap it inside AuthMiddlewareStack.
+    async def __call__(self, scope, receive, send):
+        user = scope.get('user')
+        if user is None or not user.is_authenticated:
+            token_user, _ = await database_sync_to_async(authenticate_cookies)(scope.get('cookies', {}))
+            if token_user is not None:
+                scope = dict(scope, user=token_user)
+        return await super().__call__(scope, receive, send)
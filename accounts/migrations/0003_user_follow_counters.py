@@ -0,0 +1,34 @@
+# Generated by Django 4.2 on 2026-10-18 21:42
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_follow_counts(apps, schema_editor):
+    User = apps.get_model('accounts', 'User')
+    Follow = apps.get_model('accounts', 'Follow')
+    for user_id, total in Follow.objects.order_by().values_list('following_id').annotate(total=Count('id')):
+        User.objects.filter(pk=user_id).update(follower_total=total)
+    for user_id, total in Follow.objects.order_by().values_list('follower_id').annotate(total=Count('id')):
+        User.objects.filter(pk=user_id).update(following_total=total)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_alter_user_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='follower_total',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='following_total',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_follow_counts, migrations.RunPython.noop),
+    ]
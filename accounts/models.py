@@ -1,8 +1,13 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
-from django.db.models.signals import post_save
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
+# Denormalized counters on User, written only with F() updates.
+COUNTER_FIELDS = ('follower_total', 'following_total', 'unread_notifications')
+
+
 class User(AbstractUser):
     ROLE_CHOICES = (
         ('user', 'User'),
@@ -19,6 +24,11 @@ class User(AbstractUser):
     credits = models.PositiveIntegerField(default=0)
     wallet_balance = models.DecimalField(max_digits=8, decimal_places=2, default=0.00)
     followers = models.ManyToManyField('self', through='Follow', related_name='following', symmetrical=False)
+    # Maintained by the Follow signals below; `manage.py reconcile_follow_counts` repairs drift.
+    follower_total = models.PositiveIntegerField(default=0, editable=False)
+    following_total = models.PositiveIntegerField(default=0, editable=False)
+    # Maintained by notifications/unread.py.
+    unread_notifications = models.PositiveIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -35,11 +45,29 @@ class User(AbstractUser):
     def is_admin_user(self):
         return self.is_superuser or self.role == 'admin'
 
+    def save(self, *args, **kwargs):
+        # The counters are only ever changed by F() updates, so a full save of
+        # a stale instance (profile form, admin, checkout) must not write them back.
+        if kwargs.get('update_fields') is None and not args and not self._state.adding:
+            skipped = set(COUNTER_FIELDS) | self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.attname for field in self._meta.concrete_fields
+                if not field.primary_key and field.attname not in skipped
+            ]
+        super().save(*args, **kwargs)
+
+    def refresh_from_db(self, using=None, fields=None):
+        # A user built from the JWT snapshot (accounts/middleware.py) loads all
+        # of its deferred fields on the first such access, not one query each.
+        if fields is not None and self.__dict__.pop('_from_snapshot', False):
+            fields = set(fields) | self.get_deferred_fields()
+        super().refresh_from_db(using, fields)
+
     def follower_count(self):
-        return self.followers.count()
+        return self.follower_total
 
     def following_count(self):
-        return self.following.count()
+        return self.following_total
 
 class Follow(models.Model):
     follower = models.ForeignKey(User, on_delete=models.CASCADE, related_name='following_set')
@@ -53,13 +81,37 @@ class Follow(models.Model):
             models.Index(fields=['created_at']),
         ]
 
-# Signal for follow notification (integrates with social app)
+# Follow rows must go through Follow.objects (not user.following.add/remove),
+# which bypasses these signals.
 @receiver(post_save, sender='accounts.Follow')
-def notify_follow(sender, instance, created, **kwargs):
+def increment_follow_counts(sender, instance, created, **kwargs):
     if created:
-        from social.models import Notification
-        Notification.objects.create(
-            recipient=instance.following,
-            sender=instance.follower,
-            type='follow'
-        )
\ No newline at end of file
+        User.objects.filter(pk=instance.following_id).update(follower_total=F('follower_total') + 1)
+        User.objects.filter(pk=instance.follower_id).update(following_total=F('following_total') + 1)
+
+@receiver(post_delete, sender='accounts.Follow')
+def decrement_follow_counts(sender, instance, **kwargs):
+    User.objects.filter(pk=instance.following_id, follower_total__gt=0).update(follower_total=F('follower_total') - 1)
+    User.objects.filter(pk=instance.follower_id, following_total__gt=0).update(following_total=F('following_total') - 1)
+
+@receiver(post_save, sender='accounts.Follow')
+@receiver(post_delete, sender='accounts.Follow')
+def drop_follow_profiles(sender, instance, **kwargs):
+    from django.db import transaction
+    from .profiles import invalidate_public
+    for user_id in (instance.follower_id, instance.following_id):
+        transaction.on_commit(lambda user_id=user_id: invalidate_public(user_id))
+
+@receiver(post_save, sender='social.Post')
+@receiver(post_delete, sender='social.Post')
+def drop_post_author_profile(sender, instance, **kwargs):
+    from django.db import transaction
+    from .profiles import invalidate_public
+    transaction.on_commit(lambda: invalidate_public(instance.user_id))
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def drop_token_user_snapshot(sender, instance, **kwargs):
+    from django.core.cache import cache
+    from .middleware import user_cache_key
+    cache.delete(user_cache_key(instance.pk))
@@ -0,0 +1,85 @@
+# accounts/profiles.py
+# Data loader for the profile page. The public part (recent posts and the
+# follow counters) is the same for every visitor, so it is cached per user and
+# dropped by the Post/Follow signals in accounts/models.py. The owner-only
+# part is loaded fresh with a fixed number of queries.
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db.models import Count, Q
+
+from ecommerce.models import Order, PurchaseRequest
+from notifications.models import Notification
+from social.models import Post
+
+from .models import User
+
+PROFILE_POST_LIMIT = 60
+FOLLOW_PAGE_SIZE = 10
+
+
+def public_cache_key(user_id):
+    return f'profile_public:{user_id}'
+
+
+def invalidate_public(user_id):
+    cache.delete(public_cache_key(user_id))
+
+
+def public_profile(user):
+    key = public_cache_key(user.pk)
+    data = cache.get(key)
+    if data is None:
+        counts = (
+            User.objects.filter(pk=user.pk)
+            .annotate(post_count=Count('posts'))
+            .values('post_count', 'follower_total', 'following_total')
+            .get()
+        )
+        data = {
+            'posts': list(
+                Post.objects.filter(user=user).only('id', 'user_id', 'content', 'image', 'created_at')[:PROFILE_POST_LIMIT]
+            ),
+            'post_count': counts['post_count'],
+            'follower_count': counts['follower_total'],
+            'following_count': counts['following_total'],
+        }
+        cache.set(key, data, getattr(settings, 'PROFILE_CACHE_TTL', 300))
+    return data
+
+
+def purchase_stats(user):
+    return PurchaseRequest.objects.filter(user=user).aggregate(
+        total_purchases=Count('pk', filter=Q(status='paid')),
+        pending_purchases=Count('pk', filter=Q(status='pending')),
+    )
+
+
+def _page(queryset, total, number):
+    paginator = Paginator(queryset, FOLLOW_PAGE_SIZE)
+    paginator.count = total  # from the counter columns instead of a COUNT(*)
+    return paginator.get_page(number)
+
+
+def follow_pages(user, public, params):
+    # Spelled out through Follow: on this self-referential M2M, user.followers
+    # resolves to the accounts the user follows.
+    users = User.objects.order_by('id')
+    followers = users.filter(following_set__following=user)
+    following = users.filter(follower_set__follower=user)
+    return (
+        _page(followers, public['follower_count'], params.get('followers_page')),
+        _page(following, public['following_count'], params.get('following_page')),
+    )
+
+
+def private_profile(user):
+    return {
+        'purchases': list(
+            PurchaseRequest.objects.filter(user=user).select_related('content_type')
+            .prefetch_related('item').order_by('-created_at')[:10]
+        ),
+        'orders': Order.objects.filter(user=user).prefetch_related('items').order_by('-created_at')[:10],
+        'notifications': list(Notification.objects.filter(recipient=user).select_related('sender')[:10]),
+        'stats': purchase_stats(user),
+    }
@@ -1,3 +1,134 @@
-from django.test import TestCase
+from io import StringIO
 
-# Create your tests here.
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from core.testing import LocalServicesTestCase
+
+from social.models import Post
+
+from .forms import ProfileForm
+from .middleware import authenticate_cookies, get_token_user
+from .models import Follow, User
+
+
+def token_cookies(user):
+    refresh = RefreshToken.for_user(user)
+    return {'access_token': str(refresh.access_token), 'refresh_token': str(refresh)}
+
+
+class TokenUserTests(LocalServicesTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('reader', password='pw', credits=7)
+
+    def test_access_cookie_authenticates_from_the_snapshot(self):
+        cookies = token_cookies(self.user)
+        authenticate_cookies(cookies)
+        with self.assertNumQueries(0):
+            user, new_access = authenticate_cookies(cookies)
+        self.assertEqual((user.pk, user.username, new_access), (self.user.pk, 'reader', None))
+
+    def test_refresh_cookie_issues_a_new_access_token(self):
+        user, new_access = authenticate_cookies({'refresh_token': token_cookies(self.user)['refresh_token']})
+        self.assertEqual(user.pk, self.user.pk)
+        self.assertIsNotNone(new_access)
+
+    def test_deferred_fields_load_in_one_query(self):
+        user = get_token_user(self.user.pk)
+        with self.assertNumQueries(1):
+            self.assertEqual((user.credits, user.college), (7, ''))
+
+    def test_saving_a_deactivation_drops_the_snapshot(self):
+        cookies = token_cookies(self.user)
+        authenticate_cookies(cookies)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(authenticate_cookies(cookies), (None, None))
+
+    def test_requests_with_token_cookies_skip_the_session(self):
+        for name, value in token_cookies(self.user).items():
+            self.client.cookies[name] = value
+        response = self.client.get('/')
+        self.assertEqual(response.wsgi_request.user.pk, self.user.pk)
+        self.assertNotIn('sessionid', response.cookies)
+
+
+class FollowCounterTests(LocalServicesTestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice = User.objects.create_user('alice', password='pw')
+        self.bob = User.objects.create_user('bob', password='pw')
+
+    def totals(self, user):
+        user = User.objects.get(pk=user.pk)
+        return user.follower_total, user.following_total
+
+    def test_following_and_unfollowing_move_both_counters(self):
+        follow = Follow.objects.create(follower=self.alice, following=self.bob)
+        self.assertEqual((self.totals(self.alice), self.totals(self.bob)), ((0, 1), (1, 0)))
+        follow.delete()
+        self.assertEqual((self.totals(self.alice), self.totals(self.bob)), ((0, 0), (0, 0)))
+
+    def test_counters_survive_a_full_save_of_a_stale_user(self):
+        stale = User.objects.get(pk=self.bob.pk)
+        Follow.objects.create(follower=self.alice, following=self.bob)
+        User.objects.filter(pk=self.bob.pk).update(unread_notifications=3)
+        stale.bio = 'Hello'
+        stale.save()
+        bob = User.objects.get(pk=self.bob.pk)
+        self.assertEqual((bob.bio, bob.follower_total, bob.unread_notifications), ('Hello', 1, 3))
+
+    def test_counters_survive_the_profile_form(self):
+        stale = User.objects.get(pk=self.bob.pk)
+        Follow.objects.create(follower=self.alice, following=self.bob)
+        form = ProfileForm({'email': 'bob@example.com', 'first_name': 'Bob'}, instance=stale)
+        self.assertTrue(form.is_valid(), form.errors)
+        form.save()
+        self.assertEqual(self.totals(self.bob), (1, 0))
+
+    def test_reconcile_repairs_drift(self):
+        Follow.objects.create(follower=self.alice, following=self.bob)
+        User.objects.filter(pk=self.bob.pk).update(follower_total=5)
+        call_command('reconcile_follow_counts', stdout=StringIO())
+        self.assertEqual(self.totals(self.bob), (1, 0))
+
+
+class ProfilePageTests(LocalServicesTestCase):
+    def setUp(self):
+        super().setUp()
+        self.owner = User.objects.create_user('owner', password='pw')
+        self.client.force_login(self.owner)
+
+    def add_activity(self, count):
+        with self.captureOnCommitCallbacks(execute=True):
+            for n in range(count):
+                Post.objects.create(user=self.owner, content=f'post {n}')
+                fan = User.objects.create_user(f'fan{count}_{n}', password='pw')
+                Follow.objects.create(follower=fan, following=self.owner)
+
+    def queries_for_profile(self):
+        self.client.get(reverse('accounts:profile'))  # warm the session and the public cache
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('accounts:profile'))
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries)
+
+    def test_query_count_does_not_grow_with_activity(self):
+        self.add_activity(1)
+        _, few = self.queries_for_profile()
+        self.add_activity(5)
+        response, many = self.queries_for_profile()
+        self.assertEqual(few, many)
+        self.assertEqual(response.context['stats']['post_count'], 6)
+        self.assertEqual(response.context['stats']['follower_count'], 6)
+
+    def test_new_followers_show_up_after_commit(self):
+        self.queries_for_profile()
+        with self.captureOnCommitCallbacks(execute=True):
+            Follow.objects.create(follower=User.objects.create_user('late', password='pw'), following=self.owner)
+        response = self.client.get(reverse('accounts:profile', args=['owner']))
+        self.assertEqual(response.context['stats']['follower_count'], 1)
@@ -1,19 +1,18 @@
+from functools import wraps
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth import authenticate, login, logout
 from django.contrib import messages
 from django.http import HttpResponse, JsonResponse
 from django.conf import settings
-from django.core.paginator import Paginator
 from django.views.decorators.http import require_POST
+from django.db import transaction
 from django.db.models import Exists, OuterRef
-from rest_framework_simplejwt.tokens import RefreshToken, AccessToken, TokenError
+from rest_framework_simplejwt.tokens import RefreshToken
 from django_ratelimit.decorators import ratelimit
 
+from . import profiles
 from .models import User, Follow
 from .forms import SignUpForm, LoginForm, ProfileForm
-from ecommerce.models import PurchaseRequest, Order
-from social.models import Post
-from notifications.models import Notification
 
 
 def get_tokens_for_user(user):
@@ -27,37 +26,12 @@ def is_staff(user):
     return user.is_staff
 
 def jwt_auth(view_func):
+    # JWT cookies are resolved by accounts.middleware.JWTAuthenticationMiddleware,
+    # which also refreshes an expired access token on the response.
+    @wraps(view_func)
     def wrapper(request, *args, **kwargs):
         if request.user.is_authenticated:
             return view_func(request, *args, **kwargs)
-        token = request.COOKIES.get('access_token')
-        if token:
-            try:
-                validated_token = AccessToken(token)
-                user_id = validated_token['user_id']
-                request.user = User.objects.get(id=user_id)
-                login(request, request.user)
-                return view_func(request, *args, **kwargs)
-            except TokenError:
-                refresh_token = request.COOKIES.get('refresh_token')
-                if refresh_token:
-                    try:
-                        refresh = RefreshToken(refresh_token)
-                        new_access = str(refresh.access_token)
-                        request.user = User.objects.get(id=refresh['user_id'])
-                        login(request, request.user)
-                        response = view_func(request, *args, **kwargs)
-                        response.set_cookie(
-                            key='access_token',
-                            value=new_access,
-                            httponly=True,
-                            secure=not settings.DEBUG,
-                            samesite='Strict'
-                        )
-                        return response
-                    except TokenError:
-                        return redirect('accounts:login')
-                return redirect('accounts:login')
         return redirect('accounts:login')
 
     return wrapper
@@ -111,42 +85,37 @@ def login_view(request):
 def profile(request, username=None):
     if username:
         user = get_object_or_404(User, username=username)
-        is_own_profile = False
+        is_own_profile = user == request.user
     else:
         user = request.user
         is_own_profile = True
+        if user.get_deferred_fields():
+            # The JWT snapshot user would load each deferred field with its own query.
+            user = User.objects.get(pk=user.pk)
 
-    posts = Post.objects.filter(user=user).select_related('user').prefetch_related('comments')
-    purchases = PurchaseRequest.objects.filter(user=user).select_related('content_type')[:10] if is_own_profile else []
-    orders = Order.objects.filter(user=user).prefetch_related('items')[:10] if is_own_profile else []
-    notifications = Notification.objects.filter(recipient=user)[:10] if is_own_profile else []
-
-    followers = request.user.followers.all().order_by('id')
-    following = request.user.following.all().order_by('id')
-
-    followers_paginator = Paginator(followers, 10)
-    following_paginator = Paginator(following, 10)
-    followers_page = followers_paginator.get_page(request.GET.get('followers_page'))
-    following_page = following_paginator.get_page(request.GET.get('following_page'))
-
-    is_following = request.user.following.filter(pk=user.pk).exists() if request.user != user else False
+    public = profiles.public_profile(user)
+    followers_page, following_page = profiles.follow_pages(user, public, request.GET)
+    private = profiles.private_profile(user) if is_own_profile else {'stats': {}}
+    is_following = (
+        not is_own_profile and Follow.objects.filter(follower=request.user, following=user).exists()
+    )
 
     context = {
         'profile_user': user,
-        'posts': posts,
-        'purchases': purchases,
-        'orders': orders,
-        'notifications': notifications,
+        'posts': public['posts'],
+        'purchases': private.get('purchases', []),
+        'orders': private.get('orders', []),
+        'notifications': private.get('notifications', []),
         'followers_page': followers_page,
         'following_page': following_page,
         'is_following': is_following,
         'is_own_profile': is_own_profile,
         'form': ProfileForm(instance=user) if is_own_profile else None,
         'stats': {
-            'total_purchases': PurchaseRequest.objects.filter(user=user, status='paid').count(),
-            'pending_purchases': PurchaseRequest.objects.filter(user=user, status='pending').count(),
-            'follower_count': user.follower_count(),
-            'following_count': user.following_count(),
+            'post_count': public['post_count'],
+            'follower_count': public['follower_count'],
+            'following_count': public['following_count'],
+            **private['stats'],
         }
     }
     return render(request, 'accounts/profile.html', context)
@@ -179,14 +148,19 @@ def follow_user(request, username):
     user_to_follow = get_object_or_404(User, username=username)
     if user_to_follow == request.user:
         return JsonResponse({'error': 'Cannot follow yourself'}, status=400)
-    if request.user.following.filter(pk=user_to_follow.pk).exists():
-        request.user.following.remove(user_to_follow)
-        following = False
-        messages.success(request, f'You unfollowed @{user_to_follow.username}')
-    else:
-        request.user.following.add(user_to_follow)
-        following = True
+    # Follow.objects rather than the M2M manager so the counter signals fire.
+    with transaction.atomic():
+        deleted, _ = Follow.objects.filter(follower=request.user, following=user_to_follow).delete()
+        if deleted:
+            following = False
+        else:
+            Follow.objects.get_or_create(follower=request.user, following=user_to_follow)
+            following = True
+    if following:
         messages.success(request, f'You followed @{user_to_follow.username}')
+    else:
+        messages.success(request, f'You unfollowed @{user_to_follow.username}')
+    user_to_follow.refresh_from_db(fields=['follower_total'])
     return JsonResponse({
         'following': following,
         'followers_count': user_to_follow.follower_count()
@@ -1,3 +1,35 @@
-from django.test import TestCase
+from django.urls import reverse
 
-# Create your tests here.
+from accounts.middleware import authenticate_cookies
+from accounts.models import User
+from accounts.tests import token_cookies
+from core.testing import LocalServicesTestCase
+
+
+class BulkUserActionTests(LocalServicesTestCase):
+    def setUp(self):
+        super().setUp()
+        self.staff = User.objects.create_user('staff', password='pw', is_staff=True)
+        self.users = [User.objects.create_user(f'user{n}', password='pw') for n in range(2)]
+        self.client.force_login(self.staff)
+
+    def bulk(self, action):
+        return self.client.post(reverse('adminapp:dashboard'), {
+            'bulk_action': '1', 'action': action, 'selected_users': [user.pk for user in self.users],
+        })
+
+    def test_bulk_deactivation_logs_token_users_out(self):
+        cookies = [token_cookies(user) for user in self.users]
+        for jar in cookies:
+            self.assertIsNotNone(authenticate_cookies(jar)[0])  # snapshots now cached
+
+        self.assertRedirects(self.bulk('deactivate'), reverse('adminapp:dashboard'), fetch_redirect_response=False)
+        self.assertFalse(User.objects.filter(pk__in=[user.pk for user in self.users], is_active=True).exists())
+        for jar in cookies:
+            self.assertEqual(authenticate_cookies(jar), (None, None))
+
+    def test_bulk_staff_change_reaches_token_users(self):
+        jar = token_cookies(self.users[0])
+        authenticate_cookies(jar)
+        self.bulk('make_staff')
+        self.assertTrue(authenticate_cookies(jar)[0].is_staff)
@@ -19,6 +19,7 @@ import csv
 from datetime import timedelta
 
 from accounts.models import User
+from accounts.middleware import forget_token_users
 
 def is_staff(user):
     return user.is_staff
@@ -96,7 +97,8 @@ def dashboard(request):
 
     # Bulk Actions
     if request.method == 'POST' and 'bulk_action' in request.POST:
-        form = UserBulkActionForm(request.POST, queryset=recent_users)
+        # The form filters its queryset to validate the ticks, which a sliced queryset can't do.
+        form = UserBulkActionForm(request.POST, queryset=User.objects.filter(pk__in=[user.pk for user in recent_users]))
         if form.is_valid():
             action = form.cleaned_data['action']
             user_ids = request.POST.getlist('selected_users')
@@ -113,6 +115,8 @@ def dashboard(request):
             elif action == 'remove_staff':
                 users.update(is_staff=False)
                 messages.success(request, f'Removed staff status from {len(users)} users.')
+            # update() sends no post_save, so drop the JWT snapshots by hand.
+            forget_token_users(users.values_list('pk', flat=True))
             return redirect('adminapp:dashboard')
     bulk_form = UserBulkActionForm(queryset=recent_users)
     context['bulk_form'] = bulk_form
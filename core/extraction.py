@@ -0,0 +1,110 @@
+# core/extraction.py
+# Saving a model only records a pending ExtractedText row and, on commit,
+# queues (kind, object_id). Dispatcher threads read the file from storage and
+# hand the bytes to a process pool running core.extractors, then store the
+# compressed text and feed it to the search index. Jobs lost on restart stay
+# pending and are picked up by `manage.py extract_documents`.
+import logging
+import multiprocessing
+import queue
+import threading
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+from django.apps import apps
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+from . import extractors
+from .models import ExtractedText
+from .search import index_content
+
+logger = logging.getLogger(__name__)
+
+MODELS = {
+    'note': 'notes.Note',
+    'paper': 'papers.Paper',
+    'syllabus': 'roadmaps.Syllabus',
+    'roadmap': 'roadmaps.Roadmap',
+}
+
+
+class ExtractionPipeline:
+    def __init__(self, workers):
+        self.workers = workers
+        self.jobs = queue.Queue()
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def submit(self, kind, object_id):
+        self._start()
+        self.jobs.put((kind, object_id))
+
+    def _start(self):
+        with self._lock:
+            if self._pool is not None:
+                return
+            # spawn, not fork: the parent is a threaded server holding DB connections.
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context('spawn')
+            )
+            for number in range(self.workers):
+                threading.Thread(target=self._run, name=f'text-extraction-{number}', daemon=True).start()
+
+    def _run(self):
+        while True:
+            kind, object_id = self.jobs.get()
+            try:
+                process(kind, object_id, self._pool)
+            except Exception:
+                logger.exception('Text extraction failed for %s %s', kind, object_id)
+            finally:
+                close_old_connections()
+                self.jobs.task_done()
+
+
+pipeline = ExtractionPipeline(getattr(settings, 'TEXT_EXTRACTION_WORKERS', 2))
+
+
+def schedule(instance):
+    """Queue ``instance``'s file for extraction if it is new or has changed."""
+    kind = instance._meta.model_name
+    file_name = instance.pdf_file.name if instance.pdf_file else ''
+    if not file_name:
+        return
+    updated = ExtractedText.objects.filter(kind=kind, object_id=instance.pk).exclude(file_name=file_name).update(
+        file_name=file_name, status='pending', error=''
+    )
+    if not updated:
+        _, created = ExtractedText.objects.get_or_create(
+            kind=kind, object_id=instance.pk, defaults={'file_name': file_name}
+        )
+        if not created:
+            return  # same file as last time
+    transaction.on_commit(lambda: pipeline.submit(kind, instance.pk))
+
+
+def process(kind, object_id, pool=None):
+    """Extract one file. Runs on a dispatcher thread, or inline when ``pool`` is None."""
+    obj = apps.get_model(MODELS[kind]).objects.filter(pk=object_id).first()
+    if obj is None:
+        return
+    file_name = obj.pdf_file.name
+    rows = ExtractedText.objects.filter(kind=kind, object_id=object_id, file_name=file_name)
+    if not extractors.is_supported(file_name):
+        rows.update(status='skipped')
+        return
+    try:
+        with obj.pdf_file.open('rb') as handle:
+            data = handle.read()
+        if pool is not None:
+            text, page_count = pool.submit(extractors.extract, data, file_name).result()
+        else:
+            text, page_count = extractors.extract(data, file_name)
+    except Exception as e:
+        rows.update(status='failed', error=str(e)[:255])
+        raise
+    # Filtering on file_name drops the result if the file was replaced meanwhile.
+    if rows.update(status='done', page_count=page_count, data=zlib.compress(text.encode('utf-8')), error=''):
+        if kind in ('note', 'paper'):
+            index_content(kind, object_id, text)
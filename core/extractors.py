@@ -0,0 +1,70 @@
+# core/extractors.py
+# Pure text extractors. This module runs inside the extraction worker
+# processes, so it must not import Django models or settings.
+import io
+import re
+import zipfile
+
+try:
+    from pypdf import PdfReader
+except ImportError:  # pypdf is optional; PDFs are then skipped
+    PdfReader = None
+
+MAX_TEXT_LENGTH = 200000
+SUPPORTED_EXTENSIONS = ('.pdf', '.docx', '.txt')
+
+_TAG_RE = re.compile(r'<[^>]+>')
+_SPACE_RE = re.compile(r'\s+')
+_PAGES_RE = re.compile(r'<Pages>(\d+)</Pages>')
+
+
+def is_supported(name):
+    name = name.lower()
+    if name.endswith('.pdf') and PdfReader is None:
+        return False
+    return name.endswith(SUPPORTED_EXTENSIONS)
+
+
+def compact(text):
+    # Lower-cased, single-spaced and capped: this is what gets stored and searched.
+    return _SPACE_RE.sub(' ', text).strip().lower()[:MAX_TEXT_LENGTH]
+
+
+def _extract_pdf(data):
+    reader = PdfReader(io.BytesIO(data))
+    chunks = []
+    size = 0
+    for page in reader.pages:
+        if size >= MAX_TEXT_LENGTH:
+            break
+        chunk = page.extract_text() or ''
+        chunks.append(chunk)
+        size += len(chunk)
+    return ' '.join(chunks), len(reader.pages)
+
+
+def _extract_docx(data):
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        xml = archive.read('word/document.xml').decode('utf-8', 'ignore')
+        try:
+            app = archive.read('docProps/app.xml').decode('utf-8', 'ignore')
+        except KeyError:
+            app = ''
+    # Paragraph ends become spaces so words on either side don't merge.
+    text = _TAG_RE.sub('', xml.replace('</w:p>', ' '))
+    match = _PAGES_RE.search(app)
+    return text, int(match.group(1)) if match else None
+
+
+def extract(data, name):
+    """Return ``(text, page_count)`` for the file contents ``data`` named ``name``."""
+    name = name.lower()
+    if name.endswith('.pdf'):
+        text, pages = _extract_pdf(data)
+    elif name.endswith('.docx'):
+        text, pages = _extract_docx(data)
+    elif name.endswith('.txt'):
+        text, pages = data.decode('utf-8', 'ignore'), None
+    else:
+        raise ValueError(f'Unsupported file type: {name}')
+    return compact(text), pages
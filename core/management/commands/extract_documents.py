@@ -0,0 +1,50 @@
+# core/management/commands/extract_documents.py
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from core.extraction import MODELS, process
+from core.models import ExtractedText
+
+
+class Command(BaseCommand):
+    help = 'Extract text from uploaded files that are pending (or were never queued)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--retry-failed', action='store_true', help='Also retry files that failed before')
+        parser.add_argument('--workers', type=int, default=2, help='Extraction worker processes')
+
+    def handle(self, *args, **options):
+        for kind, label in MODELS.items():
+            model = apps.get_model(label)
+            known = ExtractedText.objects.filter(kind=kind).values_list('object_id', flat=True)
+            ExtractedText.objects.bulk_create(
+                [
+                    ExtractedText(kind=kind, object_id=pk, file_name=name)
+                    for pk, name in model.objects.exclude(pk__in=known).exclude(pdf_file='').values_list('pk', 'pdf_file')
+                ],
+                ignore_conflicts=True,
+            )
+
+        statuses = ['pending', 'failed'] if options['retry_failed'] else ['pending']
+        jobs = list(ExtractedText.objects.filter(status__in=statuses).values_list('kind', 'object_id'))
+        with ProcessPoolExecutor(
+            max_workers=options['workers'], mp_context=multiprocessing.get_context('spawn')
+        ) as pool, ThreadPoolExecutor(max_workers=options['workers']) as threads:
+            # One dispatcher thread per worker process keeps every process busy.
+            results = list(threads.map(lambda job: self.extract(pool, *job), jobs))
+        failed = results.count(False)
+        self.stdout.write(self.style.SUCCESS(f'Processed {len(jobs)} files ({failed} failed).'))
+
+    def extract(self, pool, kind, object_id):
+        try:
+            process(kind, object_id, pool)
+            return True
+        except Exception as e:
+            self.stderr.write(f'{kind} {object_id}: {e}')
+            return False
+        finally:
+            close_old_connections()
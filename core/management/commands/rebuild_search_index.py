@@ -0,0 +1,21 @@
+# core/management/commands/rebuild_search_index.py
+from django.core.management.base import BaseCommand
+
+from core.models import SearchDocument
+from core.search import reindex
+from notes.models import Note
+from papers.models import Paper
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the catalog search index from Note and Paper rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clear', action='store_true', help='Delete all search documents first')
+
+    def handle(self, *args, **options):
+        if options['clear']:
+            SearchDocument.objects.all().delete()
+        notes = reindex(Note.objects.all())
+        papers = reindex(Paper.objects.all())
+        self.stdout.write(self.style.SUCCESS(f'Indexed {notes} notes and {papers} papers.'))
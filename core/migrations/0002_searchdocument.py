@@ -0,0 +1,63 @@
+# Generated by Django 4.2 on 2026-10-18 21:36
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def add_fulltext_index(apps, schema_editor):
+    # Django has no portable FULLTEXT index; other backends fall back to substring search.
+    if schema_editor.connection.vendor == 'mysql':
+        schema_editor.execute(
+            'ALTER TABLE core_searchdocument ADD FULLTEXT INDEX core_searchdocument_document_ft (document)'
+        )
+
+
+def drop_fulltext_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'mysql':
+        schema_editor.execute('ALTER TABLE core_searchdocument DROP INDEX core_searchdocument_document_ft')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('university', '0002_alter_branch_abbreviation_alter_degree_abbreviation_and_more'),
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('note', 'Note'), ('paper', 'Paper')], max_length=10)),
+                ('object_id', models.PositiveIntegerField()),
+                ('title', models.CharField(max_length=255)),
+                ('code', models.CharField(blank=True, max_length=20)),
+                ('document', models.TextField()),
+                ('exam_type', models.CharField(blank=True, max_length=10)),
+                ('year', models.CharField(blank=True, max_length=20)),
+                ('price', models.DecimalField(decimal_places=2, default=0.0, max_digits=8)),
+                ('credit_price', models.PositiveIntegerField(default=0)),
+                ('is_active', models.BooleanField(default=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('university', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='university.university')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='searchdocument',
+            index=models.Index(fields=['is_active', 'kind'], name='core_search_is_acti_3b7d21_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='searchdocument',
+            index=models.Index(fields=['university', 'is_active'], name='core_search_univers_805ae5_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='searchdocument',
+            index=models.Index(fields=['year'], name='core_search_year_8cb5db_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='searchdocument',
+            unique_together={('kind', 'object_id')},
+        ),
+        migrations.RunPython(add_fulltext_index, drop_fulltext_index),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 4.2 on 2026-10-18 21:38
+
+from django.db import migrations, models
+
+
+def widen_fulltext_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'mysql':
+        schema_editor.execute('ALTER TABLE core_searchdocument DROP INDEX core_searchdocument_document_ft')
+        schema_editor.execute(
+            'ALTER TABLE core_searchdocument ADD FULLTEXT INDEX core_searchdocument_document_ft (document, content)'
+        )
+
+
+def narrow_fulltext_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'mysql':
+        schema_editor.execute('ALTER TABLE core_searchdocument DROP INDEX core_searchdocument_document_ft')
+        schema_editor.execute(
+            'ALTER TABLE core_searchdocument ADD FULLTEXT INDEX core_searchdocument_document_ft (document)'
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_searchdocument'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExtractedText',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=10)),
+                ('object_id', models.PositiveIntegerField()),
+                ('file_name', models.CharField(max_length=255)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('done', 'Done'), ('skipped', 'Skipped'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('page_count', models.PositiveIntegerField(blank=True, null=True)),
+                ('data', models.BinaryField(blank=True, default=b'')),
+                ('error', models.CharField(blank=True, max_length=255)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='searchdocument',
+            name='content',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddIndex(
+            model_name='extractedtext',
+            index=models.Index(fields=['status'], name='core_extrac_status_0ce4e1_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='extractedtext',
+            unique_together={('kind', 'object_id')},
+        ),
+        migrations.RunPython(widen_fulltext_index, narrow_fulltext_index),
+    ]
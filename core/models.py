@@ -1,3 +1,120 @@
+import zlib
+
 from django.db import models
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+
+class CodeSequence(models.Model):
+    # One row per code prefix (NOTE, PAPER, SYLLABUS); see core/sequences.py.
+    name = models.CharField(max_length=20, unique=True)
+    last_value = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} @ {self.last_value}"
+
+
+class SearchDocument(models.Model):
+    # Denormalized, search-only copy of a Note or Paper; kept in sync by core/search.py.
+    KIND_CHOICES = (
+        ('note', 'Note'),
+        ('paper', 'Paper'),
+    )
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    object_id = models.PositiveIntegerField()
+    title = models.CharField(max_length=255)
+    code = models.CharField(max_length=20, blank=True)
+    document = models.TextField()  # name, code, branch, degree and university, lower-cased
+    content = models.TextField(blank=True)  # text extracted from the uploaded file, see core/extraction.py
+    university = models.ForeignKey(
+        'university.University', on_delete=models.SET_NULL, null=True, blank=True, related_name='+'
+    )
+    exam_type = models.CharField(max_length=10, blank=True)
+    year = models.CharField(max_length=20, blank=True)
+    price = models.DecimalField(max_digits=8, decimal_places=2, default=0.00)
+    credit_price = models.PositiveIntegerField(default=0)
+    is_active = models.BooleanField(default=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ['kind', 'object_id']
+        indexes = [
+            models.Index(fields=['is_active', 'kind']),
+            models.Index(fields=['university', 'is_active']),
+            models.Index(fields=['year']),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()}: {self.title}"
+
+
+class ExtractedText(models.Model):
+    # Text pulled from an uploaded file by the background pipeline in core/extraction.py.
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('done', 'Done'),
+        ('skipped', 'Skipped'),
+        ('failed', 'Failed'),
+    )
+    kind = models.CharField(max_length=10)  # note, paper, syllabus or roadmap
+    object_id = models.PositiveIntegerField()
+    file_name = models.CharField(max_length=255)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    page_count = models.PositiveIntegerField(null=True, blank=True)
+    data = models.BinaryField(blank=True, default=b'')  # zlib-compressed text
+    error = models.CharField(max_length=255, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ['kind', 'object_id']
+        indexes = [models.Index(fields=['status'])]
+
+    def __str__(self):
+        return f"{self.kind} {self.object_id}: {self.file_name} ({self.status})"
+
+    @property
+    def text(self):
+        return zlib.decompress(self.data).decode('utf-8') if self.data else ''
+
+
+@receiver(post_save, sender='notes.Note')
+@receiver(post_save, sender='papers.Paper')
+def index_catalog_item(sender, instance, **kwargs):
+    from .search import index_object
+    index_object(instance)
+
+
+@receiver(post_delete, sender='notes.Note')
+@receiver(post_delete, sender='papers.Paper')
+def unindex_catalog_item(sender, instance, **kwargs):
+    from .search import remove_object
+    remove_object(instance)
+
+
+@receiver(post_save, sender='university.University')
+@receiver(post_save, sender='university.Degree')
+@receiver(post_save, sender='university.Branch')
+def reindex_hierarchy(sender, instance, created, **kwargs):
+    # Renames change the text of every paper underneath; new rows have no papers yet.
+    # A university can have thousands of papers, so this runs after the admin's request.
+    if not created:
+        from .search import reindex_papers_under_later
+        reindex_papers_under_later(instance)
+
+
+@receiver(post_save, sender='notes.Note')
+@receiver(post_save, sender='papers.Paper')
+@receiver(post_save, sender='roadmaps.Syllabus')
+@receiver(post_save, sender='roadmaps.Roadmap')
+def schedule_text_extraction(sender, instance, **kwargs):
+    from .extraction import schedule
+    schedule(instance)
+
 
-# Create your models here.
+@receiver(post_delete, sender='notes.Note')
+@receiver(post_delete, sender='papers.Paper')
+@receiver(post_delete, sender='roadmaps.Syllabus')
+@receiver(post_delete, sender='roadmaps.Roadmap')
+def drop_extracted_text(sender, instance, **kwargs):
+    ExtractedText.objects.filter(kind=instance._meta.model_name, object_id=instance.pk).delete()
@@ -0,0 +1,209 @@
+# core/search.py
+import logging
+import re
+import threading
+import zlib
+from decimal import Decimal, InvalidOperation
+
+from django.db import close_old_connections, connection, transaction
+from django.db.models import Case, Count, IntegerField, Q, Value, When
+from django.db.models.expressions import RawSQL
+
+from .models import ExtractedText, SearchDocument
+
+logger = logging.getLogger(__name__)
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+REINDEX_BATCH_SIZE = 500
+
+
+def _kind_of(obj):
+    return obj._meta.model_name  # 'note' or 'paper'
+
+
+def _fields_for(obj):
+    kind = _kind_of(obj)
+    parts = [obj.name, obj.code]
+    fields = {
+        'title': obj.name,
+        'code': obj.code or '',
+        'price': obj.price,
+        'credit_price': obj.credit_price,
+        'is_active': obj.is_active,
+        'university': None,
+        'exam_type': '',
+        'year': '',
+    }
+    if kind == 'paper':
+        branch = obj.branch
+        degree = branch.degree
+        university = degree.university
+        parts += [
+            branch.name, branch.abbreviation, degree.name, degree.abbreviation,
+            university.name, university.abbreviation, obj.get_exam_type_display(), obj.year,
+        ]
+        fields.update(university=university, exam_type=obj.exam_type, year=obj.year)
+    fields['document'] = ' '.join(part for part in parts if part).lower()
+    return fields
+
+
+def index_object(obj):
+    SearchDocument.objects.update_or_create(
+        kind=_kind_of(obj), object_id=obj.pk, defaults=_fields_for(obj)
+    )
+
+
+def remove_object(obj):
+    SearchDocument.objects.filter(kind=_kind_of(obj), object_id=obj.pk).delete()
+
+
+def reindex(queryset):
+    """Rebuild the documents for every object in ``queryset`` in batches."""
+    if queryset.model._meta.model_name == 'paper':
+        queryset = queryset.select_related('branch__degree__university')
+    batch = []
+    count = 0
+    for obj in queryset.iterator(chunk_size=REINDEX_BATCH_SIZE):
+        batch.append(SearchDocument(kind=_kind_of(obj), object_id=obj.pk, **_fields_for(obj)))
+        if len(batch) >= REINDEX_BATCH_SIZE:
+            count += _write_batch(batch)
+            batch = []
+    if batch:
+        count += _write_batch(batch)
+    return count
+
+
+def _write_batch(documents):
+    kind = documents[0].kind
+    object_ids = [doc.object_id for doc in documents]
+    extracted = dict(
+        ExtractedText.objects.filter(kind=kind, object_id__in=object_ids, status='done').values_list('object_id', 'data')
+    )
+    for doc in documents:
+        if extracted.get(doc.object_id):
+            doc.content = zlib.decompress(extracted[doc.object_id]).decode('utf-8')
+    SearchDocument.objects.filter(kind=kind, object_id__in=object_ids).delete()
+    SearchDocument.objects.bulk_create(documents)
+    return len(documents)
+
+
+def index_content(kind, object_id, text):
+    SearchDocument.objects.filter(kind=kind, object_id=object_id).update(content=text)
+
+
+def reindex_papers_under(node):
+    from papers.models import Paper
+
+    lookup = {
+        'university': 'branch__degree__university',
+        'degree': 'branch__degree',
+        'branch': 'branch',
+    }[node._meta.model_name]
+    return reindex(Paper.objects.filter(**{lookup: node}))
+
+
+def reindex_papers_under_later(node):
+    """Reindex the papers under ``node`` on a background thread once the transaction commits."""
+    model, pk = type(node), node.pk
+    transaction.on_commit(
+        lambda: threading.Thread(target=_reindex_node, args=(model, pk), name='search-reindex', daemon=True).start()
+    )
+
+
+def _reindex_node(model, pk):
+    try:
+        node = model.objects.filter(pk=pk).first()
+        if node is not None:
+            reindex_papers_under(node)
+    except Exception:
+        logger.exception('Search reindex failed under %s %s', model._meta.model_name, pk)
+    finally:
+        close_old_connections()
+
+
+def _number(value, parse):
+    # Filters come straight from the query string; anything unparsable is ignored.
+    try:
+        number = parse(value)
+    except (TypeError, ValueError, InvalidOperation):
+        return None
+    if isinstance(number, Decimal) and not number.is_finite():
+        return None
+    return number
+
+
+def tokenize(query):
+    return [token.lower() for token in TOKEN_RE.findall(query or '')]
+
+
+def search(query='', kind='', university='', exam_type='', year='', price_min='', price_max='', sort=''):
+    """
+    Ranked search over the catalog. Every term must match; on MySQL this uses
+    the FULLTEXT index on ``document``/``content`` and ranks by its relevance score,
+    elsewhere it falls back to substring matching ranked by title hits.
+    """
+    documents = SearchDocument.objects.filter(is_active=True).select_related('university')
+    tokens = tokenize(query)
+    if tokens:
+        if connection.vendor == 'mysql':
+            boolean_query = ' '.join(f'+{token}*' for token in tokens)
+            documents = documents.annotate(
+                score=RawSQL('MATCH (document, content) AGAINST (%s IN BOOLEAN MODE)', (boolean_query,))
+            ).filter(score__gt=0)
+        else:
+            for token in tokens:
+                documents = documents.filter(Q(document__contains=token) | Q(content__contains=token))
+            phrase = query.strip()
+            documents = documents.annotate(
+                score=Case(
+                    When(Q(title__icontains=phrase) | Q(code__iexact=phrase), then=Value(2)),
+                    default=Value(1),
+                    output_field=IntegerField(),
+                )
+            )
+
+    university = _number(university, int)
+    price_min = _number(price_min, Decimal)
+    price_max = _number(price_max, Decimal)
+
+    if kind:
+        documents = documents.filter(kind=kind)
+    if university is not None:
+        documents = documents.filter(university_id=university)
+    if exam_type:
+        documents = documents.filter(exam_type=exam_type)
+    if year:
+        documents = documents.filter(year=year)
+    if price_min is not None:
+        documents = documents.filter(price__gte=price_min)
+    if price_max is not None:
+        documents = documents.filter(price__lte=price_max)
+
+    ordering = {
+        'price_asc': ['price', 'id'],
+        'price_desc': ['-price', 'id'],
+        'year_asc': ['year', 'id'],
+        'year_desc': ['-year', 'id'],
+        'title': ['title', 'id'],
+    }.get(sort)
+    if ordering is None:
+        ordering = ['-score', 'title', 'id'] if tokens else ['title', 'id']
+    return documents.order_by(*ordering)
+
+
+def facet_counts(documents):
+    """Counts per university, exam type, year and kind for an (unsliced) search result."""
+    documents = documents.order_by()
+    return {
+        'university': list(
+            documents.exclude(university=None)
+            .values('university_id', 'university__name')
+            .annotate(count=Count('id'))
+            .order_by('-count', 'university__name')
+        ),
+        'exam_type': list(
+            documents.exclude(exam_type='').values('exam_type').annotate(count=Count('id')).order_by('exam_type')
+        ),
+        'year': list(documents.exclude(year='').values('year').annotate(count=Count('id')).order_by('-year')),
+        'kind': list(documents.values('kind').annotate(count=Count('id')).order_by('kind')),
+    }
@@ -0,0 +1,88 @@
+# core/sequences.py
+from django.db import IntegrityError, models, transaction
+from django.db.models import F
+
+from .models import CodeSequence
+
+CODE_ATTEMPTS = 5
+
+
+def format_code(prefix, number):
+    return f'{prefix}{number:03d}'  # e.g., NOTE001, PAPER002
+
+
+def _highest_existing(model, prefix):
+    # Only used once per prefix, to start the counter after codes issued before it existed.
+    highest = 0
+    for code in model.objects.filter(code__startswith=prefix).values_list('code', flat=True).iterator():
+        suffix = code[len(prefix):]
+        if suffix.isdigit():
+            highest = max(highest, int(suffix))
+    return highest
+
+
+def reserve_codes(model, prefix, count=1):
+    """
+    Atomically reserve ``count`` consecutive codes for ``model``.
+
+    The counter row is bumped with a single UPDATE, so concurrent callers
+    serialize on one row lock instead of probing the model table for free
+    codes. Call it inside the transaction that saves the objects: the row
+    stays locked until that transaction ends, and a rollback also rolls back
+    the counter, so no codes are skipped.
+    """
+    with transaction.atomic():
+        sequences = CodeSequence.objects.filter(name=prefix)
+        if not sequences.update(last_value=F('last_value') + count):
+            try:
+                with transaction.atomic():
+                    CodeSequence.objects.create(name=prefix, last_value=_highest_existing(model, prefix))
+            except IntegrityError:
+                pass  # another process seeded it first
+            sequences.update(last_value=F('last_value') + count)
+        last_value = sequences.values_list('last_value', flat=True).get()
+    return [format_code(prefix, number) for number in range(last_value - count + 1, last_value + 1)]
+
+
+def next_code(model, prefix):
+    return reserve_codes(model, prefix)[0]
+
+
+class SequentialCodeQuerySet(models.QuerySet):
+    def bulk_create(self, objs, *args, **kwargs):
+        """Give objects without a code one from a single block reservation (for bulk imports)."""
+        objs = list(objs)
+        pending = [obj for obj in objs if not obj.code]
+        with transaction.atomic(using=self.db):
+            for obj, code in zip(pending, reserve_codes(self.model, self.model.code_prefix, len(pending))):
+                obj.code = code
+            return super().bulk_create(objs, *args, **kwargs)
+
+
+class SequentialCodeMixin:
+    """
+    Fills in a blank ``code`` from the ``code_prefix`` counter on save. The
+    counter is bumped in the same transaction as the INSERT, so a failed save
+    gives its code back. A code that is already taken (say, typed in by hand
+    in the admin) is skipped and the next one reserved, up to CODE_ATTEMPTS
+    times.
+    """
+    code_prefix = None
+
+    def save(self, *args, **kwargs):
+        if self.code:
+            return super().save(*args, **kwargs)
+        model = type(self)
+        try:
+            with transaction.atomic():
+                for attempt in range(CODE_ATTEMPTS):
+                    self.code = next_code(model, self.code_prefix)
+                    try:
+                        with transaction.atomic():
+                            return super().save(*args, **kwargs)
+                    except IntegrityError:
+                        if attempt == CODE_ATTEMPTS - 1 or not model._default_manager.filter(code=self.code).exists():
+                            raise
+        except Exception:
+            self.code = ''
+            raise
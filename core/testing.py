@@ -0,0 +1,48 @@
+# core/testing.py
+# Shared base classes for the apps' tests. Redis (cache and channel layer) and
+# S3 are swapped for in-process backends so the suite runs on its own; every
+# test starts with an empty cache.
+import shutil
+import tempfile
+
+from django.core.cache import cache
+from django.test import TestCase, TransactionTestCase, override_settings
+
+LOCAL_SERVICES = {
+    'CACHES': {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    'CHANNEL_LAYERS': {'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}},
+    'STORAGES': {
+        'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+        'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+    },
+    # settings.py still uses the pre-STORAGES names, which take precedence.
+    'DEFAULT_FILE_STORAGE': 'django.core.files.storage.FileSystemStorage',
+    'STATICFILES_STORAGE': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+}
+
+
+class LocalServicesMixin:
+    @classmethod
+    def setUpClass(cls):
+        cls._media_root = tempfile.mkdtemp()
+        cls._local_services = override_settings(MEDIA_ROOT=cls._media_root, **LOCAL_SERVICES)
+        cls._local_services.enable()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls._local_services.disable()
+        shutil.rmtree(cls._media_root, ignore_errors=True)
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+
+class LocalServicesTestCase(LocalServicesMixin, TestCase):
+    pass
+
+
+class LocalServicesTransactionTestCase(LocalServicesMixin, TransactionTestCase):
+    pass
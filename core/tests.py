@@ -1,3 +1,141 @@
-from django.test import TestCase
+from decimal import Decimal
+from unittest.mock import patch
 
-# Create your tests here.
+from django.core.files.base import ContentFile
+from django.db import IntegrityError, connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from notes.models import Note
+from papers.models import Paper
+from roadmaps.models import Syllabus
+from university.models import Branch, Degree, University
+
+from . import extraction
+from .models import CodeSequence, ExtractedText
+from .search import search
+from .testing import LocalServicesTestCase
+
+
+class CodeSequenceTests(LocalServicesTestCase):
+    def test_codes_are_consecutive_per_prefix(self):
+        self.assertEqual([Note.objects.create(name=f'n{n}').code for n in range(3)], ['NOTE001', 'NOTE002', 'NOTE003'])
+        self.assertEqual(Syllabus.objects.create(name='s').code, 'SYLLABUS001')
+
+    def test_counter_starts_after_existing_codes(self):
+        Note.objects.create(name='legacy', code='NOTE007')
+        self.assertEqual(Note.objects.create(name='new').code, 'NOTE008')
+
+    def test_taken_codes_are_skipped(self):
+        Note.objects.create(name='first')
+        Note.objects.create(name='typed in', code='NOTE002')
+        self.assertEqual(Note.objects.create(name='next').code, 'NOTE003')
+
+    def test_failed_save_gives_its_code_back(self):
+        Note.objects.create(name='first')
+        with self.assertRaises(IntegrityError):
+            Note.objects.create(name=None)
+        self.assertEqual(CodeSequence.objects.get(name='NOTE').last_value, 1)
+        self.assertEqual(Note.objects.create(name='second').code, 'NOTE002')
+
+    def test_explicit_codes_are_kept(self):
+        self.assertEqual(Note.objects.create(name='n', code='CUSTOM').code, 'CUSTOM')
+
+    def test_bulk_create_reserves_one_block(self):
+        Note.objects.create(name='first')
+        with CaptureQueriesContext(connection) as queries:
+            notes = Note.objects.bulk_create([Note(name=f'bulk {n}') for n in range(3)] + [Note(name='own', code='X1')])
+        self.assertEqual([note.code for note in notes], ['NOTE002', 'NOTE003', 'NOTE004', 'X1'])
+        counter_updates = [q for q in queries if q['sql'].startswith('UPDATE "core_codesequence"')]
+        self.assertEqual(len(counter_updates), 1)
+
+
+class SearchTests(LocalServicesTestCase):
+    def setUp(self):
+        super().setUp()
+        self.university = University.objects.create(name='Pune University', abbreviation='SPPU')
+        branch = Branch.objects.create(
+            degree=Degree.objects.create(university=self.university, name='BE'), name='Computer'
+        )
+        self.paper = Paper.objects.create(
+            branch=branch, name='Data Structures', exam_type='endsem', year='2023', price=Decimal('20.00')
+        )
+        self.note = Note.objects.create(name='Data Science Notes', price=Decimal('5.00'))
+
+    def titles(self, **filters):
+        return [doc.title for doc in search(**filters)]
+
+    def test_every_term_must_match(self):
+        self.assertEqual(self.titles(query='data'), ['Data Science Notes', 'Data Structures'])
+        self.assertEqual(self.titles(query='data sppu'), ['Data Structures'])
+
+    def test_filters(self):
+        self.assertEqual(self.titles(university=str(self.university.pk)), ['Data Structures'])
+        self.assertEqual(self.titles(price_max='10'), ['Data Science Notes'])
+        self.assertEqual(self.titles(price_min='10', kind='paper'), ['Data Structures'])
+
+    def test_invalid_filters_are_ignored(self):
+        response = self.client.get(
+            reverse('core:search'), {'q': 'data', 'university': 'abc', 'price_min': 'x', 'price_max': 'NaN'}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['page_obj'].paginator.count, 2)
+
+    def test_hierarchy_renames_reindex_after_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.university.name = 'Savitribai Phule University'
+            self.university.save()
+        self.assertEqual(self.titles(query='savitribai'), [])
+
+        with patch('core.search.threading.Thread', InlineThread), patch('core.search.close_old_connections'):
+            for callback in callbacks:
+                callback()
+        self.assertEqual(self.titles(query='savitribai'), ['Data Structures'])
+
+
+class TextExtractionTests(LocalServicesTestCase):
+    def upload(self, note, name, data):
+        with self.captureOnCommitCallbacks() as callbacks:
+            note.pdf_file.save(name, ContentFile(data))
+        return callbacks
+
+    def test_new_files_are_queued_after_commit(self):
+        note = Note.objects.create(name='Graphs')
+        with patch.object(extraction.pipeline, 'submit') as submit:
+            callbacks = self.upload(note, 'graphs.txt', b'Dijkstra')
+            submit.assert_not_called()
+            for callback in callbacks:
+                callback()
+        submit.assert_called_once_with('note', note.pk)
+        self.assertEqual(ExtractedText.objects.get(kind='note', object_id=note.pk).status, 'pending')
+
+    def test_extracted_text_is_searchable(self):
+        note = Note.objects.create(name='Graphs')
+        self.upload(note, 'graphs.txt', b'Shortest paths with   Dijkstra')
+        extraction.process('note', note.pk)
+        row = ExtractedText.objects.get(kind='note', object_id=note.pk)
+        self.assertEqual((row.status, row.text), ('done', 'shortest paths with dijkstra'))
+        self.assertEqual([doc.title for doc in search(query='dijkstra')], ['Graphs'])
+
+    def test_unchanged_files_are_not_queued_again(self):
+        note = Note.objects.create(name='Graphs')
+        self.upload(note, 'graphs.txt', b'Dijkstra')
+        extraction.process('note', note.pk)
+        with self.captureOnCommitCallbacks() as callbacks:
+            note.save()
+        self.assertEqual(callbacks, [])
+        self.assertEqual(ExtractedText.objects.get(kind='note', object_id=note.pk).status, 'done')
+
+    def test_unsupported_files_are_skipped(self):
+        note = Note.objects.create(name='Slides')
+        self.upload(note, 'slides.pptx', b'binary')
+        extraction.process('note', note.pk)
+        self.assertEqual(ExtractedText.objects.get(kind='note', object_id=note.pk).status, 'skipped')
+
+
+class InlineThread:
+    def __init__(self, target, args=(), **kwargs):
+        self.target, self.args = target, args
+
+    def start(self):
+        self.target(*self.args)
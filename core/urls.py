@@ -10,5 +10,6 @@ urlpatterns = [
 
     path('about/', views.about, name='about'),
     path('api/cascade-filters/', views.cascade_filters_api, name='cascade_filters_api'),
+    path('api/hierarchy/', views.hierarchy_api, name='hierarchy_api'),
     path('search/', views.search_view, name='search'),
 ]
\ No newline at end of file
@@ -6,6 +6,9 @@ from django.shortcuts import render
 from django.http import JsonResponse
 from notes.models import Note
 from university.models import University, Degree, Branch
+from university import hierarchy
+from ecommerce import downloads
+from django.views.decorators.http import condition
 from django.db.models import Count
 from django.conf import settings
 from django.contrib.auth import get_user_model
@@ -21,7 +24,7 @@ def home(request):
         'total_notes': Note.objects.filter(is_active=True).count(),
         'total_papers': Paper.objects.filter(is_active=True).count(),  # Replaced total_subjects
         'total_universities': University.objects.filter(is_active=True).count(),
-        'total_downloads': 0,  # Replace with actual logic (e.g., from Order model)
+        'total_downloads': downloads.total(),
     }
     featured_notes = Note.objects.filter(is_active=True).order_by('-created_at')[:3]
     featured_papers = Paper.objects.filter(is_active=True).order_by('-created_at')[:3]
@@ -38,20 +41,35 @@ def about(request):
     return render(request, 'core/about.html')
 
 
+def _hierarchy_etag(request, *args, **kwargs):
+    return hierarchy.current_version()
+
+
+@condition(etag_func=_hierarchy_etag)
 def cascade_filters_api(request):
     """API for cascading filters (University -> Degree -> Branch -> Semester -> Subject)"""
     filter_type = request.GET.get('type')
     parent_id = request.GET.get('parent_id')
 
+    try:
+        parent_id = int(parent_id)
+    except (TypeError, ValueError):
+        parent_id = None
+
     if filter_type == 'degrees' and parent_id:
-        items = Degree.objects.filter(university_id=parent_id, is_active=True).values('id', 'name')
+        rows = hierarchy.active_degrees(university_id=parent_id)
     elif filter_type == 'branches' and parent_id:
-        items = Branch.objects.filter(degree_id=parent_id, is_active=True).values('id', 'name')
-
+        rows = hierarchy.active_branches(degree_id=parent_id)
     else:
-        items = []
+        rows = []
 
-    return JsonResponse({'items': list(items)})
+    return JsonResponse({'items': [{'id': row['id'], 'name': row['name']} for row in rows]})
+
+
+@condition(etag_func=_hierarchy_etag)
+def hierarchy_api(request):
+    """The whole active University -> Degree -> Branch tree in one response."""
+    return JsonResponse({'version': hierarchy.current_version(), 'universities': hierarchy.tree()})
 
 
 
@@ -60,66 +78,45 @@ def cascade_filters_api(request):
 
 # core/views.py (advanced search)
 from django.shortcuts import render
-from django.db.models import Q
+from django.core.paginator import Paginator
 from notes.models import Note
 from papers.models import Paper
+from .search import search, facet_counts
 
 def search_view(request):
-    query = request.GET.get('q', '')
-    university = request.GET.get('university', '')
-    year = request.GET.get('year', '')
-    price_min = request.GET.get('price_min', '')
-    price_max = request.GET.get('price_max', '')
-    sort = request.GET.get('sort', 'title')
+    filters = {
+        'query': request.GET.get('q', '').strip(),
+        'kind': request.GET.get('type', ''),
+        'university': request.GET.get('university', ''),
+        'exam_type': request.GET.get('exam_type', ''),
+        'year': request.GET.get('year', ''),
+        'price_min': request.GET.get('price_min', ''),
+        'price_max': request.GET.get('price_max', ''),
+        'sort': request.GET.get('sort', ''),
+    }
     view = request.GET.get('view', 'grid')
 
-    notes = Note.objects.all()
-    papers = Paper.objects.all()
-
-    if query:
-        notes = notes.filter(Q(title__icontains=query) | Q(description__icontains=query))
-        papers = papers.filter(Q(subject__name__icontains=query) | Q(year__icontains=query))
-
-    # Apply filters
-    if university:
-        notes = notes.filter(subject__branch__degree__university__id=university)
-        papers = papers.filter(subject__branch__degree__university__id=university)
-
-    if year:
-        notes = notes.filter(year=year)
-        papers = papers.filter(year=year)
-    if price_min:
-        notes = notes.filter(price__gte=price_min)
-        papers = papers.filter(price__gte=price_min)  # Assume price field added to Paper/Note
-    if price_max:
-        notes = notes.filter(price__lte=price_max)
-        papers = papers.filter(price__lte=price_max)
-
-    # Sorting
-    if sort == 'price_asc':
-        notes = notes.order_by('price')
-        papers = papers.order_by('price')
-    elif sort == 'price_desc':
-        notes = notes.order_by('-price')
-        papers = papers.order_by('-price')
-    elif sort == 'year_asc':
-        notes = notes.order_by('year')
-        papers = papers.order_by('year')
-    elif sort == 'year_desc':
-        notes = notes.order_by('-year')
-        papers = papers.order_by('-year')
+    results = search(**filters)
+    paginator = Paginator(results, 24)
+    page_obj = paginator.get_page(request.GET.get('page'))
+
+    querystring = request.GET.copy()
+    querystring.pop('page', None)
 
     context = {
-        'notes': notes,
-        'papers': papers,
+        'page_obj': page_obj,
+        'facets': facet_counts(results),
+        'querystring': querystring.urlencode(),
         'view': view,
-        'universities': University.objects.all(),
-        'query': query,
-        'university': university,
-
-        'year': year,
-        'price_min': price_min,
-        'price_max': price_max,
-        'sort': sort,
+        'universities': University.objects.filter(is_active=True),
+        'exam_types': Paper.EXAM_TYPE_CHOICES,
+        'type': filters['kind'],
+        'query': filters['query'],
+        'university': filters['university'],
+        'exam_type': filters['exam_type'],
+        'year': filters['year'],
+        'price_min': filters['price_min'],
+        'price_max': filters['price_max'],
+        'sort': filters['sort'],
     }
-    return render(request, 'core/search.html', context)
\ No newline at end of file
+    return render(request, 'core/search.html', context)
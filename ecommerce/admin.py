@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Cart, CartItem, Order, OrderItem, Coupon, PurchaseRequest, DownloadLog
+from .models import Cart, CartItem, Order, OrderItem, Coupon, PurchaseRequest, DownloadLog, DownloadDaily, Entitlement
 
 
 @admin.register(Order)
@@ -43,9 +43,24 @@ class PurchaseRequestAdmin(admin.ModelAdmin):
     ordering = ('-created_at',)
 
 
+@admin.register(Entitlement)
+class EntitlementAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user', 'content_type', 'object_id', 'order', 'created_at')
+    list_filter = ('content_type',)
+    search_fields = ('user__username',)
+    ordering = ('-created_at',)
+
+
 @admin.register(DownloadLog)
 class DownloadLogAdmin(admin.ModelAdmin):
     list_display = ('id', 'user', 'content_type', 'object_id', 'ip_address', 'downloaded_at')
     list_filter = ('content_type',)
     search_fields = ('user__username', 'ip_address')
     ordering = ('-downloaded_at',)
+
+
+@admin.register(DownloadDaily)
+class DownloadDailyAdmin(admin.ModelAdmin):
+    list_display = ('day', 'content_type', 'object_id', 'count')
+    list_filter = ('content_type', 'day')
+    ordering = ('-day',)
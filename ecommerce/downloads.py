@@ -0,0 +1,119 @@
+# ecommerce/downloads.py
+# Download logging off the request path. download_item only appends the event
+# to an in-memory buffer; a background thread writes buffered events with one
+# bulk_create once DOWNLOAD_LOG_BATCH_SIZE are waiting or DOWNLOAD_LOG_INTERVAL
+# seconds have passed, and adds them to the per-item DownloadDaily rollup in
+# the same transaction. Events still buffered at exit are written by an
+# atexit hook. Totals are read from the rollup, never from the raw log.
+import atexit
+import logging
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .models import DownloadDaily, DownloadLog
+
+logger = logging.getLogger(__name__)
+
+TOTAL_CACHE_KEY = 'downloads:total'
+
+
+def write(events):
+    with transaction.atomic():
+        DownloadLog.objects.bulk_create(events)
+        add_to_rollup(Counter(
+            (event.content_type_id, event.object_id, event.downloaded_at.date()) for event in events
+        ))
+    cache.delete(TOTAL_CACHE_KEY)
+
+
+def add_to_rollup(counts):
+    """Add ``{(content_type_id, object_id, day): n}`` to DownloadDaily."""
+    DownloadDaily.objects.bulk_create([
+        DownloadDaily(content_type_id=content_type_id, object_id=object_id, day=day)
+        for content_type_id, object_id, day in counts
+    ], ignore_conflicts=True)
+    for (content_type_id, object_id, day), count in counts.items():
+        DownloadDaily.objects.filter(content_type_id=content_type_id, object_id=object_id, day=day).update(
+            count=F('count') + count
+        )
+
+
+def total():
+    """All-time downloads, summed from the rollup and cached between flushes."""
+    value = cache.get(TOTAL_CACHE_KEY)
+    if value is None:
+        value = DownloadDaily.objects.aggregate(total=Sum('count'))['total'] or 0
+        cache.set(TOTAL_CACHE_KEY, value, 60 * 60)
+    return value
+
+
+class DownloadBuffer:
+    def __init__(self, max_size, interval):
+        self.max_size = max_size
+        self.interval = interval
+        self._pending = []
+        self._lock = threading.Lock()
+        self._timer = None
+        self._flushing = False
+
+    def add(self, user_id, content_type_id, object_id, ip_address):
+        event = DownloadLog(
+            user_id=user_id, content_type_id=content_type_id, object_id=object_id,
+            ip_address=ip_address or '', downloaded_at=timezone.now(),
+        )
+        with self._lock:
+            self._pending.append(event)
+            size = len(self._pending)
+            if size >= self.max_size:
+                if not self._flushing:
+                    self._flushing = True
+                    self._start(threading.Thread(target=self._drain))
+            elif self._timer is None:
+                self._timer = threading.Timer(self.interval, self.flush)
+                self._start(self._timer)
+
+    @staticmethod
+    def _start(thread):
+        thread.daemon = True
+        thread.start()
+
+    def _drain(self):
+        # One thread at a time writes full batches until the buffer is below max_size.
+        while True:
+            self.flush()
+            with self._lock:
+                if len(self._pending) < self.max_size:
+                    self._flushing = False
+                    return
+
+    def _take(self):
+        with self._lock:
+            batch, self._pending = self._pending, []
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        return batch
+
+    def flush(self):
+        batch = self._take()
+        if not batch:
+            return
+        try:
+            write(batch)
+        except Exception:
+            logger.exception('Failed to write %d download log rows', len(batch))
+        finally:
+            close_old_connections()
+
+
+buffer = DownloadBuffer(
+    getattr(settings, 'DOWNLOAD_LOG_BATCH_SIZE', 100),
+    getattr(settings, 'DOWNLOAD_LOG_INTERVAL', 5),
+)
+atexit.register(buffer.flush)
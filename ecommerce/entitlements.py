@@ -0,0 +1,57 @@
+# ecommerce/entitlements.py
+from django.contrib.contenttypes.models import ContentType
+
+from .models import Entitlement
+
+
+def _keys_for(items):
+    content_types = ContentType.objects.get_for_models(*{type(item) for item in items})
+    return {(content_types[type(item)].id, item.pk) for item in items}
+
+
+def grant_for_order(order):
+    """Record ownership of every item in a paid order. Safe to call repeatedly."""
+    if order.user_id is None:
+        return
+    Entitlement.objects.bulk_create(
+        [
+            Entitlement(
+                user_id=order.user_id,
+                content_type_id=content_type_id,
+                object_id=object_id,
+                order=order,
+            )
+            for content_type_id, object_id in order.items.values_list('content_type_id', 'object_id')
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def owned_keys(user, items):
+    """
+    Return the (content_type_id, object_id) pairs among ``items`` that ``user``
+    owns, answered with a single query regardless of how many items are passed.
+    """
+    if not user.is_authenticated or not items:
+        return set()
+    keys = _keys_for(items)
+    owned = Entitlement.objects.filter(
+        user=user,
+        content_type_id__in={content_type_id for content_type_id, _ in keys},
+        object_id__in={object_id for _, object_id in keys},
+    ).values_list('content_type_id', 'object_id')
+    return keys.intersection(owned)
+
+
+def user_owns(user, item):
+    return bool(owned_keys(user, [item]))
+
+
+def mark_owned(user, items):
+    """Set ``is_owned`` on each item so templates can swap "add to cart" for "download"."""
+    items = list(items)
+    owned = owned_keys(user, items)
+    content_types = ContentType.objects.get_for_models(*{type(item) for item in items})
+    for item in items:
+        item.is_owned = (content_types[type(item)].id, item.pk) in owned
+    return items
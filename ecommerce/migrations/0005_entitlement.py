@@ -0,0 +1,54 @@
+# Generated by Django 4.2 on 2026-10-18 21:34
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_entitlements(apps, schema_editor):
+    Entitlement = apps.get_model('ecommerce', 'Entitlement')
+    OrderItem = apps.get_model('ecommerce', 'OrderItem')
+    PurchaseRequest = apps.get_model('ecommerce', 'PurchaseRequest')
+    rows = OrderItem.objects.filter(order__status='paid', order__user__isnull=False).values_list(
+        'order__user_id', 'content_type_id', 'object_id', 'order_id'
+    )
+    rows = list(rows) + list(
+        PurchaseRequest.objects.filter(status='paid', user__isnull=False).values_list(
+            'user_id', 'content_type_id', 'object_id', 'order_id'
+        )
+    )
+    Entitlement.objects.bulk_create(
+        [
+            Entitlement(user_id=user_id, content_type_id=content_type_id, object_id=object_id, order_id=order_id)
+            for user_id, content_type_id, object_id, order_id in rows
+        ],
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('ecommerce', '0004_add_timestamps_to_coupon'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Entitlement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_id', models.PositiveIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype')),
+                ('order', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='ecommerce.order')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='entitlements', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'content_type', 'object_id')},
+            },
+        ),
+        migrations.RunPython(backfill_entitlements, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 4.2 on 2026-10-18 22:06
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def backfill_rollup(apps, schema_editor):
+    DownloadLog = apps.get_model('ecommerce', 'DownloadLog')
+    DownloadDaily = apps.get_model('ecommerce', 'DownloadDaily')
+    rows = (
+        DownloadLog.objects.annotate(day=TruncDate('downloaded_at'))
+        .values('content_type_id', 'object_id', 'day').annotate(total=Count('id')).order_by()
+    )
+    DownloadDaily.objects.bulk_create([
+        DownloadDaily(content_type_id=row['content_type_id'], object_id=row['object_id'], day=row['day'], count=row['total'])
+        for row in rows.iterator()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('ecommerce', '0005_entitlement'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='downloadlog',
+            name='downloaded_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.CreateModel(
+            name='DownloadDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_id', models.PositiveIntegerField()),
+                ('day', models.DateField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype')),
+            ],
+            options={
+                'unique_together': {('content_type', 'object_id', 'day')},
+            },
+        ),
+        migrations.RunPython(backfill_rollup, migrations.RunPython.noop),
+    ]
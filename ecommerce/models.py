@@ -1,9 +1,13 @@
 # ecommerce/models.py
 from django.db import models
+from django.db.models.signals import post_save
+from django.dispatch import receiver
 from django.contrib.auth import get_user_model
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.utils import timezone
+from django.utils.functional import cached_property
+from .pricing import CartPricing
 
 User = get_user_model()
 
@@ -15,13 +19,18 @@ class Cart(models.Model):
     def __str__(self):
         return f"Cart for {self.user.username}"
 
+    @cached_property
+    def pricing(self):
+        # Memoized for the lifetime of this instance, i.e. one request.
+        return CartPricing(self)
+
     @property
     def total_amount(self):
-        return sum(item.item.price * item.quantity for item in self.items.all())
+        return self.pricing.total_amount
 
     @property
     def total_credits(self):
-        return sum(item.item.credit_price * item.quantity for item in self.items.all())
+        return self.pricing.total_credits
 
 class CartItem(models.Model):
     cart = models.ForeignKey(Cart, related_name='items', on_delete=models.CASCADE)
@@ -98,13 +107,59 @@ class PurchaseRequest(models.Model):
     def __str__(self):
         return f"Purchase {self.item} by {self.user.username}"
 
+class Entitlement(models.Model):
+    # Denormalized "user owns item" index, filled when an order is paid.
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='entitlements')
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    object_id = models.PositiveIntegerField()
+    item = GenericForeignKey('content_type', 'object_id')
+    order = models.ForeignKey(Order, on_delete=models.SET_NULL, blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ['user', 'content_type', 'object_id']
+
+    def __str__(self):
+        return f"{self.user.username} owns {self.item}"
+
 class DownloadLog(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
     object_id = models.PositiveIntegerField()
     item = GenericForeignKey('content_type', 'object_id')
     ip_address = models.CharField(max_length=45)
-    downloaded_at = models.DateTimeField(auto_now_add=True)
+    # Stamped when the download happens; rows are written later in batches (ecommerce/downloads.py).
+    downloaded_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"Download of {self.item} by {self.user.username}"
+
+class DownloadDaily(models.Model):
+    # Downloads per item per day, maintained by ecommerce/downloads.py.
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    object_id = models.PositiveIntegerField()
+    item = GenericForeignKey('content_type', 'object_id')
+    day = models.DateField()
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ['content_type', 'object_id', 'day']
 
     def __str__(self):
-        return f"Download of {self.item} by {self.user.username}"
\ No newline at end of file
+        return f"{self.count} downloads of {self.item} on {self.day}"
+
+@receiver(post_save, sender=Order)
+def grant_entitlements(sender, instance, **kwargs):
+    if instance.status == 'paid':
+        from .entitlements import grant_for_order
+        grant_for_order(instance)
+
+@receiver(post_save, sender=PurchaseRequest)
+def grant_purchase_entitlement(sender, instance, **kwargs):
+    if instance.status == 'paid' and instance.user_id:
+        Entitlement.objects.get_or_create(
+            user_id=instance.user_id,
+            content_type_id=instance.content_type_id,
+            object_id=instance.object_id,
+            defaults={'order_id': instance.order_id},
+        )
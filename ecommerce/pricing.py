@@ -0,0 +1,33 @@
+# ecommerce/pricing.py
+from decimal import Decimal
+
+
+class CartPricing:
+    """
+    Prices a cart in one pass. All CartItem -> Note/Paper lookups are resolved
+    with a GenericForeignKey prefetch, i.e. one query per content type no
+    matter how many lines the cart has.
+    """
+
+    def __init__(self, cart):
+        self.items = list(
+            cart.items.select_related('content_type').prefetch_related('item').order_by('id')
+        )
+        self.total_amount = Decimal('0.00')
+        self.total_credits = 0
+        for cart_item in self.items:
+            product = cart_item.item
+            if product is None:  # item deleted after it was added to the cart
+                continue
+            self.total_amount += product.price * cart_item.quantity
+            self.total_credits += product.credit_price * cart_item.quantity
+
+    def discount(self, coupon):
+        if not coupon:
+            return 0
+        if coupon.discount_type == 'percentage':
+            return self.total_amount * (coupon.discount_value / 100)
+        return min(coupon.discount_value, self.total_amount)
+
+    def final_amount(self, coupon):
+        return max(0, self.total_amount - self.discount(coupon))
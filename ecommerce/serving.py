@@ -0,0 +1,137 @@
+# ecommerce/serving.py
+# Purchased files are handed out through short-lived signed URLs. The token
+# carries the user, the item and the stored file name, signed with
+# SECRET_KEY and valid for DOWNLOAD_URL_TTL seconds, so serving it needs no
+# database lookup: a valid token is the entitlement check. After that it can
+# still resume an interrupted download for DOWNLOAD_RESUME_TTL seconds, but
+# only for a range starting past byte 0: an expired link never hands out the
+# whole file again. Files on local
+# storage are streamed by serve() with single-range requests (resumable
+# downloads) and ETag/Last-Modified revalidation; remote storages (S3)
+# already sign their URLs and support Range, so those URLs are used as is.
+import mimetypes
+import os
+import re
+
+from django.apps import apps
+from django.conf import settings
+from django.core import signing
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseForbidden
+from django.urls import reverse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+SALT = 'ecommerce.download'
+RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def ttl():
+    return getattr(settings, 'DOWNLOAD_URL_TTL', 300)
+
+
+def resume_ttl():
+    return getattr(settings, 'DOWNLOAD_RESUME_TTL', 24 * 60 * 60)
+
+
+def make_token(user, item):
+    return signing.dumps(
+        {'u': user.pk, 'm': item._meta.label_lower, 'o': item.pk, 'f': item.pdf_file.name}, salt=SALT, compress=True
+    )
+
+
+def read_token(token, resuming=False):
+    """The token's payload, or None if it is forged or expired."""
+    try:
+        return signing.loads(token, salt=SALT, max_age=resume_ttl() if resuming else ttl())
+    except signing.BadSignature:
+        return None
+
+
+def file_path(payload):
+    storage = apps.get_model(payload['m'])._meta.get_field('pdf_file').storage
+    return storage.path(payload['f'])
+
+
+def download_url(user, item):
+    try:
+        item.pdf_file.path
+    except NotImplementedError:
+        return item.pdf_file.url
+    return reverse('ecommerce:serve_download', args=[make_token(user, item)])
+
+
+class RangeFile:
+    """Read-only view of ``length`` bytes of a file starting at ``start``."""
+
+    def __init__(self, file, start, length):
+        file.seek(start)
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def _byte_range(header, size):
+    match = RANGE.match(header.strip())
+    if not match or not (match.group(1) or match.group(2)):
+        return None
+    start, end = match.groups()
+    if start and end and int(end) < int(start):
+        return None  # "bytes=5-2" is not a valid range
+    if not start:
+        # "bytes=-N": the last N bytes
+        start, end = max(size - int(end), 0), size - 1
+    else:
+        start, end = int(start), min(int(end), size - 1) if end else size - 1
+    return start, end
+
+
+def serve(request, path, filename, resume_only=False):
+    """
+    Stream the file at ``path``. With ``resume_only`` (an expired link) only
+    a satisfiable range that starts past the first byte is served.
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        raise Http404('File not found')
+    etag = quote_etag(f'{stat.st_mtime_ns:x}-{stat.st_size:x}')
+    response = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+    if response is not None:
+        return response
+
+    size = stat.st_size
+    headers = {'ETag': etag, 'Last-Modified': http_date(stat.st_mtime), 'Accept-Ranges': 'bytes'}
+    byte_range = None
+    if 'HTTP_RANGE' in request.META and request.META.get('HTTP_IF_RANGE', etag) == etag:
+        byte_range = _byte_range(request.META['HTTP_RANGE'], size)  # malformed ranges are ignored
+        if byte_range is not None and (byte_range[0] >= size or byte_range[0] > byte_range[1]):
+            return HttpResponse(status=416, headers={'Content-Range': f'bytes */{size}', **headers})
+    if resume_only and (byte_range is None or byte_range[0] == 0):
+        return HttpResponseForbidden('This download link has expired.')
+
+    content_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    file = open(path, 'rb')
+    if byte_range is None:
+        # A whole file keeps its fileno, so the server can use wsgi.file_wrapper/sendfile.
+        response = FileResponse(file, as_attachment=True, filename=filename, content_type=content_type)
+    else:
+        start, end = byte_range
+        response = FileResponse(
+            RangeFile(file, start, end - start + 1), as_attachment=True, filename=filename,
+            content_type=content_type, status=206,
+        )
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = str(end - start + 1)
+    for name, value in headers.items():
+        response[name] = value
+    response['Cache-Control'] = 'private, max-age=0'
+    return response
@@ -1,3 +1,226 @@
-from django.test import TestCase
+from decimal import Decimal
+from unittest.mock import patch
 
-# Create your tests here.
+from django.contrib.contenttypes.models import ContentType
+from django.core.files.base import ContentFile
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.test import override_settings
+from django.urls import reverse
+
+from accounts.models import User
+from core.testing import LocalServicesTestCase
+from notes.models import Note
+from papers.models import Paper
+from university.models import Branch, Degree, University
+
+from . import downloads, entitlements, serving
+from .models import Cart, CartItem, DownloadDaily, DownloadLog, Entitlement, Order, OrderItem, PurchaseRequest
+
+
+def make_paper(name='Paper', **kwargs):
+    branch = Branch.objects.first() or Branch.objects.create(
+        degree=Degree.objects.create(university=University.objects.create(name='Uni'), name='BE'), name='Computer'
+    )
+    return Paper.objects.create(branch=branch, name=name, exam_type='insem', year='2023', **kwargs)
+
+
+def add_to(cart, item):
+    return CartItem.objects.create(cart=cart, content_type=ContentType.objects.get_for_model(item), object_id=item.pk)
+
+
+class CartPricingTests(LocalServicesTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('buyer', password='pw', credits=100)
+        self.cart = Cart.objects.create(user=self.user)
+        for number in range(3):
+            add_to(self.cart, Note.objects.create(name=f'Note {number}', price=Decimal('10.00'), credit_price=2))
+            add_to(self.cart, make_paper(f'Paper {number}', price=Decimal('5.50'), credit_price=1))
+
+    def test_totals_take_one_query_per_content_type(self):
+        cart = Cart.objects.get(pk=self.cart.pk)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(cart.total_amount, Decimal('46.50'))
+            self.assertEqual(cart.total_credits, 9)
+            self.assertEqual(len(cart.pricing.items), 6)
+        # cart lines (with content types), notes, papers
+        self.assertEqual(len(queries), 3)
+
+    def test_deleted_items_are_left_out(self):
+        Note.objects.filter(name='Note 0').delete()
+        cart = Cart.objects.get(pk=self.cart.pk)
+        self.assertEqual(cart.total_amount, Decimal('36.50'))
+        self.assertEqual(cart.total_credits, 7)
+
+    def test_cart_view_renders_the_priced_lines(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('ecommerce:cart_view'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['total_amount'], Decimal('46.50'))
+        self.assertContains(response, 'Paper 2')
+
+    def test_credit_checkout_creates_the_order_lines(self):
+        self.client.force_login(self.user)
+        response = self.client.post(reverse('ecommerce:checkout'), {'payment_method': 'credits'})
+        self.assertRedirects(response, reverse('accounts:profile'), fetch_redirect_response=False)
+        order = Order.objects.get(user=self.user)
+        self.assertEqual(order.status, 'paid')
+        self.assertEqual(order.total_credits, 9)
+        self.assertEqual(OrderItem.objects.filter(order=order).count(), 6)
+        self.assertFalse(self.cart.items.exists())
+        self.assertEqual(User.objects.get(pk=self.user.pk).credits, 91)
+
+    def test_credit_checkout_keeps_counters_and_refuses_overspending(self):
+        User.objects.filter(pk=self.user.pk).update(follower_total=4, credits=8)
+        self.client.force_login(self.user)
+        response = self.client.post(reverse('ecommerce:checkout'), {'payment_method': 'credits'})
+        self.assertRedirects(response, reverse('ecommerce:checkout'), fetch_redirect_response=False)
+        User.objects.filter(pk=self.user.pk).update(credits=9)
+        self.client.post(reverse('ecommerce:checkout'), {'payment_method': 'credits'})
+        user = User.objects.get(pk=self.user.pk)
+        self.assertEqual((user.credits, user.follower_total), (0, 4))
+
+
+class EntitlementTests(LocalServicesTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('owner', password='pw')
+        self.notes = [Note.objects.create(name=f'Note {n}', price=Decimal('10.00')) for n in range(3)]
+        self.paper = make_paper(price=Decimal('4.00'))
+
+    def pay_for(self, *items):
+        order = Order.objects.create(user=self.user, payment_method='manual')
+        for item in items:
+            OrderItem.objects.create(
+                order=order, content_type=ContentType.objects.get_for_model(item), object_id=item.pk,
+                price_at_purchase=item.price,
+            )
+        order.status = 'paid'
+        order.save()
+        return order
+
+    def test_paying_an_order_grants_its_items(self):
+        self.pay_for(self.notes[0], self.paper)
+        self.assertTrue(entitlements.user_owns(self.user, self.notes[0]))
+        self.assertTrue(entitlements.user_owns(self.user, self.paper))
+        self.assertFalse(entitlements.user_owns(self.user, self.notes[1]))
+
+    def test_granting_twice_is_harmless(self):
+        order = self.pay_for(self.notes[0])
+        order.save()
+        self.assertEqual(Entitlement.objects.filter(user=self.user).count(), 1)
+
+    def test_ownership_of_a_listing_is_one_query(self):
+        self.pay_for(self.notes[1])
+        items = [*self.notes, self.paper]
+        ContentType.objects.get_for_models(Note, Paper)  # warm the content type cache
+        with self.assertNumQueries(1):
+            marked = entitlements.mark_owned(self.user, items)
+        self.assertEqual([item.is_owned for item in marked], [False, True, False, False])
+
+    def test_paid_purchase_request_grants_the_item(self):
+        PurchaseRequest.objects.create(
+            user=self.user, content_type=ContentType.objects.get_for_model(Note), object_id=self.notes[2].pk,
+            amount_paid=Decimal('10.00'), status='paid',
+        )
+        self.assertTrue(entitlements.user_owns(self.user, self.notes[2]))
+
+    def test_owned_items_are_not_added_to_the_cart_again(self):
+        self.pay_for(self.notes[0])
+        self.client.force_login(self.user)
+        self.client.get(reverse('ecommerce:add_to_cart', args=[self.notes[0].pk]))
+        self.assertFalse(CartItem.objects.exists())
+
+
+class DownloadLogTests(LocalServicesTestCase):
+    def setUp(self):
+        super().setUp()
+        # flush() runs on its own thread in production; here it shares the test transaction.
+        self.enterContext(patch('ecommerce.downloads.close_old_connections'))
+        self.user = User.objects.create_user('reader', password='pw')
+        self.note = Note.objects.create(name='Graphs')
+        self.note_type = ContentType.objects.get_for_model(Note).id
+        self.buffer = downloads.DownloadBuffer(max_size=2, interval=60)
+
+    def add(self):
+        self.buffer.add(self.user.pk, self.note_type, self.note.pk, '10.0.0.1')
+
+    def test_events_are_written_in_one_batch_with_the_rollup(self):
+        with patch.object(downloads.DownloadBuffer, '_start'):
+            self.add()
+            self.add()
+        self.assertFalse(DownloadLog.objects.exists())
+        self.assertEqual(downloads.total(), 0)
+
+        self.buffer.flush()
+        self.assertEqual(DownloadLog.objects.count(), 2)
+        self.assertEqual(DownloadDaily.objects.get(object_id=self.note.pk).count, 2)
+        self.assertEqual(downloads.total(), 2)
+
+    def test_a_full_buffer_starts_one_flush_thread(self):
+        with patch.object(downloads.DownloadBuffer, '_start') as start:
+            for _ in range(5):
+                self.add()
+        timer, drain = (call.args[0] for call in start.call_args_list)
+        self.assertIsInstance(timer, downloads.threading.Timer)
+        self.assertEqual(drain._target, self.buffer._drain)
+
+        self.buffer._drain()
+        self.assertEqual(DownloadLog.objects.count(), 5)
+        self.assertFalse(self.buffer._flushing)
+
+    def test_a_failed_write_is_logged_not_raised(self):
+        with patch.object(downloads.DownloadBuffer, '_start'):
+            self.add()
+        with patch.object(downloads, 'write', side_effect=RuntimeError), self.assertLogs(downloads.logger):
+            self.buffer.flush()
+
+    def test_download_view_buffers_the_event(self):
+        self.note.pdf_file.save('graphs.pdf', ContentFile(b'%PDF'))
+        Entitlement.objects.create(user=self.user, content_type_id=self.note_type, object_id=self.note.pk)
+        self.client.force_login(self.user)
+        with patch.object(downloads.buffer, 'add') as add:
+            response = self.client.get(reverse('ecommerce:download_item', args=[self.note.pk]))
+        self.assertEqual(response.status_code, 302)
+        add.assert_called_once_with(self.user.pk, self.note_type, self.note.pk, '127.0.0.1')
+
+
+class ServeDownloadTests(LocalServicesTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('reader', password='pw')
+        self.note = Note.objects.create(name='Graphs')
+        self.note.pdf_file.save('graphs.pdf', ContentFile(b'0123456789'))
+        self.url = serving.download_url(self.user, self.note)
+
+    def get(self, **headers):
+        return self.client.get(self.url, **headers)
+
+    def body(self, response):
+        return b''.join(response.streaming_content)
+
+    def test_a_fresh_link_serves_the_file_and_ranges(self):
+        response = self.get()
+        self.assertEqual((response.status_code, self.body(response)), (200, b'0123456789'))
+        response = self.get(HTTP_RANGE='bytes=4-6')
+        self.assertEqual((response.status_code, self.body(response)), (206, b'456'))
+        self.assertEqual(response['Content-Range'], 'bytes 4-6/10')
+        self.assertEqual(self.get(HTTP_RANGE='bytes=20-').status_code, 416)
+        self.assertEqual(self.get(HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+    def test_forged_links_are_refused(self):
+        self.assertEqual(self.client.get(self.url.replace('/file/', '/file/x')).status_code, 403)
+
+    @override_settings(DOWNLOAD_URL_TTL=-1)
+    def test_an_expired_link_only_resumes(self):
+        self.assertEqual(self.get().status_code, 403)
+        self.assertEqual(self.get(HTTP_RANGE='bytes=0-').status_code, 403)
+        self.assertEqual(self.get(HTTP_RANGE='bytes=-10').status_code, 403)
+        self.assertEqual(self.get(HTTP_RANGE='bytes=4-', HTTP_IF_RANGE='"stale"').status_code, 403)
+        response = self.get(HTTP_RANGE='bytes=4-')
+        self.assertEqual((response.status_code, self.body(response)), (206, b'456789'))
+
+    @override_settings(DOWNLOAD_URL_TTL=-1, DOWNLOAD_RESUME_TTL=-1)
+    def test_resuming_ends_with_the_resume_window(self):
+        self.assertEqual(self.get(HTTP_RANGE='bytes=4-').status_code, 403)
@@ -20,5 +20,6 @@ urlpatterns = [
     path('my-purchases/', views.my_purchases, name='my_purchases'),
     path('order-history/', views.order_history, name='order_history'),
     path('download/<int:item_id>/', views.download_item, name='download_item'),
+    path('download/file/<str:token>/', views.serve_download, name='serve_download'),
     path('marketplace/', views.marketplace, name='marketplace'),
 ]
@@ -3,18 +3,23 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST
-from django.http import JsonResponse, HttpResponseBadRequest, HttpResponse
+from django.http import JsonResponse, HttpResponseBadRequest, HttpResponse, HttpResponseForbidden
 from django.db import transaction
+from django.db.models import F
 from django.utils import timezone
 from django.conf import settings
 from django.contrib.contenttypes.models import ContentType
+from accounts.models import User
 from accounts.views import jwt_auth
-from .models import Cart, CartItem, Order, OrderItem, PurchaseRequest, DownloadLog
+from .models import Cart, CartItem, Order, OrderItem, PurchaseRequest
+from . import downloads, serving
 from notes.models import Note
 from papers.models import Paper
+import os
 import razorpay
 from django.urls import reverse
 from .models import Coupon
+from .entitlements import user_owns, mark_owned
 
 razorpay_client = razorpay.Client(
     auth=(settings.RAZORPAY_KEY_ID, settings.RAZORPAY_KEY_SECRET)
@@ -23,21 +28,9 @@ razorpay_client = razorpay.Client(
 
 
 
-def _user_already_purchased(user, item):
-    return (
-        OrderItem.objects.filter(
-            order__user=user,
-            content_type=ContentType.objects.get_for_model(item),
-            object_id=item.id,
-            order__status='paid'
-        ).exists() or
-        PurchaseRequest.objects.filter(
-            user=user,
-            content_type=ContentType.objects.get_for_model(item),
-            object_id=item.id,
-            status='paid'
-        ).exists()
-    )
+def _active_coupon(code):
+    now = timezone.now()
+    return Coupon.objects.filter(code=code, is_active=True, valid_from__lte=now, valid_to__gte=now).first()
 
 def _get_or_create_cart(request):
     if request.user.is_authenticated:
@@ -64,7 +57,7 @@ def add_to_cart(request, item_id):
         messages.info(request, "This item is free — open its page to download.")
         return redirect('ecommerce:cart_view')
 
-    if request.user.is_authenticated and _user_already_purchased(request.user, item):
+    if request.user.is_authenticated and user_owns(request.user, item):
         messages.info(request, "You already own this item.")
         return redirect(f"{reverse('accounts:profile')}#item-{item_type}-{item.id}")
 
@@ -97,26 +90,20 @@ def remove_from_cart(request, item_id):
 @jwt_auth
 def cart_view(request):
     cart = _get_or_create_cart(request)
-    items = cart.items.select_related('content_type').all()
+    pricing = cart.pricing
     coupon_code = request.session.get('coupon_code')
-    coupon = Coupon.objects.filter(code=coupon_code, is_active=True, valid_from__lte=timezone.now(), valid_to__gte=timezone.now()).first() if coupon_code else None
-    discount = 0
-    if coupon:
-        if coupon.discount_type == 'percentage':
-            discount = cart.total_amount * (coupon.discount_value / 100)
-        else:
-            discount = min(coupon.discount_value, cart.total_amount)
-    final_amount = max(0, cart.total_amount - discount)
+    coupon = _active_coupon(coupon_code) if coupon_code else None
+    discount = pricing.discount(coupon)
     context = {
         'cart': cart,
-        'items': items,
-        'total_amount': cart.total_amount,
-        'total_credits': cart.total_credits,
+        'items': pricing.items,
+        'total_amount': pricing.total_amount,
+        'total_credits': pricing.total_credits,
         'discount': discount,
-        'final_amount': final_amount,
+        'final_amount': pricing.final_amount(coupon),
         'coupon': coupon,
         'can_pay_with_credits': (
-            cart.total_credits > 0 and (request.user.is_authenticated and request.user.credits >= cart.total_credits)
+            pricing.total_credits > 0 and (request.user.is_authenticated and request.user.credits >= pricing.total_credits)
         ),
         'razorpay_key_id': settings.RAZORPAY_KEY_ID,
     }
@@ -125,34 +112,26 @@ def cart_view(request):
 @jwt_auth
 def checkout(request):
     cart = _get_or_create_cart(request)
-    cart_items = cart.items.select_related('content_type').all()
-    if not cart_items.exists():
+    pricing = cart.pricing
+    cart_items = pricing.items
+    if not cart_items:
         messages.error(request, "Your cart is empty.")
         return redirect('ecommerce:cart_view')
 
     coupon = None
-    discount = 0
     if request.method == 'POST' and 'coupon_code' in request.POST:
         code = request.POST.get('coupon_code')
-        coupon = Coupon.objects.filter(code=code, is_active=True, valid_from__lte=timezone.now(), valid_to__gte=timezone.now()).first()
+        coupon = _active_coupon(code)
         if coupon:
-            if coupon.discount_type == 'percentage':
-                discount = cart.total_amount * (coupon.discount_value / 100)
-            else:
-                discount = min(coupon.discount_value, cart.total_amount)
             request.session['coupon_code'] = code
             messages.success(request, 'Coupon applied!')
         else:
             messages.error(request, 'Invalid coupon.')
     elif request.session.get('coupon_code'):
-        coupon = Coupon.objects.filter(code=request.session.get('coupon_code'), is_active=True, valid_from__lte=timezone.now(), valid_to__gte=timezone.now()).first()
-        if coupon:
-            if coupon.discount_type == 'percentage':
-                discount = cart.total_amount * (coupon.discount_value / 100)
-            else:
-                discount = min(coupon.discount_value, cart.total_amount)
+        coupon = _active_coupon(request.session.get('coupon_code'))
+    discount = pricing.discount(coupon)
 
-    final_amount = max(0, cart.total_amount - discount)
+    final_amount = pricing.final_amount(coupon)
     if request.method == 'POST' and 'payment_method' in request.POST:
         payment_method = request.POST.get('payment_method')
         with transaction.atomic():
@@ -160,11 +139,11 @@ def checkout(request):
                 user=request.user if request.user.is_authenticated else None,
                 payment_method=payment_method,
                 total_amount=final_amount,
-                total_credits=cart.total_credits,
+                total_credits=pricing.total_credits,
                 status='processing' if payment_method == 'razorpay' else 'pending'
             )
-            for ci in cart_items:
-                OrderItem.objects.create(
+            OrderItem.objects.bulk_create([
+                OrderItem(
                     order=order,
                     content_type=ci.content_type,
                     object_id=ci.object_id,
@@ -172,6 +151,9 @@ def checkout(request):
                     price_at_purchase=ci.item.price,
                     credits_at_purchase=ci.item.credit_price,
                 )
+                for ci in cart_items
+            ])
+            for ci in cart_items:
                 PurchaseRequest.objects.get_or_create(
                     user=request.user if request.user.is_authenticated else None,
                     content_type=ci.content_type,
@@ -179,14 +161,17 @@ def checkout(request):
                     defaults={'order': order, 'amount_paid': ci.item.price, 'credits_used': ci.item.credit_price, 'status': 'pending'}
                 )
             if payment_method == 'credits' and request.user.is_authenticated:
-                if cart.total_credits <= 0:
+                if pricing.total_credits <= 0:
                     messages.error(request, "This cart cannot be paid with credits.")
                     return redirect('ecommerce:checkout')
-                if request.user.credits < cart.total_credits:
-                    messages.error(request, f"Insufficient credits. Needed: {cart.total_credits}, You have: {request.user.credits}")
+                # A conditional UPDATE, so two checkouts can't both spend the same credits
+                # and no other column of the user row is written back.
+                charged = User.objects.filter(
+                    pk=request.user.pk, credits__gte=pricing.total_credits
+                ).update(credits=F('credits') - pricing.total_credits)
+                if not charged:
+                    messages.error(request, f"Insufficient credits. Needed: {pricing.total_credits}, You have: {request.user.credits}")
                     return redirect('ecommerce:checkout')
-                request.user.credits -= cart.total_credits
-                request.user.save()
                 order.status = 'paid'
                 order.paid_at = timezone.now()
                 order.save()
@@ -227,13 +212,13 @@ def checkout(request):
     context = {
         'cart': cart,
         'cart_items': cart_items,
-        'total_amount': cart.total_amount,
-        'total_credits': cart.total_credits,
+        'total_amount': pricing.total_amount,
+        'total_credits': pricing.total_credits,
         'discount': discount,
         'final_amount': final_amount,
         'coupon': coupon,
         'can_pay_with_credits': (
-            cart.total_credits > 0 and request.user.is_authenticated and request.user.credits >= cart.total_credits
+            pricing.total_credits > 0 and request.user.is_authenticated and request.user.credits >= pricing.total_credits
         ),
         'razorpay_key_id': settings.RAZORPAY_KEY_ID,
     }
@@ -301,20 +286,30 @@ def download_item(request, item_id):
         item = get_object_or_404(Paper, id=item_id, is_active=True)
     else:
         item = get_object_or_404(Note, id=item_id, is_active=True)
-    if _user_already_purchased(request.user, item):
+    if user_owns(request.user, item):
         if not item.pdf_file:
             messages.error(request, f"The file for “{item}” is not available. Please contact support.")
             return redirect('accounts:profile')
-        DownloadLog.objects.create(
-            user=request.user,
-            content_type=ContentType.objects.get_for_model(item),
-            object_id=item.id,
-            ip_address=request.META.get('REMOTE_ADDR')
+        downloads.buffer.add(
+            request.user.id,
+            ContentType.objects.get_for_model(item).id,  # cached by ContentTypeManager
+            item.id,
+            request.META.get('REMOTE_ADDR')
         )
-        return redirect(item.pdf_file.url)
+        return redirect(serving.download_url(request.user, item))
     messages.error(request, "You don’t have access to this item.")
     return redirect('ecommerce:cart_view')
 
+def serve_download(request, token):
+    # The signed token is the entitlement check; see ecommerce/serving.py.
+    payload = serving.read_token(token)
+    resuming = payload is None and 'HTTP_RANGE' in request.META
+    if resuming:
+        payload = serving.read_token(token, resuming=True)
+    if payload is None:
+        return HttpResponseForbidden("This download link is invalid or has expired.")
+    return serving.serve(request, serving.file_path(payload), os.path.basename(payload['f']), resume_only=resuming)
+
 
 from django.core.paginator import Paginator
 from django.shortcuts import render
@@ -322,8 +317,9 @@ from .models import Cart  # or whatever items you're loading
 
 def marketplace(request):
     # Fetch real data for the marketplace from Note and Paper models
-    featured_notes = Note.objects.filter(is_active=True).order_by('-created_at')[:6]
-    featured_papers = Paper.objects.filter(is_active=True).select_related('branch').order_by('-created_at')[:6]
+    featured_notes = list(Note.objects.filter(is_active=True).order_by('-created_at')[:6])
+    featured_papers = list(Paper.objects.filter(is_active=True).select_related('branch').order_by('-created_at')[:6])
+    mark_owned(request.user, featured_notes + featured_papers)
     
     # Calculate marketplace stats
     from university.models import University
@@ -1,26 +1,42 @@
+import asyncio
 import json
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
 from django.utils import timezone
-from .models import Message, ChatRoom, Participant
+from .models import Message, Participant
+from notifications.unread import push_totals
+from . import history, presence, unread, writebehind
 
 class ChatConsumer(AsyncWebsocketConsumer):
     async def connect(self):
         self.room_id = self.scope['url_route']['kwargs']['room_id']
         self.room_group_name = f'chat_{self.room_id}'
         self.user = self.scope['user']
+        self.joined = False
 
-        if not await self.can_access_room():
+        member_ids = await self.room_members()
+        if self.user.pk not in member_ids:
             await self.close()
             return
 
         await self.channel_layer.group_add(self.room_group_name, self.channel_name)
         await self.accept()
-        await self.update_online_status(True)
+        self.joined = True
+        if await presence.join(self.room_id, self.user.pk):
+            await self.broadcast_presence(True)
+        await self.send(text_data=json.dumps({
+            'type': 'presence',
+            'online': sorted(await presence.aonline(self.room_id, member_ids)),
+            'heartbeat': presence.heartbeat_interval(),
+        }))
+        await self.mark_read()
 
     async def disconnect(self, close_code):
         await self.channel_layer.group_discard(self.room_group_name, self.channel_name)
-        await self.update_online_status(False)
+        if self.joined:
+            if await presence.leave(self.room_id, self.user.pk):
+                await self.broadcast_presence(False)
+            await database_sync_to_async(presence.recorder.flush_due)()
 
     async def receive(self, text_data):
         data = json.loads(text_data)
@@ -29,7 +45,13 @@ class ChatConsumer(AsyncWebsocketConsumer):
         if message_type == 'message':
             content = data.get('content')
             image = data.get('image')
-            await self.save_message(content, image)
+            saved = writebehind.buffer.add(Message(
+                room_id=self.room_id,
+                user_id=self.user.pk,
+                content=content or '',
+                image=image or None,  # Handle file upload separately if needed
+            ))
+            asyncio.ensure_future(self.acknowledge(saved, data.get('client_id')))
             await self.channel_layer.group_send(
                 self.room_group_name,
                 {
@@ -41,6 +63,15 @@ class ChatConsumer(AsyncWebsocketConsumer):
                     'timestamp': timezone.now().isoformat()
                 }
             )
+        elif message_type == 'heartbeat':
+            if await presence.heartbeat(self.room_id, self.user.pk):
+                await self.broadcast_presence(True)
+            await database_sync_to_async(presence.recorder.flush_due)()
+        elif message_type == 'mark_read':
+            await self.mark_read()
+        elif message_type == 'load_before':
+            page = await self.load_before(data.get('before'), history.clamp_limit(data.get('limit')))
+            await self.send(text_data=json.dumps({'type': 'history', **page}))
         elif message_type == 'typing':
             is_typing = data.get('is_typing')
             await self.channel_layer.group_send(
@@ -69,22 +100,52 @@ class ChatConsumer(AsyncWebsocketConsumer):
             'is_typing': event['is_typing']
         }))
 
+    async def presence_update(self, event):
+        await self.send(text_data=json.dumps({
+            'type': 'presence',
+            'user_id': event['user_id'],
+            'user': event['user'],
+            'is_online': event['is_online']
+        }))
+
+    async def broadcast_presence(self, is_online):
+        await self.channel_layer.group_send(
+            self.room_group_name,
+            {
+                'type': 'presence_update',
+                'user_id': self.user.pk,
+                'user': self.user.username,
+                'is_online': is_online
+            }
+        )
+
     @database_sync_to_async
-    def can_access_room(self):
-        return Participant.objects.filter(user=self.user, room_id=self.room_id).exists()
+    def room_members(self):
+        return set(Participant.objects.filter(room_id=self.room_id).values_list('user_id', flat=True))
 
     @database_sync_to_async
-    def save_message(self, content, image_url=None):
-        room = ChatRoom.objects.get(id=self.room_id)
-        Message.objects.create(
-            room=room,
-            user=self.user,
-            content=content,
-            image=image_url  # Handle file upload separately if needed
-        )
+    def load_before(self, before, limit):
+        return history.history_page(self.room_id, before, limit)
+
+    async def acknowledge(self, saved, client_id):
+        # Tell the sender once its message is durable (or that it was lost).
+        try:
+            message = await saved
+        except Exception:
+            await self.send(text_data=json.dumps({
+                'type': 'error',
+                'client_id': client_id,
+                'error': 'Message could not be saved'
+            }))
+            return
+        await self.send(text_data=json.dumps({
+            'type': 'ack',
+            'client_id': client_id,
+            'id': message.pk,
+            'timestamp': message.created_at.isoformat()
+        }))
 
     @database_sync_to_async
-    def update_online_status(self, is_online):
-        Participant.objects.filter(user=self.user, room_id=self.room_id).update(
-            last_seen=timezone.now() if is_online else None
-        )
\ No newline at end of file
+    def mark_read(self):
+        if unread.mark_room_read(self.user.pk, self.room_id):
+            push_totals(self.user.pk, room_id=int(self.room_id), room_unread=0)
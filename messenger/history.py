@@ -0,0 +1,69 @@
+# messenger/history.py
+# Keyset pagination over a room's messages. Pages walk the (room, created_at)
+# index backwards from a cursor "<created_at iso>_<id>", so the cost of a page
+# does not grow with how far back the reader has scrolled.
+from datetime import datetime
+
+from django.db.models import Q
+
+from .models import Message
+
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def encode_cursor(message):
+    return f'{message.created_at.isoformat()}_{message.pk}'
+
+
+def decode_cursor(value):
+    """``(created_at, id)`` for a cursor string, or None if it is missing or malformed."""
+    try:
+        created_at, pk = value.rsplit('_', 1)
+        return datetime.fromisoformat(created_at), int(pk)
+    except (AttributeError, ValueError):
+        return None
+
+
+def clamp_limit(value, default=PAGE_SIZE):
+    try:
+        return max(1, min(int(value), MAX_PAGE_SIZE))
+    except (TypeError, ValueError):
+        return default
+
+
+def messages_before(room_id, before=None, limit=PAGE_SIZE):
+    """
+    Up to ``limit`` messages older than the cursor ``before`` (or the newest
+    ones), oldest first, plus the cursor for the page before them or None.
+    """
+    messages = Message.objects.filter(room_id=room_id)
+    position = decode_cursor(before) if before else None
+    if position:
+        created_at, pk = position
+        messages = messages.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk))
+    rows = list(
+        messages.select_related('user')
+        .only('id', 'room_id', 'content', 'image', 'created_at', 'user__username', 'user__profile_picture')
+        .order_by('-created_at', '-id')[:limit + 1]
+    )
+    next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    rows = rows[:limit]
+    rows.reverse()
+    return rows, next_cursor
+
+
+def serialize(message):
+    return {
+        'id': message.pk,
+        'user': message.user.username,
+        'user_id': message.user_id,
+        'content': message.content,
+        'image': message.image.url if message.image else '',
+        'timestamp': message.created_at.isoformat(),
+    }
+
+
+def history_page(room_id, before=None, limit=PAGE_SIZE):
+    rows, next_cursor = messages_before(room_id, before, limit)
+    return {'messages': [serialize(message) for message in rows], 'next_cursor': next_cursor}
@@ -0,0 +1,34 @@
+# Generated by Django 4.2 on 2026-10-18 21:55
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_last_message(apps, schema_editor):
+    ChatRoom = apps.get_model('messenger', 'ChatRoom')
+    Message = apps.get_model('messenger', 'Message')
+    for room in ChatRoom.objects.all().iterator():
+        message = Message.objects.filter(room=room).order_by('-created_at', '-id').first()
+        if message is not None:
+            ChatRoom.objects.filter(pk=room.pk).update(last_message=message, last_message_at=message.created_at)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messenger', '0002_participant_read_cursor'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatroom',
+            name='last_message',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='messenger.message'),
+        ),
+        migrations.AddField(
+            model_name='chatroom',
+            name='last_message_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.RunPython(backfill_last_message, migrations.RunPython.noop),
+    ]
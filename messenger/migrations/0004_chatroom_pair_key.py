@@ -0,0 +1,40 @@
+# Generated by Django 4.2 on 2026-10-18 21:56
+
+from django.db import migrations, models
+
+
+def backfill_pair_key(apps, schema_editor):
+    ChatRoom = apps.get_model('messenger', 'ChatRoom')
+    Participant = apps.get_model('messenger', 'Participant')
+    members = {}
+    for room_id, user_id in Participant.objects.filter(room__room_type='one_to_one').values_list('room_id', 'user_id'):
+        members.setdefault(room_id, []).append(user_id)
+    # Duplicate rooms for a pair keep no key; the most recently active one gets it.
+    rooms = ChatRoom.objects.filter(id__in=members).order_by(
+        models.F('last_message_at').desc(nulls_last=True), '-created_at'
+    ).values_list('id', flat=True)
+    seen = set()
+    for room_id in rooms:
+        user_ids = sorted(members[room_id])
+        if len(user_ids) != 2:
+            continue
+        key = f'{user_ids[0]}:{user_ids[1]}'
+        if key not in seen:
+            seen.add(key)
+            ChatRoom.objects.filter(pk=room_id).update(pair_key=key)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messenger', '0003_chatroom_last_message'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatroom',
+            name='pair_key',
+            field=models.CharField(blank=True, editable=False, max_length=41, null=True, unique=True),
+        ),
+        migrations.RunPython(backfill_pair_key, migrations.RunPython.noop),
+    ]
@@ -1,9 +1,15 @@
 from django.db import models
+from django.db.models.signals import post_save
+from django.dispatch import Signal, receiver
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 
 User = get_user_model()
 
+# Sent with messages=[...] after a batch written by messenger/writebehind.py
+# commits; bulk_create sends no post_save.
+messages_saved = Signal()
+
 class ChatRoom(models.Model):
     ROOM_TYPES = (
         ('one_to_one', 'One to One'),
@@ -14,6 +20,11 @@ class ChatRoom(models.Model):
     participants = models.ManyToManyField(User, through='Participant', related_name='chat_rooms')
     created_at = models.DateTimeField(auto_now_add=True)
     is_active = models.BooleanField(default=True)
+    # "<low user id>:<high user id>" for one_to_one rooms, see messenger/rooms.py.
+    pair_key = models.CharField(max_length=41, unique=True, null=True, blank=True, editable=False)
+    # Denormalized by messenger/rooms.py whenever messages are written.
+    last_message = models.ForeignKey('Message', on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    last_message_at = models.DateTimeField(null=True, blank=True, db_index=True)
 
     def __str__(self):
         return self.name or f"Chat {self.id}"
@@ -27,6 +38,9 @@ class Participant(models.Model):
     is_admin = models.BooleanField(default=False)
     joined_at = models.DateTimeField(auto_now_add=True)
     last_seen = models.DateTimeField(default=timezone.now)
+    # Read cursor: maintained by messenger/unread.py as messages are written and rooms opened.
+    last_read = models.ForeignKey('Message', on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    unread_count = models.PositiveIntegerField(default=0)
 
     def __str__(self):
         return f"{self.user.username} in {self.room}"
@@ -47,4 +61,14 @@ class Message(models.Model):
 
     class Meta:
         ordering = ['created_at']
-        indexes = [models.Index(fields=['room', 'created_at'])]
\ No newline at end of file
+        indexes = [models.Index(fields=['room', 'created_at'])]
+
+
+@receiver(post_save, sender=Message)
+def record_message(sender, instance, created, **kwargs):
+    # Websocket messages are bulk-created and recorded in messenger/writebehind.py.
+    if created:
+        from .rooms import touch_rooms
+        from .unread import count_new_messages
+        touch_rooms([instance])
+        count_new_messages([instance])
@@ -0,0 +1,124 @@
+# messenger/presence.py
+# Who is online in a room, kept in the cache (Redis in production) instead of
+# the database. A presence:<room>:<user> key counts the user's open sockets in
+# the room and their heartbeats keep it alive; a key that misses PRESENCE_TTL
+# seconds of heartbeats expires on its own, so dropped mobile connections need
+# no cleanup. Participant.last_seen is only persisted in batches: timestamps are
+# collected in memory and written with one bulk_update at most every
+# PRESENCE_FLUSH_INTERVAL seconds (and at exit).
+import atexit
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Participant
+
+
+def ttl():
+    return getattr(settings, 'PRESENCE_TTL', 90)
+
+
+def heartbeat_interval():
+    # Three heartbeats per TTL, so one lost frame does not drop a user.
+    return ttl() // 3
+
+
+def _key(room_id, user_id):
+    return f'presence:{room_id}:{user_id}'
+
+
+async def join(room_id, user_id):
+    """Count a socket of the user; True if they were not online before."""
+    recorder.record(room_id, user_id)
+    key = _key(room_id, user_id)
+    if await cache.aadd(key, 1, ttl()):
+        return True
+    try:
+        await cache.aincr(key)
+    except ValueError:
+        # Expired in between.
+        return await cache.aadd(key, 1, ttl())
+    return False
+
+
+async def heartbeat(room_id, user_id):
+    """Refresh the user's key; True if it had expired and they are back online."""
+    recorder.record(room_id, user_id)
+    if await cache.atouch(_key(room_id, user_id), ttl()):
+        return False
+    return await cache.aadd(_key(room_id, user_id), 1, ttl())
+
+
+async def leave(room_id, user_id):
+    """Uncount a socket of the user; True if it was their last one."""
+    recorder.record(room_id, user_id)
+    key = _key(room_id, user_id)
+    try:
+        if await cache.adecr(key) > 0:
+            return False
+    except ValueError:
+        return False  # already expired
+    # A tab that joins between the decr and this delete puts the key back
+    # with its next heartbeat.
+    await cache.adelete(key)
+    return True
+
+
+def online(room_id, user_ids):
+    """The subset of ``user_ids`` online in the room, in one cache round trip."""
+    found = cache.get_many([_key(room_id, user_id) for user_id in user_ids])
+    return {user_id for user_id in user_ids if _key(room_id, user_id) in found}
+
+
+async def aonline(room_id, user_ids):
+    found = await cache.aget_many([_key(room_id, user_id) for user_id in user_ids])
+    return {user_id for user_id in user_ids if _key(room_id, user_id) in found}
+
+
+def write_last_seen(seen):
+    """Persist ``{(room_id, user_id): datetime}`` with one SELECT and one bulk UPDATE."""
+    if not seen:
+        return 0
+    lookup = Q()
+    for room_id, user_id in seen:
+        lookup |= Q(room_id=room_id, user_id=user_id)
+    participants = list(Participant.objects.filter(lookup).only('id', 'room_id', 'user_id'))
+    for participant in participants:
+        participant.last_seen = seen[(participant.room_id, participant.user_id)]
+    Participant.objects.bulk_update(participants, ['last_seen'], batch_size=500)
+    return len(participants)
+
+
+class LastSeenRecorder:
+    def __init__(self, interval):
+        self.interval = interval
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._flushed_at = time.monotonic()
+
+    def record(self, room_id, user_id):
+        with self._lock:
+            self._pending[(int(room_id), int(user_id))] = timezone.now()
+
+    def _take(self):
+        with self._lock:
+            batch, self._pending = self._pending, {}
+            self._flushed_at = time.monotonic()
+        return batch
+
+    def flush_due(self):
+        """Write the pending timestamps if the interval has passed. Call from sync code."""
+        if self._pending and time.monotonic() - self._flushed_at >= self.interval:
+            return write_last_seen(self._take())
+        return 0
+
+    def flush(self):
+        return write_last_seen(self._take())
+
+
+recorder = LastSeenRecorder(getattr(settings, 'PRESENCE_FLUSH_INTERVAL', 30))
+atexit.register(recorder.flush)
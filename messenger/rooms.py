@@ -0,0 +1,88 @@
+# messenger/rooms.py
+from collections import defaultdict
+
+from django.core.paginator import Paginator
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+
+from .models import ChatRoom, Participant
+
+CHAT_LIST_PAGE_SIZE = 20
+
+
+def pair_key(user_id, other_id):
+    low, high = sorted((user_id, other_id))
+    return f'{low}:{high}'
+
+
+def direct_room(user, other_user):
+    """
+    The one_to_one room for two users as ``(room, created)``, found by the
+    unique pair_key. Two concurrent requests for a new pair both try the
+    insert; the loser's IntegrityError means the room now exists, so it is
+    read back instead.
+    """
+    key = pair_key(user.pk, other_user.pk)
+    room = ChatRoom.objects.filter(pair_key=key).first()
+    if room is not None:
+        if not room.is_active:
+            ChatRoom.objects.filter(pk=room.pk).update(is_active=True)
+            room.is_active = True
+        return room, False
+    try:
+        with transaction.atomic():
+            room = ChatRoom.objects.create(room_type='one_to_one', pair_key=key)
+            Participant.objects.bulk_create([
+                Participant(user=user, room=room),
+                Participant(user=other_user, room=room),
+            ])
+    except IntegrityError:
+        return ChatRoom.objects.get(pair_key=key), False
+    return room, True
+
+
+def touch_rooms(messages):
+    """Point each room's last_message/last_message_at at the newest of ``messages``."""
+    latest = {}
+    for message in messages:
+        current = latest.get(message.room_id)
+        if current is None or (message.created_at, message.pk) > (current.created_at, current.pk):
+            latest[message.room_id] = message
+    for room_id, message in latest.items():
+        ChatRoom.objects.filter(
+            Q(last_message_at__isnull=True) | Q(last_message_at__lte=message.created_at), pk=room_id
+        ).update(last_message=message, last_message_at=message.created_at)
+
+
+def chat_list_page(user, search_query='', page_number=None):
+    """
+    A page of the user's rooms, most recently active first, in a fixed number
+    of queries. Each room carries ``unread_count``, ``members`` (the other
+    participants' users), ``other_user`` and its ``last_message`` with author.
+    """
+    memberships = (
+        Participant.objects.filter(user=user, room__is_active=True)
+        .select_related('room__last_message__user')
+        .order_by(F('room__last_message_at').desc(nulls_last=True), '-room__created_at', '-room_id')
+    )
+    if search_query:
+        matching = ChatRoom.objects.filter(
+            Q(name__icontains=search_query) | Q(participants__username__icontains=search_query)
+        ).values('id')
+        memberships = memberships.filter(room_id__in=matching)
+    page_obj = Paginator(memberships, CHAT_LIST_PAGE_SIZE).get_page(page_number)
+
+    rooms = []
+    for membership in page_obj:
+        room = membership.room
+        room.unread_count = membership.unread_count
+        rooms.append(room)
+    members = defaultdict(list)
+    others = Participant.objects.filter(room_id__in=[room.id for room in rooms]).exclude(user=user).select_related('user')
+    for participant in others.order_by('joined_at', 'id'):
+        members[participant.room_id].append(participant.user)
+    for room in rooms:
+        room.members = members[room.id]
+        room.other_user = room.members[0] if room.members else None
+    page_obj.object_list = rooms
+    return page_obj
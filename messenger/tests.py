@@ -1,3 +1,224 @@
-from django.test import TestCase
+import asyncio
 
-# Create your tests here.
+from datetime import timedelta
+
+from asgiref.sync import async_to_sync
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import User
+from core.testing import LocalServicesTestCase, LocalServicesTransactionTestCase
+
+from . import history, presence, rooms, unread, writebehind
+from .models import ChatRoom, Message, Participant, messages_saved
+from .routing import websocket_urlpatterns
+
+
+class ChatRoomsMixin:
+    def setUp(self):
+        super().setUp()
+        self.alice = User.objects.create_user('alice', password='pw')
+        self.bob = User.objects.create_user('bob', password='pw')
+        self.room, _ = rooms.direct_room(self.alice, self.bob)
+
+    def say(self, user, content, room=None):
+        return Message.objects.create(room=room or self.room, user=user, content=content)
+
+
+class ChatTestCase(ChatRoomsMixin, LocalServicesTestCase):
+    pass
+
+
+class MessageHistoryTests(ChatTestCase):
+    def test_pages_walk_backwards_from_the_cursor(self):
+        for n in range(5):
+            self.say(self.alice, f'm{n}')
+        rows, cursor = history.messages_before(self.room.pk, limit=2)
+        self.assertEqual([row.content for row in rows], ['m3', 'm4'])
+        rows, cursor = history.messages_before(self.room.pk, cursor, limit=2)
+        self.assertEqual([row.content for row in rows], ['m1', 'm2'])
+        rows, cursor = history.messages_before(self.room.pk, cursor, limit=2)
+        self.assertEqual(([row.content for row in rows], cursor), (['m0'], None))
+
+    def test_messages_sharing_a_timestamp_are_split_by_id(self):
+        messages = [self.say(self.alice, f'm{n}') for n in range(3)]
+        Message.objects.filter(room=self.room).update(created_at=messages[0].created_at)
+        rows, cursor = history.messages_before(self.room.pk, limit=2)
+        rows, _ = history.messages_before(self.room.pk, cursor, limit=2)
+        self.assertEqual([row.content for row in rows], ['m0'])
+
+    def test_malformed_cursors_and_limits_fall_back(self):
+        self.assertIsNone(history.decode_cursor('garbage'))
+        self.assertEqual((history.clamp_limit('x'), history.clamp_limit('9999')), (50, 200))
+
+    def test_history_api_is_for_participants_only(self):
+        self.say(self.bob, 'hi')
+        url = reverse('messenger:message_history', args=[self.room.pk])
+        self.client.force_login(self.alice)
+        response = self.client.get(url, {'limit': 10})
+        self.assertEqual([m['content'] for m in response.json()['messages']], ['hi'])
+        self.client.force_login(User.objects.create_user('eve', password='pw'))
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+
+class WriteBehindTests(ChatTestCase):
+    def test_a_batch_is_one_insert_that_updates_rooms_and_counters(self):
+        saved = []
+        messages_saved.connect(lambda messages, **kwargs: saved.extend(messages), weak=False, dispatch_uid='test')
+        self.addCleanup(messages_saved.disconnect, dispatch_uid='test')
+        batch = [Message(room=self.room, user=self.alice, content=f'a{n}') for n in range(3)]
+        batch.append(Message(room=self.room, user=self.bob, content='b'))
+
+        with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True):
+            writebehind.write(batch)
+        inserts = [q for q in queries if q['sql'].startswith('INSERT INTO "messenger_message"')]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(saved, batch)
+        self.room.refresh_from_db()
+        self.assertEqual(self.room.last_message.content, 'b')
+        unread = dict(Participant.objects.filter(room=self.room).values_list('user__username', 'unread_count'))
+        self.assertEqual(unread, {'alice': 1, 'bob': 3})
+
+
+class MessageBufferTests(ChatRoomsMixin, LocalServicesTransactionTestCase):
+    async def test_full_buffer_writes_at_once(self):
+        buffer = writebehind.MessageBuffer(max_size=2, interval=60)
+        futures = [buffer.add(Message(room=self.room, user=self.alice, content=f'm{n}')) for n in range(2)]
+        written = await asyncio.wait_for(asyncio.gather(*futures), 5)
+        self.assertTrue(all(message.pk for message in written))
+
+    async def test_partial_buffer_writes_after_the_interval(self):
+        buffer = writebehind.MessageBuffer(max_size=100, interval=0.01)
+        message = await asyncio.wait_for(buffer.add(Message(room=self.room, user=self.bob, content='late')), 5)
+        self.assertEqual(await Message.objects.filter(pk=message.pk).acount(), 1)
+
+
+class UnreadCounterTests(ChatTestCase):
+    def unread(self, user):
+        return Participant.objects.get(room=self.room, user=user).unread_count
+
+    def test_messages_count_for_the_other_participants(self):
+        self.say(self.alice, 'one')
+        self.say(self.alice, 'two')
+        self.assertEqual((self.unread(self.alice), self.unread(self.bob)), (0, 2))
+
+    def test_readers_with_the_room_open_are_not_counted(self):
+        async_to_sync(presence.join)(self.room.pk, self.bob.pk)
+        self.say(self.alice, 'seen live')
+        self.assertEqual(self.unread(self.bob), 0)
+
+    def test_opening_the_room_marks_it_read(self):
+        self.say(self.alice, 'one')
+        latest = self.say(self.alice, 'two')
+        self.client.force_login(self.bob)
+        response = self.client.get(reverse('messenger:chat_room', args=[self.room.pk]))
+        self.assertEqual(response.status_code, 200)
+        participant = Participant.objects.get(room=self.room, user=self.bob)
+        self.assertEqual((participant.unread_count, participant.last_read_id), (0, latest.pk))
+        self.assertFalse(unread.mark_room_read(self.bob.pk, self.room.pk))
+
+
+class ChatListTests(ChatTestCase):
+    def add_rooms(self, count, start=0):
+        for n in range(start, start + count):
+            other = User.objects.create_user(f'friend{n}', password='pw')
+            room, _ = rooms.direct_room(self.alice, other)
+            self.say(other, f'hello from {n}', room=room)
+
+    def test_query_count_does_not_grow_with_rooms(self):
+        self.add_rooms(2)
+        with CaptureQueriesContext(connection) as few:
+            list(rooms.chat_list_page(self.alice))
+        self.add_rooms(5, start=2)
+        with CaptureQueriesContext(connection) as many:
+            page = rooms.chat_list_page(self.alice)
+            rows = [
+                (room.other_user.username, room.last_message and room.last_message.content, room.unread_count)
+                for room in page
+            ]
+        self.assertEqual(len(few), len(many))
+        self.assertEqual(rows[0], ('friend6', 'hello from 6', 1))
+        self.assertEqual(rows[-1], ('bob', None, 0))  # no messages yet, so it sorts last
+
+    def test_search_matches_participants(self):
+        self.add_rooms(2)
+        page = rooms.chat_list_page(self.alice, search_query='friend1')
+        self.assertEqual([room.other_user.username for room in page], ['friend1'])
+
+    def test_chat_list_page_renders(self):
+        self.say(self.bob, 'ping')
+        self.client.force_login(self.alice)
+        self.assertContains(self.client.get(reverse('messenger:chat_list')), 'ping')
+
+class DirectRoomTests(ChatTestCase):
+    def test_either_user_finds_the_same_room(self):
+        self.assertEqual(rooms.direct_room(self.bob, self.alice), (self.room, False))
+
+    def test_an_inactive_room_is_reopened(self):
+        ChatRoom.objects.filter(pk=self.room.pk).update(is_active=False)
+        room, created = rooms.direct_room(self.alice, self.bob)
+        self.assertEqual((room.pk, created, ChatRoom.objects.get(pk=room.pk).is_active), (self.room.pk, False, True))
+
+    def test_start_chat_reuses_the_room(self):
+        self.client.force_login(self.bob)
+        response = self.client.get(reverse('messenger:start_chat', args=['alice']))
+        self.assertRedirects(response, reverse('messenger:chat_room', args=[self.room.pk]), fetch_redirect_response=False)
+        self.assertEqual(ChatRoom.objects.count(), 1)
+
+
+class PresenceTests(ChatTestCase):
+    def test_users_stay_online_until_their_last_socket_closes(self):
+        room, user = self.room.pk, self.alice.pk
+        self.assertEqual([async_to_sync(presence.join)(room, user) for _ in range(2)], [True, False])
+        self.assertFalse(async_to_sync(presence.leave)(room, user))
+        self.assertEqual(presence.online(room, [user, self.bob.pk]), {user})
+        self.assertTrue(async_to_sync(presence.leave)(room, user))
+        self.assertEqual(presence.online(room, [user]), set())
+
+    def test_a_heartbeat_after_expiry_brings_the_user_back(self):
+        async_to_sync(presence.join)(self.room.pk, self.alice.pk)
+        self.assertFalse(async_to_sync(presence.heartbeat)(self.room.pk, self.alice.pk))
+        cache.clear()  # the key expired
+        self.assertTrue(async_to_sync(presence.heartbeat)(self.room.pk, self.alice.pk))
+
+    def test_last_seen_is_written_in_one_bulk_update(self):
+        seen = timezone.now() + timedelta(minutes=5)
+        with self.assertNumQueries(2):
+            written = presence.write_last_seen({(self.room.pk, self.alice.pk): seen, (self.room.pk, self.bob.pk): seen})
+        self.assertEqual(written, 2)
+        self.assertEqual(set(Participant.objects.values_list('last_seen', flat=True)), {seen})
+
+
+class ChatConsumerTests(ChatRoomsMixin, LocalServicesTransactionTestCase):
+    async def connect(self, user):
+        communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), f'/ws/messenger/{self.room.pk}/')
+        communicator.scope['user'] = user
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        return communicator
+
+    async def test_presence_is_announced_to_the_room(self):
+        alice = await self.connect(self.alice)
+        snapshot = await alice.receive_json_from()
+        self.assertEqual((snapshot['type'], snapshot['online']), ('presence', [self.alice.pk]))
+        self.assertEqual((await alice.receive_json_from())['user_id'], self.alice.pk)  # her own arrival
+
+        bob = await self.connect(self.bob)
+        update = await alice.receive_json_from()
+        self.assertEqual((update['user_id'], update['is_online']), (self.bob.pk, True))
+        await bob.disconnect()
+        update = await alice.receive_json_from()
+        self.assertEqual((update['user_id'], update['is_online']), (self.bob.pk, False))
+        await alice.disconnect()
+
+    async def test_outsiders_are_turned_away(self):
+        eve = await User.objects.acreate(username='eve')
+        communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), f'/ws/messenger/{self.room.pk}/')
+        communicator.scope['user'] = eve
+        connected, _ = await communicator.connect()
+        self.assertFalse(connected)
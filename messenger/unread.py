@@ -0,0 +1,45 @@
+# messenger/unread.py
+# Per-(user, room) unread counters. Writing a message bumps every other
+# participant's Participant.unread_count in one UPDATE per author, except for
+# participants who have the room open right now (see messenger/presence.py);
+# opening a room resets the reader's count and moves their last_read cursor.
+# Nothing here counts Message rows.
+from collections import Counter
+
+from django.db.models import F
+
+from . import presence
+from .models import Message, Participant
+
+
+def readers_present(room_ids):
+    """``{room_id: {user_id, ...}}`` of participants with the room open."""
+    members = {}
+    for room_id, user_id in Participant.objects.filter(room_id__in=room_ids).values_list('room_id', 'user_id'):
+        members.setdefault(room_id, []).append(user_id)
+    return {room_id: presence.online(room_id, user_ids) for room_id, user_ids in members.items()}
+
+
+def count_new_messages(messages):
+    counts = Counter((m.room_id, m.user_id) for m in messages)
+    present = readers_present({room_id for room_id, _ in counts})
+    for (room_id, user_id), count in counts.items():
+        Participant.objects.filter(room_id=room_id).exclude(user_id__in={user_id, *present.get(room_id, ())}).update(
+            unread_count=F('unread_count') + count
+        )
+
+
+def mark_room_read(user_id, room_id):
+    """Reset the reader's counter for the room; returns True if it had unread messages."""
+    last_id = Message.objects.filter(room_id=room_id).order_by('-created_at', '-id').values_list('id', flat=True).first()
+    participant = Participant.objects.filter(user_id=user_id, room_id=room_id)
+    had_unread = participant.filter(unread_count__gt=0).update(unread_count=0, last_read_id=last_id)
+    if not had_unread:
+        participant.exclude(last_read_id=last_id).update(last_read_id=last_id)
+    return bool(had_unread)
+
+
+def unread_by_room(user_id, room_ids):
+    return dict(
+        Participant.objects.filter(user_id=user_id, room_id__in=room_ids).values_list('room_id', 'unread_count')
+    )
@@ -7,6 +7,7 @@ urlpatterns = [
     path('', views.chat_list, name='chat_list'),
     path('room/<int:room_id>/', views.chat_room, name='chat_room'),
     path('room/<int:room_id>/send/', views.send_message, name='send_message'),
+    path('room/<int:room_id>/history/', views.message_history, name='message_history'),
     path('start/<str:username>/', views.start_chat, name='start_chat'),
     path('create-group/', views.create_group_chat, name='create_group_chat'),
 ]
\ No newline at end of file
@@ -1,41 +1,50 @@
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib import messages
 from django.http import JsonResponse
 from django.views.decorators.http import require_POST
-from django.core.paginator import Paginator
-from django.db.models import Q
 from .models import ChatRoom, Participant, Message, User
 from .forms import MessageForm
+from . import history, presence, rooms, unread
+from notifications.unread import push_totals
 from django_ratelimit.decorators import ratelimit
 from django.contrib.auth.decorators import login_required
 from django.utils import timezone
 
 @login_required
 def chat_list(request):
-    rooms = ChatRoom.objects.filter(participants=request.user, is_active=True).select_related('participants').prefetch_related('participants__user')
     search_query = request.GET.get('q', '').strip()
-    if search_query:
-        rooms = rooms.filter(
-            Q(name__icontains=search_query) |
-            Q(participants__user__username__icontains=search_query)
-        ).distinct()
-    paginator = Paginator(rooms, 20)
-    page_obj = paginator.get_page(request.GET.get('page'))
+    page_obj = rooms.chat_list_page(request.user, search_query, request.GET.get('page'))
     return render(request, 'messenger/chat_list.html', {'page_obj': page_obj, 'search_query': search_query})
 
 @login_required
 def chat_room(request, room_id):
     room = get_object_or_404(ChatRoom, id=room_id, participants=request.user, is_active=True)
-    messages_qs = room.messages.select_related('user').order_by('created_at')[:100]
+    messages_qs, next_cursor = history.messages_before(room.id)
+    if unread.mark_room_read(request.user.id, room.id):
+        push_totals(request.user.id, room_id=room.id, room_unread=0)
     form = MessageForm()
-    other_participants = room.participants.exclude(user=request.user).select_related('user')
+    other_participants = list(room.participant.exclude(user=request.user).select_related('user'))
+    online_ids = presence.online(room.id, [participant.user_id for participant in other_participants])
+    for participant in other_participants:
+        participant.is_online = participant.user_id in online_ids
     return render(request, 'messenger/chat_room.html', {
         'room': room,
         'messages': messages_qs,
+        'next_cursor': next_cursor,
         'form': form,
         'other_participants': other_participants
     })
 
+@login_required
+def message_history(request, room_id):
+    if not Participant.objects.filter(room_id=room_id, user=request.user, room__is_active=True).exists():
+        return JsonResponse({'error': 'Not found'}, status=404)
+    return JsonResponse(history.history_page(
+        room_id, request.GET.get('before'), history.clamp_limit(request.GET.get('limit'))
+    ))
+
 @login_required
 @require_POST
 @ratelimit(key='user', rate='10/m', method='POST', block=True)
@@ -56,7 +65,8 @@ def send_message(request, room_id):
             'user_id': message.user.id,
             'timestamp': message.created_at.isoformat()
         })
-        Participant.objects.filter(room=room).update(last_seen=timezone.now())
+        presence.recorder.record(room.id, request.user.id)
+        presence.recorder.flush_due()
         messages.success(request, 'Message sent!')
     else:
         messages.error(request, 'Error sending message.')
@@ -68,15 +78,7 @@ def start_chat(request, username):
     if other_user == request.user:
         messages.error(request, "Cannot chat with yourself.")
         return redirect('messenger:chat_list')
-    room = ChatRoom.objects.filter(
-        room_type='one_to_one',
-        participants=request.user,
-        participant =other_user
-    ).first()
-    if not room:
-        room = ChatRoom.objects.create(room_type='one_to_one')
-        Participant.objects.create(user=request.user, room=room)
-        Participant.objects.create(user=other_user, room=room)
+    room, _ = rooms.direct_room(request.user, other_user)
     return redirect('messenger:chat_room', room_id=room.id)
 
 @login_required
@@ -0,0 +1,105 @@
+# messenger/writebehind.py
+# Write-behind buffer for websocket chat messages. ChatConsumer broadcasts a
+# message straight away and hands the unsaved row to the process-wide buffer;
+# rows from every consumer are written together with one bulk_create (one
+# thread-pool slot per batch instead of per message) once MESSENGER_WRITE_BATCH_SIZE
+# rows are waiting or MESSENGER_WRITE_INTERVAL seconds have passed. Each
+# sender gets a future that resolves once its row is committed. Rows still
+# queued when the process exits are written by an atexit hook.
+import asyncio
+import atexit
+import logging
+import threading
+
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.db import connection, transaction
+
+from .models import Message, messages_saved
+from .rooms import touch_rooms
+from .unread import count_new_messages
+
+logger = logging.getLogger(__name__)
+
+
+def _fill_pks(messages):
+    # Backends that can't return ids from a bulk INSERT (MySQL): read them back.
+    # created_at is set per row with microsecond precision on pre_save.
+    stamps = [message.created_at for message in messages]
+    rows = Message.objects.filter(
+        room_id__in={message.room_id for message in messages},
+        created_at__gte=min(stamps),
+        created_at__lte=max(stamps),
+    ).values_list('id', 'room_id', 'user_id', 'created_at')
+    ids = {(room_id, user_id, created_at): pk for pk, room_id, user_id, created_at in rows}
+    for message in messages:
+        message.pk = ids.get((message.room_id, message.user_id, message.created_at))
+
+
+def write(messages):
+    with transaction.atomic():
+        Message.objects.bulk_create(messages)
+        if not connection.features.can_return_rows_from_bulk_insert:
+            _fill_pks(messages)
+        touch_rooms(messages)
+        count_new_messages(messages)
+        transaction.on_commit(lambda: messages_saved.send(sender=Message, messages=messages))
+    return messages
+
+
+class MessageBuffer:
+    def __init__(self, max_size, interval):
+        self.max_size = max_size
+        self.interval = interval
+        self._pending = []
+        self._lock = threading.Lock()
+        self._timer = None
+
+    def add(self, message):
+        """Queue an unsaved Message; returns a future resolved with it once it is written."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self._lock:
+            self._pending.append((message, future))
+            size = len(self._pending)
+        if size >= self.max_size:
+            loop.create_task(self.flush())
+        elif self._timer is None:
+            self._timer = loop.call_later(self.interval, lambda: loop.create_task(self.flush()))
+        return future
+
+    def _take(self):
+        with self._lock:
+            batch, self._pending = self._pending, []
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        return batch
+
+    async def flush(self):
+        batch = self._take()
+        if not batch:
+            return
+        try:
+            await database_sync_to_async(write)([message for message, _ in batch])
+        except Exception as e:
+            logger.exception('Failed to write %d chat messages', len(batch))
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        else:
+            for message, future in batch:
+                if not future.done():
+                    future.set_result(message)
+
+    def flush_sync(self):
+        batch = self._take()
+        if batch:
+            write([message for message, _ in batch])
+
+
+buffer = MessageBuffer(
+    getattr(settings, 'MESSENGER_WRITE_BATCH_SIZE', 100),
+    getattr(settings, 'MESSENGER_WRITE_INTERVAL', 0.05),
+)
+atexit.register(buffer.flush_sync)
@@ -1,10 +1,13 @@
 # notes/models.py
 from django.core.validators import FileExtensionValidator
-from django.db import models, transaction
+from django.db import models
 from university.models import Branch
 from ecommerce.utils import default_pdf
+from core.sequences import SequentialCodeMixin, SequentialCodeQuerySet
+
+class Note(SequentialCodeMixin, models.Model):
+    code_prefix = 'NOTE'
 
-class Note(models.Model):
     name = models.CharField(max_length=255)
     price = models.DecimalField(max_digits=8, decimal_places=2, default=0.00)
     credit_price = models.PositiveIntegerField(default=0)
@@ -19,26 +22,10 @@ class Note(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = SequentialCodeQuerySet.as_manager()
+
     class Meta:
         ordering = ['name']
 
-    def save(self, *args, **kwargs):
-        if not self.code:
-            with transaction.atomic():
-                last_note = Note.objects.order_by('-id').first()
-                if last_note and last_note.code.startswith('NOTE'):
-                    try:
-                        last_number = int(last_note.code.replace('NOTE', ''))
-                        new_number = last_number + 1
-                    except ValueError:
-                        new_number = 1
-                else:
-                    new_number = 1
-                self.code = f'NOTE{new_number:03d}'  # e.g., NOTE001, NOTE002
-                while Note.objects.filter(code=self.code).exists():
-                    new_number += 1
-                    self.code = f'NOTE{new_number:03d}'
-        super().save(*args, **kwargs)
-
     def __str__(self):
         return f"{self.name} - {self.code}"
\ No newline at end of file
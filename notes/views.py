@@ -6,10 +6,11 @@ from .models import Note
 from .serializers import NoteSerializer
 from university.models import Branch
 from accounts.views import is_staff, jwt_auth
+from ecommerce.entitlements import mark_owned
 
 @jwt_auth
 def note_list(request):
-    notes = Note.objects.filter(is_active=True)
+    notes = mark_owned(request.user, Note.objects.filter(is_active=True))
     return render(request, 'notes/note_list.html', {'notes': notes})
 
 @jwt_auth
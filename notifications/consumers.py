@@ -1,6 +1,7 @@
 import json
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
+from . import unread
 from .models import Notification
 from django.contrib.auth import get_user_model
 #notifications/consumers.py
@@ -26,33 +27,36 @@ class NotificationConsumer(AsyncWebsocketConsumer):
             await self.mark_as_read(data.get('notification_id'))
 
     async def new_notification(self, event):
-        await self.send(text_data=json.dumps({
-            'type': 'new_notification',
-            'id': event['id'],
-            'sender': event['sender'],
-            'type': event['type'],
-            'related_post': event['related_post'],
-            'related_message': event['related_message'],
-            'created_at': event['created_at']
-        }))
+        # Events are built by notifications/fanout.py; forward them as they are.
+        await self.send(text_data=json.dumps(event))
+
+    async def unread_counts(self, event):
+        await self.send(text_data=json.dumps(event))
+
+    async def send_initial_notifications(self):
+        for event in await self.unread_notifications():
+            await self.new_notification(event)
 
     @database_sync_to_async
-    def send_initial_notifications(self):
-        notifications = Notification.objects.filter(recipient=self.user, is_read=False).order_by('-created_at')[:5]
-        for notif in notifications:
-            await self.channel_layer.group_send(
-                self.group_name,
-                {
-                    'type': 'new_notification',
-                    'id': notif.id,
-                    'sender': notif.sender.username if notif.sender else '',
-                    'type': notif.type,
-                    'related_post': notif.related_post.id if notif.related_post else '',
-                    'related_message': notif.related_message.id if notif.related_message else '',
-                    'created_at': notif.created_at.isoformat()
-                }
-            )
+    def unread_notifications(self):
+        notifications = (
+            Notification.objects.filter(recipient=self.user, is_read=False)
+            .select_related('sender').order_by('-created_at')[:5]
+        )
+        return [
+            {
+                'type': 'new_notification',
+                'notification_type': notif.type,
+                'id': notif.id,
+                'sender': notif.sender.username if notif.sender else '',
+                'related_post': notif.related_post_id or '',
+                'related_message': notif.related_message_id or '',
+                'created_at': notif.created_at.isoformat()
+            }
+            for notif in notifications
+        ]
 
     @database_sync_to_async
     def mark_as_read(self, notification_id):
-        Notification.objects.filter(id=notification_id, recipient=self.user).update(is_read=True)
\ No newline at end of file
+        if unread.mark_read(self.user, [notification_id]):
+            unread.push_totals(self.user.pk)
\ No newline at end of file
@@ -0,0 +1,12 @@
+# notifications/context_processors.py
+from django.utils.functional import SimpleLazyObject
+
+from .unread import totals
+
+
+def unread_counts(request):
+    # Lazy, so pages that never render the navbar badges don't query.
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        return {}
+    return {'unread_counts': SimpleLazyObject(lambda: totals([user.pk]).get(user.pk, {}))}
@@ -0,0 +1,104 @@
+# notifications/fanout.py
+# Message notifications for a whole batch of new chat messages at once.
+# Per room: recipients with an unread message notification for the room have
+# it moved to the newest message (coalesced) instead of getting another row,
+# the rest get one bulk_create, and every recipient gets a single push event
+# for the batch carrying their unread counters. All pushes go out
+# concurrently from one async_to_sync hop.
+import asyncio
+from collections import defaultdict
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+
+from messenger.models import Participant
+from . import unread
+from .models import Notification
+
+
+def group_name(user_id):
+    return f'notifications_{user_id}'
+
+
+def push(events):
+    """Send ``[(user_id, event), ...]`` to the users' notification sockets."""
+    if not events:
+        return
+    channel_layer = get_channel_layer()
+
+    async def send_all():
+        await asyncio.gather(*(channel_layer.group_send(group_name(user_id), event) for user_id, event in events))
+
+    async_to_sync(send_all)()
+
+
+def _fan_out_room(room_id, messages, usernames, now):
+    participants = dict(Participant.objects.filter(room_id=room_id).values_list('user_id', 'unread_count'))
+    # Newest message each participant did not write themselves, and how many of those there are.
+    latest = {}
+    counts = defaultdict(int)
+    for user_id in participants:
+        for message in messages:
+            if message.user_id != user_id:
+                latest[user_id] = message
+                counts[user_id] += 1
+    if not latest:
+        return []
+
+    existing = dict(
+        Notification.objects.filter(
+            recipient_id__in=latest, type='message', is_read=False, related_message__room_id=room_id
+        ).values_list('recipient_id', 'id')
+    )
+    by_message = defaultdict(list)
+    for user_id in existing:
+        by_message[latest[user_id]].append(existing[user_id])
+    for message, ids in by_message.items():
+        Notification.objects.filter(id__in=ids).update(
+            related_message=message, sender_id=message.user_id, created_at=now
+        )
+    created = [user_id for user_id in latest if user_id not in existing]
+    Notification.objects.bulk_create([
+        Notification(
+            recipient_id=user_id, sender_id=latest[user_id].user_id, type='message', related_message=latest[user_id]
+        )
+        for user_id in created
+    ])
+    unread.increment(created)
+
+    return [
+        (user_id, {
+            'type': 'new_notification',
+            'notification_type': 'message',
+            'id': existing.get(user_id),
+            'sender': usernames.get(message.user_id, ''),
+            'room_id': room_id,
+            'related_message': message.pk,
+            'count': counts[user_id],
+            'room_unread': participants[user_id],
+            'created_at': now.isoformat(),
+        })
+        for user_id, message in latest.items()
+    ]
+
+
+def fan_out_messages(messages):
+    rooms = defaultdict(list)
+    for message in sorted(messages, key=lambda message: (message.created_at, message.pk or 0)):
+        rooms[message.room_id].append(message)
+    usernames = dict(
+        get_user_model().objects.filter(id__in={message.user_id for message in messages}).values_list('id', 'username')
+    )
+    now = timezone.now()
+    events = []
+    for room_id, batch in rooms.items():
+        events += _fan_out_room(room_id, batch, usernames, now)
+    # One counter read for every recipient; each gets a single event per batch.
+    totals = unread.totals({user_id for user_id, _ in events})
+    for user_id, event in events:
+        counts = totals.get(user_id, {})
+        event['unread_notifications'] = counts.get('notifications', 0)
+        event['unread_messages'] = counts.get('messages', 0)
+    push(events)
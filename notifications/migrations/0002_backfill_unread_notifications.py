@@ -0,0 +1,24 @@
+# Generated by Django 4.2 on 2026-10-18 21:55
+
+from django.db import migrations
+from django.db.models import Count
+
+
+def backfill_unread_notifications(apps, schema_editor):
+    User = apps.get_model('accounts', 'User')
+    Notification = apps.get_model('notifications', 'Notification')
+    unread = Notification.objects.filter(is_read=False).order_by().values_list('recipient_id').annotate(total=Count('id'))
+    for user_id, total in unread:
+        User.objects.filter(pk=user_id).update(unread_notifications=total)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_user_unread_notifications'),
+        ('notifications', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_unread_notifications, migrations.RunPython.noop),
+    ]
@@ -1,9 +1,9 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth import get_user_model
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from social.models import Post, Comment
-from messenger.models import Message
+from messenger.models import Message, messages_saved
 from accounts.models import Follow  # Assuming follow model
 #notifications/models.py
 
@@ -32,9 +32,23 @@ class Notification(models.Model):
     def __str__(self):
         return f"Notification for {self.recipient.username} - {self.type}"
 
+@receiver(post_save, sender='notifications.Notification')
+def count_unread_notification(sender, instance, created, **kwargs):
+    # bulk_create in fanout.py counts its own rows.
+    if created and not instance.is_read:
+        from .unread import increment
+        increment([instance.recipient_id])
+
+@receiver(post_delete, sender='notifications.Notification')
+def uncount_unread_notification(sender, instance, **kwargs):
+    if not instance.is_read:
+        from .unread import decrement
+        decrement(instance.recipient_id, 1)
+
 @receiver(post_save, sender=Comment)
 def notify_comment(sender, instance, created, **kwargs):
     if created and instance.post.user != instance.user:
+        from .fanout import push
         notification = Notification.objects.create(
             recipient=instance.post.user,
             sender=instance.user,
@@ -42,50 +56,41 @@ def notify_comment(sender, instance, created, **kwargs):
             related_post=instance.post,
             related_comment=instance
         )
-        channel_layer = get_channel_layer()
-        async_to_sync(channel_layer.group_send)(f'notifications_{instance.post.user.id}', {
+        push([(instance.post.user_id, {
             'type': 'new_notification',
+            'notification_type': 'comment',
             'id': notification.id,
             'sender': instance.user.username,
-            'type': 'comment',
             'related_post': instance.post.id,
             'related_comment': instance.id,
             'created_at': notification.created_at.isoformat()
-        })
+        })])
 
 @receiver(post_save, sender=Message)
 def notify_message(sender, instance, created, **kwargs):
     if created:
-        for participant in instance.room.participants.exclude(id=instance.user.id):
-            notification = Notification.objects.create(
-                recipient=participant,
-                sender=instance.user,
-                type='message',
-                related_message=instance
-            )
-            channel_layer = get_channel_layer()
-            async_to_sync(channel_layer.group_send)(f'notifications_{participant.id}', {
-                'type': 'new_notification',
-                'id': notification.id,
-                'sender': instance.user.username,
-                'type': 'message',
-                'related_message': instance.id,
-                'created_at': notification.created_at.isoformat()
-            })
+        from .fanout import fan_out_messages
+        transaction.on_commit(lambda: fan_out_messages([instance]))
+
+@receiver(messages_saved)
+def notify_messages(sender, messages, **kwargs):
+    # Batches from messenger/writebehind.py, already committed.
+    from .fanout import fan_out_messages
+    fan_out_messages(messages)
 
 @receiver(post_save, sender=Follow)
 def notify_follow(sender, instance, created, **kwargs):
     if created:
+        from .fanout import push
         notification = Notification.objects.create(
-            recipient=instance.followed_user,
+            recipient=instance.following,
             sender=instance.follower,
             type='follow'
         )
-        channel_layer = get_channel_layer()
-        async_to_sync(channel_layer.group_send)(f'notifications_{instance.followed_user.id}', {
+        push([(instance.following_id, {
             'type': 'new_notification',
+            'notification_type': 'follow',
             'id': notification.id,
             'sender': instance.follower.username,
-            'type': 'follow',
             'created_at': notification.created_at.isoformat()
-        })
\ No newline at end of file
+        })])
@@ -1,3 +1,69 @@
-from django.test import TestCase
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
 
-# Create your tests here.
+from accounts.models import User
+from core.testing import LocalServicesTestCase
+from messenger.models import ChatRoom, Message, Participant
+from social.models import Comment, Post
+
+from . import unread
+from .fanout import fan_out_messages, group_name
+from .models import Notification
+
+
+class MessageFanOutTests(LocalServicesTestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice, self.bob, self.carol = users = [
+            User.objects.create_user(name, password='pw') for name in ('alice', 'bob', 'carol')
+        ]
+        self.room = ChatRoom.objects.create(room_type='group', name='Study group')
+        Participant.objects.bulk_create([Participant(room=self.room, user=user) for user in users])
+
+    def send(self, user, *contents):
+        messages = [Message(room=self.room, user=user, content=content) for content in contents]
+        Message.objects.bulk_create(messages)  # no post_save, as with the write-behind buffer
+        fan_out_messages(messages)
+        return messages
+
+    def unread_counts(self):
+        return dict(User.objects.values_list('username', 'unread_notifications'))
+
+    def test_a_batch_gives_each_recipient_one_notification(self):
+        self.send(self.alice, 'one', 'two', 'three')
+        self.assertEqual(
+            sorted(Notification.objects.values_list('recipient__username', 'related_message__content')),
+            [('bob', 'three'), ('carol', 'three')],
+        )
+        self.assertEqual(self.unread_counts(), {'alice': 0, 'bob': 1, 'carol': 1})
+
+    def test_later_messages_coalesce_into_the_unread_notification(self):
+        self.send(self.alice, 'one')
+        self.send(self.alice, 'two')
+        self.assertEqual(Notification.objects.filter(recipient=self.bob).count(), 1)
+        self.assertEqual(Notification.objects.get(recipient=self.bob).related_message.content, 'two')
+        self.assertEqual(self.unread_counts()['bob'], 1)
+
+    def test_recipients_get_one_push_per_batch(self):
+        layer = get_channel_layer()
+        channel = async_to_sync(layer.new_channel)()
+        async_to_sync(layer.group_add)(group_name(self.bob.pk), channel)
+        self.send(self.alice, 'one', 'two')
+        event = async_to_sync(layer.receive)(channel)
+        self.assertEqual((event['type'], event['count'], event['unread_notifications']), ('new_notification', 2, 1))
+
+    def test_marking_read_lowers_the_counter(self):
+        self.send(self.alice, 'one')
+        self.send(self.carol, 'hey')
+        self.assertEqual(unread.mark_read(self.bob, Notification.objects.filter(recipient=self.bob).values('id')), 1)
+        self.assertEqual(self.unread_counts()['bob'], 0)
+
+
+class CommentNotificationTests(LocalServicesTestCase):
+    def test_comments_notify_the_author(self):
+        author = User.objects.create_user('author', password='pw')
+        post = Post.objects.create(user=author, content='hello')
+        Comment.objects.create(post=post, user=User.objects.create_user('fan', password='pw'), content='nice')
+        Comment.objects.create(post=post, user=author, content='thanks')
+        self.assertEqual(Notification.objects.filter(recipient=author, type='comment').count(), 1)
+        self.assertEqual(User.objects.get(pk=author.pk).unread_notifications, 1)
@@ -0,0 +1,50 @@
+# notifications/unread.py
+# Unread notification counter kept on User.unread_notifications. It is
+# incremented when a notification row is created, not when one is coalesced
+# into an existing unread row, and decremented by the number of rows actually
+# flipped to read.
+from django.contrib.auth import get_user_model
+from django.db.models import Case, F, Sum, Value, When
+
+from .models import Notification
+
+User = get_user_model()
+
+
+def increment(user_ids):
+    if user_ids:
+        User.objects.filter(id__in=user_ids).update(unread_notifications=F('unread_notifications') + 1)
+
+
+def decrement(user_id, count):
+    if count:
+        User.objects.filter(id=user_id).update(unread_notifications=Case(
+            When(unread_notifications__gte=count, then=F('unread_notifications') - count),
+            default=Value(0),
+        ))
+
+
+def mark_read(user, ids):
+    count = Notification.objects.filter(id__in=ids, recipient=user, is_read=False).update(is_read=True)
+    decrement(user.pk, count)
+    return count
+
+
+def totals(user_ids):
+    """``{user_id: {'notifications': n, 'messages': n}}`` for the navbar badges."""
+    rows = (
+        User.objects.filter(id__in=user_ids)
+        .annotate(unread_messages=Sum('participants__unread_count'))
+        .values_list('id', 'unread_notifications', 'unread_messages')
+    )
+    return {
+        user_id: {'notifications': notifications, 'messages': messages or 0}
+        for user_id, notifications, messages in rows
+    }
+
+
+def push_totals(user_id, **extra):
+    from .fanout import push
+    counts = totals([user_id]).get(user_id)
+    if counts:
+        push([(user_id, {'type': 'unread_counts', **counts, **extra})])
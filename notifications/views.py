@@ -1,7 +1,8 @@
-from django.shortcuts import render, get_object_or_404
+from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from .models import Notification
+from . import unread
 from django.core.paginator import Paginator
 #notifications/views.py
 
@@ -12,14 +13,8 @@ def notifications_list(request):
     page_obj = paginator.get_page(request.GET.get('page'))
     if request.method == 'POST':
         notification_ids = request.POST.getlist('notification_ids')
-        Notification.objects.filter(id__in=notification_ids, recipient=request.user).update(is_read=True)
-        channel_layer = get_channel_layer()
-        for notif_id in notification_ids:
-            async_to_sync(channel_layer.group_send)(f'notifications_{request.user.id}', {
-                'type': 'new_notification',
-                'id': notif_id,
-                'is_read': True
-            })
+        if unread.mark_read(request.user, notification_ids):
+            unread.push_totals(request.user.id)
         messages.success(request, 'Notifications marked as read!')
         return redirect('notifications:notifications_list')
     return render(request, 'notifications/notifications_list.html', {'page_obj': page_obj})
\ No newline at end of file
@@ -1,11 +1,14 @@
 # papers/models.py
 from django.core.validators import FileExtensionValidator
-from django.db import models, transaction
+from django.db import models
 from university.models import Branch  # Updated import
 from ecommerce.utils import default_pdf
+from core.sequences import SequentialCodeMixin, SequentialCodeQuerySet
 
 
-class Paper(models.Model):
+class Paper(SequentialCodeMixin, models.Model):
+    code_prefix = 'PAPER'
+
     EXAM_TYPE_CHOICES = [
         ('insem', 'In-Semester'),
         ('endsem', 'End-Semester'),
@@ -27,26 +30,10 @@ class Paper(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = SequentialCodeQuerySet.as_manager()
+
     class Meta:
         ordering = ['name', 'year', 'exam_type']  # Updated ordering to include name
 
-    def save(self, *args, **kwargs):
-        if not self.code:
-            with transaction.atomic():
-                last_paper = Paper.objects.order_by('-id').first()
-                if last_paper and last_paper.code.startswith('PAPER'):
-                    try:
-                        last_number = int(last_paper.code.replace('PAPER', ''))
-                        new_number = last_number + 1
-                    except ValueError:
-                        new_number = 1
-                else:
-                    new_number = 1
-                self.code = f'PAPER{new_number:03d}'
-                while Paper.objects.filter(code=self.code).exists():
-                    new_number += 1
-                    self.code = f'PAPER{new_number:03d}'
-        super().save(*args, **kwargs)
-
     def __str__(self):
         return f"{self.name} - {self.get_exam_type_display()} ({self.year}) - {self.code}"
\ No newline at end of file
@@ -4,12 +4,13 @@ from django.contrib import messages
 from django.contrib.auth.decorators import user_passes_test
 from .models import Paper
 from .serializers import PaperSerializer
-from university.models import Branch  # Updated import
+from university import hierarchy
 from accounts.views import is_staff, jwt_auth
+from ecommerce.entitlements import mark_owned
 
 @jwt_auth
 def paper_list(request):
-    papers = Paper.objects.filter(is_active=True)
+    papers = mark_owned(request.user, Paper.objects.filter(is_active=True))
     return render(request, 'papers/paper_list.html', {'papers': papers})
 
 @jwt_auth
@@ -32,7 +33,7 @@ def paper_create(request):
         errors = {}
     return render(request, 'papers/paper_form.html', {
         'serializer': serializer,
-        'branches': Branch.objects.filter(is_active=True),  # Changed to branches
+        'branches': hierarchy.active_branches(),
         'errors': errors
     })
 
@@ -58,7 +59,7 @@ def paper_update(request, pk):
         errors = {}
     return render(request, 'papers/paper_form.html', {
         'serializer': serializer,
-        'branches': Branch.objects.filter(is_active=True),  # Changed to branches
+        'branches': hierarchy.active_branches(),
         'errors': errors
     })
 
@@ -1,9 +1,12 @@
 from django.core.validators import FileExtensionValidator
-from django.db import models, transaction
+from django.db import models
 from ecommerce.utils import default_pdf
+from core.sequences import SequentialCodeMixin, SequentialCodeQuerySet
 # roadmaps/models.py
 
-class Syllabus(models.Model):
+class Syllabus(SequentialCodeMixin, models.Model):
+    code_prefix = 'SYLLABUS'
+
     name = models.CharField(max_length=255)
     code = models.CharField(max_length=20, unique=True, blank=True)
     pdf_file = models.FileField(
@@ -19,27 +22,11 @@ class Syllabus(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = SequentialCodeQuerySet.as_manager()
+
     class Meta:
         ordering = ['name']
 
-    def save(self, *args, **kwargs):
-        if not self.code:
-            with transaction.atomic():
-                last_syllabus = Syllabus.objects.order_by('-id').first()
-                if last_syllabus and last_syllabus.code.startswith('SYLLABUS'):
-                    try:
-                        last_number = int(last_syllabus.code.replace('SYLLABUS', ''))
-                        new_number = last_number + 1
-                    except ValueError:
-                        new_number = 1
-                else:
-                    new_number = 1
-                self.code = f'SYLLABUS{new_number:03d}'
-                while Syllabus.objects.filter(code=self.code).exists():
-                    new_number += 1
-                    self.code = f'SYLLABUS{new_number:03d}'
-        super().save(*args, **kwargs)
-
     def __str__(self):
         return f"{self.name} - {self.code}"
 
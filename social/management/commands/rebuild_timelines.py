@@ -0,0 +1,27 @@
+# social/management/commands/rebuild_timelines.py
+from django.core.management.base import BaseCommand
+
+from accounts.models import Follow, User
+from social.models import TimelineEntry
+from social.timeline import BACKFILL_SIZE, backfill, fanout_limit
+
+
+class Command(BaseCommand):
+    help = 'Rebuild materialized home timelines from Follow and Post rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clear', action='store_true', help='Delete all timeline entries first')
+
+    def handle(self, *args, **options):
+        if options['clear']:
+            TimelineEntry.objects.all().delete()
+        users = 0
+        for user_id in User.objects.values_list('id', flat=True).iterator():
+            backfill(user_id, user_id)
+            users += 1
+        follows = Follow.objects.filter(following__follower_total__lt=fanout_limit()).values_list('follower_id', 'following_id')
+        for follower_id, following_id in follows.iterator():
+            backfill(follower_id, following_id)
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt timelines for {users} users (last {BACKFILL_SIZE} posts per followed author).'
+        ))
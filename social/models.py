@@ -1,4 +1,6 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from django.contrib.auth import get_user_model
 from django.core.validators import FileExtensionValidator
 from django.urls import reverse
@@ -40,4 +42,38 @@ class Comment(models.Model):
         indexes = [models.Index(fields=['post', 'created_at'])]
 
     def __str__(self):
-        return f"Comment by @{self.user.username} on {self.post}"
\ No newline at end of file
+        return f"Comment by @{self.user.username} on {self.post}"
+
+class TimelineEntry(models.Model):
+    # One row per (reader, post): the materialized home feed. Filled on write
+    # by social/timeline.py; authors above TIMELINE_FANOUT_LIMIT followers are
+    # merged in at read time instead.
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='timeline_entries')
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='+')
+    author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+
+    class Meta:
+        unique_together = ['user', 'post']
+        indexes = [
+            models.Index(fields=['user', '-post']),
+            models.Index(fields=['user', 'author']),
+        ]
+
+
+@receiver(post_save, sender=Post)
+def fan_out_post(sender, instance, created, **kwargs):
+    if created:
+        from .timeline import fan_out
+        transaction.on_commit(lambda: fan_out(instance))
+
+
+@receiver(post_save, sender='accounts.Follow')
+def backfill_timeline(sender, instance, created, **kwargs):
+    if created:
+        from .timeline import backfill
+        transaction.on_commit(lambda: backfill(instance.follower_id, instance.following_id))
+
+
+@receiver(post_delete, sender='accounts.Follow')
+def prune_timeline(sender, instance, **kwargs):
+    TimelineEntry.objects.filter(user_id=instance.follower_id, author_id=instance.following_id).delete()
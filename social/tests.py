@@ -1,3 +1,70 @@
-from django.test import TestCase
+from django.test import override_settings
+from django.urls import reverse
 
-# Create your tests here.
+from accounts.models import Follow, User
+from core.testing import LocalServicesTestCase
+
+from . import timeline
+from .models import Post
+
+
+class HomeTimelineTests(LocalServicesTestCase):
+    def setUp(self):
+        super().setUp()
+        self.reader = User.objects.create_user('reader', password='pw')
+        self.author = User.objects.create_user('author', password='pw')
+        self.stranger = User.objects.create_user('stranger', password='pw')
+        self.follow(self.reader, self.author)
+
+    def follow(self, follower, following):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Follow.objects.create(follower=follower, following=following)
+
+    def post(self, user, content):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Post.objects.create(user=user, content=content)
+
+    def feed(self, user, **kwargs):
+        posts, cursor = timeline.home_timeline(user, **kwargs)
+        return [post.content for post in posts], cursor
+
+    def test_posts_reach_followers_and_the_author(self):
+        self.post(self.author, 'hello')
+        self.post(self.stranger, 'unrelated')
+        self.post(self.reader, 'mine')
+        self.assertEqual(self.feed(self.reader), (['mine', 'hello'], None))
+        self.assertEqual(self.feed(self.author), (['hello'], None))
+
+    def test_pages_follow_the_cursor(self):
+        for n in range(5):
+            self.post(self.author, f'post {n}')
+        first, cursor = self.feed(self.reader, size=3)
+        self.assertEqual(first, ['post 4', 'post 3', 'post 2'])
+        self.assertEqual(self.feed(self.reader, before=cursor, size=3), (['post 1', 'post 0'], None))
+
+    def test_following_backfills_and_unfollowing_prunes(self):
+        self.post(self.stranger, 'older')
+        follow = self.follow(self.reader, self.stranger)
+        self.assertEqual(self.feed(self.reader)[0], ['older'])
+        follow.delete()
+        self.assertEqual(self.feed(self.reader)[0], [])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_popular_authors_are_merged_in_on_read(self):
+        self.post(self.author, 'popular')
+        self.assertEqual(timeline.TimelineEntry.objects.filter(user=self.reader).count(), 0)
+        self.assertEqual(self.feed(self.reader)[0], ['popular'])
+
+    def test_feed_counts_comments_without_loading_them(self):
+        post = self.post(self.author, 'discussed')
+        for n in range(3):
+            post.comments.create(user=self.reader, content=f'comment {n}')
+        with self.assertNumQueries(1):
+            [shown] = timeline.feed_posts([post.pk])
+            self.assertEqual((shown.comment_count, shown.user.username), (3, 'author'))
+
+    def test_feed_page_renders_the_timeline(self):
+        self.post(self.author, 'hello')
+        self.client.force_login(self.reader)
+        response = self.client.get(reverse('social:social'))
+        self.assertContains(response, 'hello')
@@ -0,0 +1,82 @@
+# social/timeline.py
+# Home timeline. A new post is copied into a TimelineEntry row for every
+# follower (fan-out on write), so reading a feed is one index range scan on
+# (user, post). Authors with TIMELINE_FANOUT_LIMIT or more followers are not
+# fanned out; their recent posts are merged in when a follower reads.
+# Pages are keyed on post id (ids grow with created_at), not OFFSET.
+from django.conf import settings
+from django.db.models import Count
+
+from accounts.models import Follow, User
+from .models import Post, TimelineEntry
+
+FANOUT_BATCH_SIZE = 1000
+BACKFILL_SIZE = 50
+PAGE_SIZE = 10
+
+
+def fanout_limit():
+    return getattr(settings, 'TIMELINE_FANOUT_LIMIT', 10000)
+
+
+def fan_out(post):
+    follower_total = User.objects.filter(pk=post.user_id).values_list('follower_total', flat=True).first() or 0
+    entries = [TimelineEntry(user_id=post.user_id, post=post, author_id=post.user_id)]
+    if follower_total < fanout_limit():
+        followers = Follow.objects.filter(following_id=post.user_id).values_list('follower_id', flat=True)
+        for follower_id in followers.iterator(chunk_size=FANOUT_BATCH_SIZE):
+            entries.append(TimelineEntry(user_id=follower_id, post=post, author_id=post.user_id))
+            if len(entries) >= FANOUT_BATCH_SIZE:
+                TimelineEntry.objects.bulk_create(entries, ignore_conflicts=True)
+                entries = []
+    TimelineEntry.objects.bulk_create(entries, ignore_conflicts=True)
+
+
+def backfill(user_id, author_id):
+    """Copy the author's recent posts into a new follower's timeline."""
+    post_ids = Post.objects.filter(user_id=author_id).order_by('-id').values_list('id', flat=True)[:BACKFILL_SIZE]
+    TimelineEntry.objects.bulk_create(
+        [TimelineEntry(user_id=user_id, post_id=post_id, author_id=author_id) for post_id in post_ids],
+        ignore_conflicts=True,
+    )
+
+
+def _pulled_authors(user):
+    return list(
+        User.objects.filter(follower_set__follower=user, follower_total__gte=fanout_limit()).values_list('id', flat=True)
+    )
+
+
+def feed_posts(ids):
+    """Posts for ``ids`` newest first, with authors joined and comments counted, not loaded."""
+    return list(
+        Post.objects.filter(id__in=ids).select_related('user').annotate(comment_count=Count('comments')).order_by('-id')
+    )
+
+
+def _page(ids, size):
+    ids = ids[:size + 1]
+    next_cursor = ids[size - 1] if len(ids) > size else None
+    return feed_posts(ids[:size]), next_cursor
+
+
+def home_timeline(user, before=None, size=PAGE_SIZE):
+    """Return ``(posts, next_cursor)``; pass the cursor back as ``before``."""
+    entries = TimelineEntry.objects.filter(user=user)
+    if before:
+        entries = entries.filter(post_id__lt=before)
+    ids = set(entries.order_by('-post_id').values_list('post_id', flat=True)[:size + 1])
+    pulled = _pulled_authors(user)
+    if pulled:
+        posts = Post.objects.filter(user_id__in=pulled)
+        if before:
+            posts = posts.filter(id__lt=before)
+        ids.update(posts.order_by('-id').values_list('id', flat=True)[:size + 1])
+    return _page(sorted(ids, reverse=True), size)
+
+
+def all_posts(queryset, before=None, size=PAGE_SIZE):
+    """Keyset page over an arbitrary Post queryset (used for search)."""
+    if before:
+        queryset = queryset.filter(id__lt=before)
+    return _page(list(queryset.order_by('-id').values_list('id', flat=True)[:size + 1]), size)
@@ -22,6 +22,7 @@ from django.core.paginator import Paginator
 from django.db.models import Q
 from .models import Post, Comment
 from .forms import PostForm, CommentForm
+from . import timeline
 from django_ratelimit.decorators import ratelimit
 from channels.layers import get_channel_layer
 from asgiref.sync import async_to_sync
@@ -29,13 +30,15 @@ from asgiref.sync import async_to_sync
 @login_required
 def social(request):
     search_query = request.GET.get('q', '').strip()
-    posts = Post.objects.select_related('user').prefetch_related('comments')
+    before = request.GET.get('before', '')
+    before = int(before) if before.isdigit() else None
     if search_query:
-        posts = posts.filter(
+        posts = Post.objects.filter(
             Q(user__username__icontains=search_query) | Q(content__icontains=search_query)
-        ).distinct()
-    paginator = Paginator(posts, 10)
-    page_obj = paginator.get_page(request.GET.get('page'))
+        )
+        posts, next_cursor = timeline.all_posts(posts, before)
+    else:
+        posts, next_cursor = timeline.home_timeline(request.user, before)
     if request.method == 'POST':
         form = PostForm(request.POST, request.FILES)
         if form.is_valid():
@@ -52,10 +55,12 @@ def social(request):
                 'created_at': post.created_at.isoformat()
             })
             messages.success(request, 'Post created!')
-            return redirect('social:social_feed')
+            return redirect('social:social')
     else:
         form = PostForm()
-    return render(request, 'social/social_feed.html', {'page_obj': page_obj, 'form': form, 'search_query': search_query})
+    return render(request, 'social/social_feed.html', {
+        'posts': posts, 'next_cursor': next_cursor, 'form': form, 'search_query': search_query
+    })
 
 @login_required
 def post_detail(request, pk):
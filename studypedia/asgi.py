@@ -1,7 +1,9 @@
 import os
+from django.conf import settings
 from django.core.asgi import get_asgi_application
 from channels.routing import ProtocolTypeRouter, URLRouter
 from channels.auth import AuthMiddlewareStack
+from accounts.middleware import JWTWebsocketMiddleware
 import social.routing  # Added
 from messenger.routing import websocket_urlpatterns as messenger_ws
 from videocall.routing import websocket_urlpatterns as videocall_ws
@@ -12,6 +14,13 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'studypedia.settings')
 application = ProtocolTypeRouter({
     "http": get_asgi_application(),
     "websocket": AuthMiddlewareStack(
-        URLRouter(social.routing.websocket_urlpatterns + messenger_ws + videocall_ws + notifications_ws)
+        JWTWebsocketMiddleware(
+            URLRouter(social.routing.websocket_urlpatterns + messenger_ws + videocall_ws + notifications_ws)
+        )
     ),
-})
\ No newline at end of file
+})
+
+# Optional in-process reaper for abandoned video rooms (videocall/reaper.py)
+if getattr(settings, 'VIDEO_REAPER_INTERVAL', 0):
+    from videocall.reaper import start_scheduler
+    start_scheduler(settings.VIDEO_REAPER_INTERVAL)
@@ -68,6 +68,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'accounts.middleware.JWTAuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 
@@ -86,6 +87,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'notifications.context_processors.unread_counts',
             ],
         },
     },
@@ -132,6 +134,18 @@ CHANNEL_LAYERS = {
     },
 }
 
+# Shared cache: the university hierarchy version (university/hierarchy.py),
+# profile data and chat presence must be visible to every worker
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": "redis://172.22.142.0:6379/1",
+    },
+}
+
+# Background text extraction from uploaded files (core/extraction.py)
+TEXT_EXTRACTION_WORKERS = 2
+
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
 
@@ -187,6 +201,70 @@ SIMPLE_JWT = {
     'BLACKLIST_AFTER_ROTATION': True,
 }
 
+# Seconds the slim user snapshot behind JWT cookie auth is cached (accounts/middleware.py)
+JWT_USER_CACHE_TTL = 60
+
+# Seconds the public part of a profile page is cached (accounts/profiles.py)
+PROFILE_CACHE_TTL = 300
+
+# Authors with at least this many followers are merged into feeds at read
+# time instead of being copied into every follower's timeline (social/timeline.py)
+TIMELINE_FANOUT_LIMIT = 10000
+
+# Websocket chat messages are written in batches of up to this many rows, at
+# least every MESSENGER_WRITE_INTERVAL seconds (messenger/writebehind.py)
+MESSENGER_WRITE_BATCH_SIZE = 100
+MESSENGER_WRITE_INTERVAL = 0.05
+
+# Download log rows are written in batches of up to this many, at least
+# every DOWNLOAD_LOG_INTERVAL seconds (ecommerce/downloads.py)
+DOWNLOAD_LOG_BATCH_SIZE = 100
+DOWNLOAD_LOG_INTERVAL = 5
+
+# Lifetime in seconds of signed download links for local files (ecommerce/serving.py)
+DOWNLOAD_URL_TTL = 300
+# ...and how long an expired link can still resume an interrupted download
+# (Range requests starting past byte 0 only)
+DOWNLOAD_RESUME_TTL = 24 * 60 * 60
+
+# Chat presence (messenger/presence.py): a socket counts as online for
+# PRESENCE_TTL seconds after its last heartbeat; Participant.last_seen is
+# written in batches at most every PRESENCE_FLUSH_INTERVAL seconds.
+PRESENCE_TTL = 90
+PRESENCE_FLUSH_INTERVAL = 30
+
+# Random video matching (videocall/matchmaking.py): how many of the oldest
+# waiting rooms are scored per match, and how long a room waits for a
+# shared-interest partner before anyone may take it
+MATCH_POOL_SIZE = 200
+MATCH_INTEREST_WAIT = 15
+
+# Video lobby counters (videocall/stats.py) are recounted from the database
+# after LOBBY_STATS_TTL seconds; changes are pushed at most every
+# LOBBY_PUSH_INTERVAL seconds
+LOBBY_STATS_TTL = 3600
+LOBBY_PUSH_INTERVAL = 1
+
+# A video call member whose last socket closed is removed after this many
+# seconds unless they reconnect (videocall/registry.py)
+VIDEO_LEAVE_GRACE = 5
+
+# ICE candidates a client trickles within this many seconds are relayed to
+# the partner as one frame (videocall/consumers.py)
+VIDEO_ICE_BATCH_WINDOW = 0.02
+
+# Video room reaper (videocall/reaper.py, manage.py reap_video_rooms): rooms
+# still waiting or active after these many seconds are closed, ended rooms
+# are archived after VIDEO_ARCHIVE_AFTER. Set VIDEO_REAPER_INTERVAL to also
+# run it every that many seconds inside the ASGI processes.
+VIDEO_WAITING_TTL = 15 * 60
+# Each video socket refreshes its room's liveness key this often; the reaper
+# spares waiting rooms whose key is less than three intervals old.
+VIDEO_HEARTBEAT_INTERVAL = 30
+VIDEO_ACTIVE_TTL = 4 * 60 * 60
+VIDEO_ARCHIVE_AFTER = 24 * 60 * 60
+VIDEO_REAPER_INTERVAL = 0
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/3.2/topics/i18n/
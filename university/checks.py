@@ -0,0 +1,23 @@
+# university/checks.py
+from django.conf import settings
+from django.core import checks
+
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@checks.register(checks.Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    # The hierarchy version token is only seen by other workers through the cache.
+    if settings.CACHES.get('default', {}).get('BACKEND') in PROCESS_LOCAL_CACHES:
+        return [
+            checks.Warning(
+                'The default cache is local to each process, so hierarchy changes will not reach other workers '
+                'and the cascade filter ETags will differ between them.',
+                hint='Point CACHES["default"] at a shared backend such as Redis.',
+                id='university.W001',
+            )
+        ]
+    return []
@@ -0,0 +1,99 @@
+# university/hierarchy.py
+# Versioned snapshot of the University -> Degree -> Branch tree.
+#
+# The tree is read on every cascading dropdown change and every staff form
+# render but changes a few times a month, so it is built once (three
+# queries) and kept in process memory and in the shared cache. A version
+# token in the shared cache is bumped by the save/delete signals in
+# university/models.py; each process compares its copy against it.
+import uuid
+
+from django.core.cache import cache
+
+from .models import University, Degree, Branch
+
+VERSION_KEY = 'university_hierarchy:version'
+SNAPSHOT_KEY = 'university_hierarchy:snapshot:{}'
+SNAPSHOT_TIMEOUT = 60 * 60 * 24
+
+_local = {'version': None, 'snapshot': None}
+
+
+def invalidate():
+    cache.set(VERSION_KEY, uuid.uuid4().hex, None)
+
+
+def current_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        version = uuid.uuid4().hex
+        if not cache.add(VERSION_KEY, version, None):
+            version = cache.get(VERSION_KEY, version)
+    return version
+
+
+def _build():
+    fields = ('id', 'name', 'abbreviation', 'is_active')
+    universities = {row['id']: row for row in University.objects.order_by('name').values(*fields)}
+    degrees = {row['id']: row for row in Degree.objects.order_by('name').values('university_id', *fields)}
+    branches = {row['id']: row for row in Branch.objects.order_by('name').values('degree_id', *fields)}
+    for row in universities.values():
+        row['degrees'] = []
+    for row in degrees.values():
+        row['university'] = universities[row['university_id']]
+        row['university']['degrees'].append(row)
+        row['branches'] = []
+    for row in branches.values():
+        row['degree'] = degrees[row['degree_id']]
+        row['degree']['branches'].append(row)
+    # 'pk' lets templates written against model instances use these rows unchanged.
+    for rows in (universities, degrees, branches):
+        for row in rows.values():
+            row['pk'] = row['id']
+    return {'universities': universities, 'degrees': degrees, 'branches': branches}
+
+
+def snapshot():
+    version = current_version()
+    if _local['version'] == version:
+        return _local['snapshot']
+    data = cache.get(SNAPSHOT_KEY.format(version))
+    if data is None:
+        data = _build()
+        cache.set(SNAPSHOT_KEY.format(version), data, SNAPSHOT_TIMEOUT)
+    _local['version'], _local['snapshot'] = version, data
+    return data
+
+
+def active_universities():
+    return [row for row in snapshot()['universities'].values() if row['is_active']]
+
+
+def active_degrees(university_id=None):
+    return [
+        row for row in snapshot()['degrees'].values()
+        if row['is_active'] and (university_id is None or row['university_id'] == university_id)
+    ]
+
+
+def active_branches(degree_id=None):
+    return [
+        row for row in snapshot()['branches'].values()
+        if row['is_active'] and (degree_id is None or row['degree_id'] == degree_id)
+    ]
+
+
+def _node(row):
+    return {'id': row['id'], 'name': row['name'], 'abbreviation': row['abbreviation']}
+
+
+def tree():
+    """The active hierarchy as plain nested lists, ready for JSON."""
+    result = []
+    for university in active_universities():
+        degrees = [
+            {**_node(degree), 'branches': [_node(branch) for branch in degree['branches'] if branch['is_active']]}
+            for degree in university['degrees'] if degree['is_active']
+        ]
+        result.append({**_node(university), 'degrees': degrees})
+    return result
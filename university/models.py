@@ -1,5 +1,7 @@
-from django.db import models
+from django.db import models, transaction
 from django.core.validators import FileExtensionValidator
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
 
 class University(models.Model):
     name = models.CharField(max_length=255)
@@ -42,4 +44,12 @@ class Branch(models.Model):
     def __str__(self):
         return f"{self.name} ({self.abbreviation})"
 
-
+@receiver(post_save, sender=University)
+@receiver(post_save, sender=Degree)
+@receiver(post_save, sender=Branch)
+@receiver(post_delete, sender=University)
+@receiver(post_delete, sender=Degree)
+@receiver(post_delete, sender=Branch)
+def invalidate_hierarchy(sender, **kwargs):
+    from .hierarchy import invalidate
+    transaction.on_commit(invalidate)
@@ -1,3 +1,53 @@
-from django.test import TestCase
+from django.test import override_settings
+from django.urls import reverse
 
-# Create your tests here.
+from core.testing import LocalServicesTestCase
+
+from . import hierarchy
+from .checks import check_shared_cache
+from .models import Branch, Degree, University
+
+
+class HierarchyTests(LocalServicesTestCase):
+    def setUp(self):
+        super().setUp()
+        self.university = University.objects.create(name='Pune University', abbreviation='SPPU')
+        self.degree = Degree.objects.create(university=self.university, name='BE')
+        self.branch = Branch.objects.create(degree=self.degree, name='Computer')
+
+    def test_snapshot_is_built_once_per_version(self):
+        with self.assertNumQueries(3):
+            hierarchy.snapshot()
+        with self.assertNumQueries(0):
+            self.assertEqual([row['name'] for row in hierarchy.active_branches(self.degree.pk)], ['Computer'])
+
+    def test_saves_publish_a_new_version_on_commit(self):
+        version = hierarchy.current_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            Branch.objects.create(degree=self.degree, name='Civil')
+        self.assertNotEqual(hierarchy.current_version(), version)
+        self.assertEqual([row['name'] for row in hierarchy.active_branches(self.degree.pk)], ['Civil', 'Computer'])
+
+    def test_cascade_filters_answer_304_for_the_current_version(self):
+        url = reverse('core:cascade_filters_api')
+        response = self.client.get(url, {'type': 'degrees', 'parent_id': self.university.pk})
+        self.assertEqual(response.json(), {'items': [{'id': self.degree.pk, 'name': 'BE'}]})
+        response = self.client.get(
+            url, {'type': 'degrees', 'parent_id': self.university.pk}, HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_hierarchy_api_returns_the_active_tree(self):
+        Branch.objects.create(degree=self.degree, name='Retired', is_active=False)
+        response = self.client.get(reverse('core:hierarchy_api'))
+        [university] = response.json()['universities']
+        self.assertEqual([branch['name'] for branch in university['degrees'][0]['branches']], ['Computer'])
+
+
+class SharedCacheCheckTests(LocalServicesTestCase):
+    def test_process_local_cache_is_reported(self):
+        self.assertEqual([warning.id for warning in check_shared_cache(None)], ['university.W001'])
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache'}})
+    def test_shared_cache_passes(self):
+        self.assertEqual(check_shared_cache(None), [])
@@ -4,6 +4,7 @@ from django.contrib import messages
 from django.contrib.auth.decorators import user_passes_test
 from .models import University, Degree, Branch
 from .serializers import UniversitySerializer, DegreeSerializer, BranchSerializer
+from . import hierarchy
 from accounts.views import is_staff, jwt_auth
 
 
@@ -80,7 +81,7 @@ def degree_create(request):
         errors = {}
     return render(request, 'university/degree_form.html', {
         'serializer': serializer,
-        'universities': University.objects.filter(is_active=True),
+        'universities': hierarchy.active_universities(),
         'errors': errors
     })
 
@@ -115,7 +116,7 @@ def degree_update(request, pk):
         errors = {}
     return render(request, 'university/degree_form.html', {
         'serializer': serializer,
-        'universities': University.objects.filter(is_active=True),
+        'universities': hierarchy.active_universities(),
         'errors': errors
     })
 
@@ -139,7 +140,7 @@ def branch_create(request):
         errors = {}
     return render(request, 'university/branch_form.html', {
         'serializer': serializer,
-        'degrees': Degree.objects.filter(is_active=True),
+        'degrees': hierarchy.active_degrees(),
         'errors': errors
     })
 
@@ -174,6 +175,6 @@ def branch_update(request, pk):
         errors = {}
     return render(request, 'university/branch_form.html', {
         'serializer': serializer,
-        'degrees': Degree.objects.filter(is_active=True),
+        'degrees': hierarchy.active_degrees(),
         'errors': errors
     })
@@ -1,12 +1,23 @@
 # videocall/consumers.py (Enhanced version)
+import asyncio
 import json
+import logging
+import re
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.utils import timezone
-from .models import VideoRoom, RoomParticipant, ChatMessage
+from .models import ChatMessage
+from . import registry, stats
 
 User = get_user_model()
+logger = logging.getLogger(__name__)
+
+# Signaling frames are relayed as received text. The type is read off the
+# front of the usual {"type": ...} frame; other frames are decoded to find it.
+SIGNAL_TYPES = ('offer', 'answer', 'ice_candidate')
+SIGNAL_FRAME = re.compile(r'\s*\{\s*"type"\s*:\s*"(offer|answer|ice_candidate)"')
 
 
 class VideoCallConsumer(AsyncWebsocketConsumer):
@@ -14,6 +25,9 @@ class VideoCallConsumer(AsyncWebsocketConsumer):
         self.room_id = self.scope['url_route']['kwargs']['room_id']
         self.room_group_name = f'videocall_{self.room_id}'
         self.user = self.scope['user']
+        self.joined = False
+        self.peers = set()
+        self.ice_pending = []
 
         if not self.user.is_authenticated:
             await self.close()
@@ -27,8 +41,20 @@ class VideoCallConsumer(AsyncWebsocketConsumer):
 
         await self.accept()
 
-        # Add user to room participants
-        await self.add_participant()
+        # Add user to the room's live state; new members are saved in the background
+        try:
+            state, new_member = await registry.connect(self.room_id, self.user, self.channel_name)
+        except registry.RoomBusy:
+            # The client reconnects; better than joining with a lost update.
+            self.joined = False
+            await self.close()
+            return
+        self.joined = state is not None
+        if self.joined:
+            self.peers = registry.peer_channels(state, self.user.id)
+            self.heartbeats = registry.in_background(self.keep_alive())
+        if new_member:
+            registry.in_background(database_sync_to_async(registry.persist_join)(self.room_id, self.user.id))
 
         # Notify others that user joined
         await self.channel_layer.group_send(
@@ -37,15 +63,15 @@ class VideoCallConsumer(AsyncWebsocketConsumer):
                 'type': 'user_joined',
                 'user_id': self.user.id,
                 'username': self.user.username,
+                'channel': self.channel_name,
                 'user_avatar': self.user.profile_picture.url if self.user.profile_picture else None
             }
         )
 
         # Send room info to newly connected user
-        room_info = await self.get_room_info()
         await self.send(text_data=json.dumps({
             'type': 'room_info',
-            'room': room_info
+            'room': self.room_info(state)
         }))
 
     async def disconnect(self, close_code):
@@ -55,8 +81,16 @@ class VideoCallConsumer(AsyncWebsocketConsumer):
             self.channel_name
         )
 
-        # Remove from participants
-        await self.remove_participant()
+        if not self.joined:
+            return
+        self.heartbeats.cancel()
+
+        # Leave the room once no socket of this user has come back
+        try:
+            await registry.disconnect(self.room_id, self.user.id, self.channel_name)
+        except registry.RoomBusy:
+            logger.warning('Video room %s stayed locked; socket %s not removed', self.room_id, self.channel_name)
+        registry.in_background(self.leave_after_grace())
 
         # Notify others that user left
         await self.channel_layer.group_send(
@@ -64,25 +98,23 @@ class VideoCallConsumer(AsyncWebsocketConsumer):
             {
                 'type': 'user_left',
                 'user_id': self.user.id,
-                'username': self.user.username
+                'username': self.user.username,
+                'channel': self.channel_name
             }
         )
 
     async def receive(self, text_data):
+        signal = SIGNAL_FRAME.match(text_data)
+        if signal:
+            await self.signal(signal.group(1), text_data)
+            return
+
         try:
             data = json.loads(text_data)
             message_type = data.get('type')
 
-            if message_type in ['offer', 'answer', 'ice_candidate']:
-                # Forward WebRTC signaling messages
-                await self.channel_layer.group_send(
-                    self.room_group_name,
-                    {
-                        'type': 'webrtc_message',
-                        'message': data,
-                        'sender_id': self.user.id
-                    }
-                )
+            if message_type in SIGNAL_TYPES:
+                await self.signal(message_type, text_data)
 
             elif message_type == 'chat_message':
                 # Handle text chat messages
@@ -132,13 +164,43 @@ class VideoCallConsumer(AsyncWebsocketConsumer):
                 'message': 'Invalid JSON format'
             }))
 
-    async def webrtc_message(self, event):
-        # Don't send message back to sender
-        if event['sender_id'] != self.user.id:
-            await self.send(text_data=json.dumps(event['message']))
+    async def signal(self, signal_type, text):
+        # WebRTC signaling goes straight to the partner's sockets as received
+        if signal_type == 'ice_candidate':
+            self.queue_candidate(text)
+        else:
+            await self.send_candidates()  # keep candidates ahead of a later offer/answer
+            await self.relay(text)
+
+    async def relay(self, text):
+        await asyncio.gather(*(
+            self.channel_layer.send(channel, {'type': 'webrtc_raw', 'text': text}) for channel in self.peers
+        ))
+
+    def queue_candidate(self, text):
+        # Trickled candidates arriving within VIDEO_ICE_BATCH_WINDOW go out as one frame
+        self.ice_pending.append(text)
+        if len(self.ice_pending) == 1:
+            registry.in_background(self.flush_candidates())
+
+    async def flush_candidates(self):
+        await asyncio.sleep(getattr(settings, 'VIDEO_ICE_BATCH_WINDOW', 0.02))
+        await self.send_candidates()
+
+    async def send_candidates(self):
+        frames, self.ice_pending = self.ice_pending, []
+        if len(frames) == 1:
+            await self.relay(frames[0])
+        elif frames:
+            # Frames travel as strings, so one malformed frame can't spoil the others
+            await self.relay(json.dumps({'type': 'ice_candidates', 'frames': frames}))
+
+    async def webrtc_raw(self, event):
+        await self.send(text_data=event['text'])
 
     async def user_joined(self, event):
         if event['user_id'] != self.user.id:
+            self.peers.add(event['channel'])
             await self.send(text_data=json.dumps({
                 'type': 'user_joined',
                 'user_id': event['user_id'],
@@ -148,6 +210,7 @@ class VideoCallConsumer(AsyncWebsocketConsumer):
 
     async def user_left(self, event):
         if event['user_id'] != self.user.id:
+            self.peers.discard(event['channel'])
             await self.send(text_data=json.dumps({
                 'type': 'user_left',
                 'user_id': event['user_id'],
@@ -164,12 +227,29 @@ class VideoCallConsumer(AsyncWebsocketConsumer):
             'timestamp': event['timestamp']
         }))
 
+    async def match_found(self, event):
+        if event['user_id'] != self.user.id:
+            await self.send(text_data=json.dumps({
+                'type': 'match_found',
+                'room_id': event['room_id'],
+                'user_id': event['user_id'],
+                'username': event['username']
+            }))
+
     async def partner_skipped(self, event):
         await self.send(text_data=json.dumps({
             'type': 'partner_skipped',
             'message': f"{event['username']} has skipped to the next chat"
         }))
 
+    async def room_ended(self, event):
+        # Sent by videocall/reaper.py when it expires the room
+        await self.send(text_data=json.dumps({
+            'type': 'room_ended',
+            'message': 'This chat has ended'
+        }))
+        await self.close()
+
     async def typing_indicator(self, event):
         if event['user_id'] != self.user.id:
             await self.send(text_data=json.dumps({
@@ -178,75 +258,49 @@ class VideoCallConsumer(AsyncWebsocketConsumer):
                 'is_typing': event['is_typing']
             }))
 
-    @database_sync_to_async
-    def add_participant(self):
-        try:
-            room = VideoRoom.objects.get(id=self.room_id)
-            participant, created = RoomParticipant.objects.get_or_create(
-                user=self.user,
-                room=room,
-                defaults={'left_at': None}
-            )
-            if not created and participant.left_at:
-                participant.left_at = None
-                participant.save()
-        except VideoRoom.DoesNotExist:
-            pass
+    async def keep_alive(self):
+        # Tells the reaper this room still has a live socket; stops with the socket.
+        while True:
+            await registry.heartbeat(self.room_id)
+            await asyncio.sleep(registry.heartbeat_interval())
 
-    @database_sync_to_async
-    def remove_participant(self):
+    async def leave_after_grace(self):
+        await asyncio.sleep(registry.leave_grace())
         try:
-            participant = RoomParticipant.objects.get(
-                user=self.user,
-                room_id=self.room_id,
-                left_at__isnull=True
-            )
-            participant.left_at = timezone.now()
-            participant.save()
-
-            # Update room status if needed
-            room = VideoRoom.objects.get(id=self.room_id)
-            active_participants = room.current_participants_count
-
-            if active_participants == 0:
-                room.status = 'ended'
-                room.ended_at = timezone.now()
-                room.is_active = False
-                room.save()
-            elif active_participants == 1 and room.room_type == 'random':
-                room.status = 'waiting'
-                room.save()
-
-        except (RoomParticipant.DoesNotExist, VideoRoom.DoesNotExist):
-            pass
+            _, status = await registry.remove_if_gone(self.room_id, self.user.id)
+        except registry.RoomBusy:
+            logger.warning('Video room %s stayed locked; user %s not removed', self.room_id, self.user.id)
+            return
+        if status is not None:
+            await database_sync_to_async(registry.persist_leave)(self.room_id, self.user.id, status)
 
     @database_sync_to_async
     def save_chat_message(self, message_text):
-        try:
-            room = VideoRoom.objects.get(id=self.room_id)
-            ChatMessage.objects.create(
-                room=room,
-                user=self.user,
-                message=message_text
-            )
-        except VideoRoom.DoesNotExist:
-            pass
+        if self.joined:
+            ChatMessage.objects.create(room_id=self.room_id, user=self.user, message=message_text)
 
-    @database_sync_to_async
-    def get_room_info(self):
-        try:
-            room = VideoRoom.objects.get(id=self.room_id)
-            participants = room.participants.filter(
-                roomparticipant__left_at__isnull=True
-            ).values('id', 'username', 'profile_picture')
-
-            return {
-                'id': str(room.id),
-                'name': room.name,
-                'type': room.room_type,
-                'status': room.status,
-                'participants': list(participants),
-                'participant_count': len(participants)
-            }
-        except VideoRoom.DoesNotExist:
+    def room_info(self, state):
+        if state is None:
             return None
+        participants = registry.participants(state)
+        return {
+            'id': str(self.room_id),
+            'name': state['name'],
+            'type': state['room_type'],
+            'status': state['status'],
+            'participants': participants,
+            'participant_count': len(participants)
+        }
+
+
+class LobbyConsumer(AsyncWebsocketConsumer):
+    async def connect(self):
+        await self.channel_layer.group_add(stats.LOBBY_GROUP, self.channel_name)
+        await self.accept()
+        await self.lobby_stats({'stats': await database_sync_to_async(stats.snapshot)()})
+
+    async def disconnect(self, close_code):
+        await self.channel_layer.group_discard(stats.LOBBY_GROUP, self.channel_name)
+
+    async def lobby_stats(self, event):
+        await self.send(text_data=json.dumps({'type': 'lobby_stats', **event['stats']}))
@@ -0,0 +1,16 @@
+# videocall/management/commands/reap_video_rooms.py
+from django.core.management.base import BaseCommand
+
+from videocall import reaper
+
+
+class Command(BaseCommand):
+    help = 'Close abandoned video rooms and archive ended ones'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only report how many rooms would be affected')
+
+    def handle(self, *args, **options):
+        expired, archived = reaper.run(dry_run=options['dry_run'])
+        verb = 'would be' if options['dry_run'] else 'were'
+        self.stdout.write(self.style.SUCCESS(f'{expired} stale rooms {verb} closed, {archived} ended rooms {verb} archived.'))
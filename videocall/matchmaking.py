@@ -0,0 +1,175 @@
+# videocall/matchmaking.py
+# Random-chat matchmaking. A waiting random room is the queue entry: it sits
+# in the bucket of its host's location (or the open '' bucket) and is found
+# through the (status, room_type, match_bucket, created_at) index, oldest
+# first. The pop is SELECT ... FOR UPDATE SKIP LOCKED, so concurrent seekers
+# each lock a different waiting room instead of racing for the same one.
+#
+# Within a bucket the oldest MATCH_POOL_SIZE rooms are ranked by interest
+# overlap. Interests are hashed into a 63-bit set (stored on UserPreferences
+# and VideoRoom when saved), so scoring a candidate is an AND, an OR and two
+# popcounts. Rooms sharing no interest are only offered once they have waited
+# MATCH_INTEREST_WAIT seconds; users without interests match anyone.
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+import zlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import RoomParticipant, UserPreferences, VideoRoom
+
+OPEN_BUCKET = ''
+INTEREST_BITS = 63  # fits a signed BigIntegerField
+
+
+def current_room(user):
+    """The waiting or active room the user has not left, if any."""
+    membership = (
+        RoomParticipant.objects.filter(user=user, left_at__isnull=True, room__status__in=['waiting', 'active'])
+        .select_related('room').order_by('-joined_at').first()
+    )
+    return membership.room if membership else None
+
+
+def host_bucket(user, preferences):
+    # Hosts asking for location matching only take seekers from their location.
+    if preferences.location_based_matching and user.location:
+        return user.location
+    return OPEN_BUCKET
+
+
+def seeker_buckets(user, preferences):
+    if not user.location:
+        return [OPEN_BUCKET]
+    if preferences.location_based_matching:
+        return [user.location, OPEN_BUCKET]
+    return [OPEN_BUCKET, user.location]
+
+
+def pool_size():
+    return getattr(settings, 'MATCH_POOL_SIZE', 200)
+
+
+def interest_wait():
+    return getattr(settings, 'MATCH_INTEREST_WAIT', 15)
+
+
+def clean_interests(values):
+    """Lower-cased, de-duplicated interests from form values that may be comma separated."""
+    interests = []
+    for value in values:
+        for interest in value.split(','):
+            interest = interest.strip().lower()
+            if interest and interest not in interests:
+                interests.append(interest)
+    return interests
+
+
+def encode_interests(interests):
+    bits = 0
+    for interest in interests:
+        bits |= 1 << (zlib.crc32(interest.strip().lower().encode()) % INTEREST_BITS)
+    return bits
+
+
+def score(bits, other_bits):
+    """Jaccard overlap of two interest sets, 0.0 to 1.0."""
+    if not bits or not other_bits:
+        return 0.0
+    return (bits & other_bits).bit_count() / (bits | other_bits).bit_count()
+
+
+def rank(bits, candidates, now):
+    """Ids of ``(id, interest_bits, created_at)`` candidates that may match, best first."""
+    patient = now - timedelta(seconds=interest_wait())
+    ranked = []
+    for room_id, room_bits, created_at in candidates:
+        overlap = score(bits, room_bits)
+        if overlap or not bits or not room_bits or created_at <= patient:
+            ranked.append((-overlap, created_at, room_id))
+    ranked.sort()
+    return [room_id for _, _, room_id in ranked]
+
+
+def _pop(user, bits, bucket):
+    candidates = (
+        VideoRoom.objects.filter(room_type='random', status='waiting', is_active=True, match_bucket=bucket)
+        .exclude(roomparticipant__user=user)
+        .order_by('created_at')
+        .values_list('id', 'interest_bits', 'created_at')[:pool_size()]
+    )
+    for room_id in rank(bits, candidates, timezone.now()):
+        room = VideoRoom.objects.select_for_update(skip_locked=True).filter(pk=room_id, status='waiting').first()
+        if room is not None:
+            return room
+    return None
+
+
+def notify_match(room, user):
+    async_to_sync(get_channel_layer().group_send)(f'videocall_{room.id}', {
+        'type': 'match_found',
+        'room_id': str(room.id),
+        'user_id': user.id,
+        'username': user.username,
+    })
+
+
+def find_match(user):
+    """
+    Pair the user with the oldest compatible waiting room, or queue a new
+    waiting room for them. Returns ``(room, matched)``; a user who is already
+    in a room (say, from a double click) gets that room back.
+    """
+    preferences, _ = UserPreferences.objects.get_or_create(user=user)
+    with transaction.atomic():
+        # Locking the user's preferences row serializes their own concurrent requests.
+        preferences = UserPreferences.objects.select_for_update().get(pk=preferences.pk)
+        room = current_room(user)
+        if room is not None:
+            return room, room.status == 'active'
+        for bucket in seeker_buckets(user, preferences):
+            room = _pop(user, preferences.interest_bits, bucket)
+            if room is not None:
+                RoomParticipant.objects.create(user=user, room=room)
+                room.status = 'active'
+                room.save(update_fields=['status'])
+                transaction.on_commit(lambda: notify_match(room, user))
+                return room, True
+        room = VideoRoom.objects.create(
+            name='Random Chat',
+            created_by=user,
+            room_type='random',
+            location_filter=user.location or '',
+            match_bucket=host_bucket(user, preferences),
+            interests=preferences.interests,
+            interest_bits=preferences.interest_bits,
+            max_participants=2,
+            status='waiting',
+        )
+        RoomParticipant.objects.create(user=user, room=room, is_host=True)
+    return room, False
+
+
+
+def requeue(room):
+    """
+    Put a random room whose partner left back in the queue, with the bucket
+    and interests of the participant who stayed (the host may be the one who
+    left). It queues from now: created_at is reset, so the reaper's waiting
+    TTL and the interest wait start over. The caller saves the room.
+    """
+    stayed = (
+        RoomParticipant.objects.filter(room=room, left_at__isnull=True).select_related('user').order_by('joined_at').first()
+    )
+    room.status = 'waiting'
+    room.created_at = timezone.now()
+    if stayed is None:
+        return
+    preferences, _ = UserPreferences.objects.get_or_create(user=stayed.user)
+    room.location_filter = stayed.user.location or ''
+    room.match_bucket = host_bucket(stayed.user, preferences)
+    room.interests = preferences.interests
+    room.interest_bits = preferences.interest_bits
@@ -0,0 +1,22 @@
+# Generated by Django 4.2 on 2026-10-18 21:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('videocall', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='videoroom',
+            name='match_bucket',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AddIndex(
+            model_name='videoroom',
+            index=models.Index(fields=['status', 'room_type', 'match_bucket', 'created_at'], name='videocall_v_status_b3a5aa_idx'),
+        ),
+    ]
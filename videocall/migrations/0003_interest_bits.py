@@ -0,0 +1,36 @@
+# Generated by Django 4.2 on 2026-10-18 21:59
+
+import zlib
+
+from django.db import migrations, models
+
+
+def backfill_interest_bits(apps, schema_editor):
+    # Same encoding as videocall.matchmaking.encode_interests.
+    UserPreferences = apps.get_model('videocall', 'UserPreferences')
+    for preferences in UserPreferences.objects.exclude(interests=[]).iterator():
+        bits = 0
+        for interest in preferences.interests:
+            bits |= 1 << (zlib.crc32(str(interest).strip().lower().encode()) % 63)
+        UserPreferences.objects.filter(pk=preferences.pk).update(interest_bits=bits)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('videocall', '0002_videoroom_match_bucket'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userpreferences',
+            name='interest_bits',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='videoroom',
+            name='interest_bits',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_interest_bits, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 4.2 on 2026-10-18 22:05
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('videocall', '0003_interest_bits'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedChatMessage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('message', models.TextField()),
+                ('message_type', models.CharField(default='text', max_length=20)),
+                ('timestamp', models.DateTimeField()),
+            ],
+            options={
+                'ordering': ['timestamp'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedVideoRoom',
+            fields=[
+                ('id', models.UUIDField(editable=False, primary_key=True, serialize=False)),
+                ('name', models.CharField(blank=True, max_length=120)),
+                ('room_type', models.CharField(choices=[('random', 'Random Match'), ('private', 'Private Room'), ('study_group', 'Study Group')], max_length=20)),
+                ('participant_ids', models.JSONField(blank=True, default=list)),
+                ('skip_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField()),
+                ('ended_at', models.DateTimeField(blank=True, null=True)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='videoroom',
+            index=models.Index(fields=['status', 'created_at'], name='videocall_v_status_f8763e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='videoroom',
+            index=models.Index(fields=['status', 'ended_at'], name='videocall_v_status_3d176f_idx'),
+        ),
+        migrations.AddField(
+            model_name='archivedvideoroom',
+            name='created_by',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='archivedchatmessage',
+            name='room',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chat_messages', to='videocall.archivedvideoroom'),
+        ),
+        migrations.AddField(
+            model_name='archivedchatmessage',
+            name='user',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
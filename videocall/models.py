@@ -1,5 +1,8 @@
 # videocall/models.py (Enhanced version)
 from django.db import models
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save, pre_save
+from django.dispatch import receiver
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 import uuid
@@ -39,6 +42,9 @@ class VideoRoom(models.Model):
     age_min = models.PositiveIntegerField(null=True, blank=True)
     age_max = models.PositiveIntegerField(null=True, blank=True)
     interests = models.JSONField(default=list, blank=True)
+    # Matchmaking queue bucket of a waiting random room, see videocall/matchmaking.py
+    match_bucket = models.CharField(max_length=100, blank=True)
+    interest_bits = models.BigIntegerField(default=0, editable=False)
 
     created_at = models.DateTimeField(auto_now_add=True)
     ended_at = models.DateTimeField(null=True, blank=True)
@@ -47,12 +53,23 @@ class VideoRoom(models.Model):
     skip_count = models.PositiveIntegerField(default=0)
     chat_duration = models.DurationField(null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'room_type', 'match_bucket', 'created_at']),
+            models.Index(fields=['status', 'created_at']),
+            models.Index(fields=['status', 'ended_at']),
+        ]
+
     def __str__(self):
         return f"Room {self.id} - {self.room_type} ({self.status})"
 
     @property
     def current_participants_count(self):
-        return self.participants.filter(roomparticipant__left_at__isnull=True).count()
+        from .registry import load
+        state = load(self.pk)
+        if state is None:
+            return self.participants.filter(roomparticipant__left_at__isnull=True).count()
+        return len(state['members'])
 
     @property
     def is_full(self):
@@ -85,9 +102,34 @@ class ChatMessage(models.Model):
         ordering = ['timestamp']
 
 
+# Cold storage for ended rooms, written by videocall/reaper.py.
+class ArchivedVideoRoom(models.Model):
+    id = models.UUIDField(primary_key=True, editable=False)
+    name = models.CharField(max_length=120, blank=True)
+    room_type = models.CharField(max_length=20, choices=VideoRoom.ROOM_TYPE_CHOICES)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='+')
+    participant_ids = models.JSONField(default=list, blank=True)
+    skip_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField()
+    ended_at = models.DateTimeField(null=True, blank=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+
+class ArchivedChatMessage(models.Model):
+    room = models.ForeignKey(ArchivedVideoRoom, on_delete=models.CASCADE, related_name='chat_messages')
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='+')
+    message = models.TextField()
+    message_type = models.CharField(max_length=20, default='text')
+    timestamp = models.DateTimeField()
+
+    class Meta:
+        ordering = ['timestamp']
+
+
 class UserPreferences(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='chat_preferences')
     interests = models.JSONField(default=list, blank=True)
+    interest_bits = models.BigIntegerField(default=0, editable=False)
     preferred_age_min = models.PositiveIntegerField(default=18)
     preferred_age_max = models.PositiveIntegerField(default=100)
     location_based_matching = models.BooleanField(default=False)
@@ -95,3 +137,71 @@ class UserPreferences(models.Model):
 
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+
+
+@receiver(pre_save, sender=UserPreferences)
+def set_interest_bits(sender, instance, **kwargs):
+    from .matchmaking import encode_interests
+    instance.interest_bits = encode_interests(instance.interests)
+
+
+# Lobby counters (videocall/stats.py) follow room status changes and
+# participants joining and leaving.
+@receiver(post_init, sender=VideoRoom)
+def remember_status(sender, instance, **kwargs):
+    instance._loaded_status = instance.__dict__.get('status')
+
+
+@receiver(post_save, sender=VideoRoom)
+def count_room_status(sender, instance, created, **kwargs):
+    old, new = (None if created else instance._loaded_status), instance.status
+    instance._loaded_status = new
+    if old != new:
+        from .stats import status_changed
+        transaction.on_commit(lambda: status_changed(old, new))
+
+
+@receiver(post_delete, sender=VideoRoom)
+def uncount_room(sender, instance, **kwargs):
+    from .stats import status_changed
+    status = instance._loaded_status
+    transaction.on_commit(lambda: status_changed(status, None))
+
+
+@receiver(post_init, sender=RoomParticipant)
+def remember_presence(sender, instance, **kwargs):
+    instance._was_present = instance.pk is not None and instance.__dict__.get('left_at') is None
+
+
+@receiver(post_save, sender=RoomParticipant)
+def count_participant(sender, instance, **kwargs):
+    present = instance.left_at is None
+    if present != instance._was_present:
+        from .stats import adjust
+        instance._was_present = present
+        transaction.on_commit(lambda: adjust({'online_users': 1 if present else -1}))
+
+
+@receiver(post_delete, sender=RoomParticipant)
+def uncount_participant(sender, instance, **kwargs):
+    if instance._was_present:
+        from .stats import adjust
+        transaction.on_commit(lambda: adjust({'online_users': -1}))
+
+
+# Changes made outside the registry are merged into the cached room state
+# (videocall/registry.py) under its lock.
+@receiver(post_save, sender=VideoRoom)
+@receiver(post_delete, sender=VideoRoom)
+def refresh_room_state(sender, instance, **kwargs):
+    if not getattr(instance, '_from_registry', False):
+        from .registry import refresh
+        transaction.on_commit(lambda: refresh(instance.pk))
+
+
+@receiver(post_save, sender=RoomParticipant)
+@receiver(post_delete, sender=RoomParticipant)
+def refresh_participant_room_state(sender, instance, **kwargs):
+    if not getattr(instance, '_from_registry', False):
+        from .registry import refresh
+        transaction.on_commit(lambda: refresh(instance.room_id))
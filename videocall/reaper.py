@@ -0,0 +1,147 @@
+# videocall/reaper.py
+# Closes video rooms that crashed clients left open and moves ended rooms out
+# of the hot tables. Rooms are expired by indexed (status, created_at) range
+# scans and bulk UPDATEs, in batches: waiting rooms after VIDEO_WAITING_TTL
+# seconds unless a socket in the room still sends heartbeats (registry.alive),
+# active rooms after VIDEO_ACTIVE_TTL seconds regardless. Sockets still open in an
+# expired room are sent room_ended so their clients leave. Rooms ended more than
+# VIDEO_ARCHIVE_AFTER seconds ago are copied with their chat into
+# ArchivedVideoRoom/ArchivedChatMessage and deleted.
+#
+# Run with `manage.py reap_video_rooms`, or set VIDEO_REAPER_INTERVAL to run
+# it from a daemon thread in each ASGI process (a cache lock keeps it to one
+# run per interval across processes).
+import asyncio
+import logging
+import threading
+from datetime import timedelta
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import registry, stats
+from .models import ArchivedChatMessage, ArchivedVideoRoom, ChatMessage, RoomParticipant, VideoRoom
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+
+
+def _setting(name, default):
+    return timedelta(seconds=getattr(settings, name, default))
+
+
+def _expire(room_ids, now):
+    with transaction.atomic():
+        RoomParticipant.objects.filter(room_id__in=room_ids, left_at__isnull=True).update(left_at=now)
+        VideoRoom.objects.filter(pk__in=room_ids).update(status='ended', ended_at=now, is_active=False)
+    registry.forget_many(room_ids)
+    async_to_sync(_notify_ended)(room_ids)
+
+
+async def _notify_ended(room_ids):
+    layer = get_channel_layer()
+    await asyncio.gather(*(
+        layer.group_send(f'videocall_{room_id}', {'type': 'room_ended'}) for room_id in room_ids
+    ))
+
+
+def expire_stale(now=None, dry_run=False):
+    """Close abandoned rooms; returns how many were (or would be) closed."""
+    now = now or timezone.now()
+    limits = [
+        ('waiting', now - _setting('VIDEO_WAITING_TTL', 15 * 60), True),
+        ('active', now - _setting('VIDEO_ACTIVE_TTL', 4 * 60 * 60), False),
+    ]
+    expired = 0
+    for status, cutoff, spare_alive in limits:
+        after = None
+        while True:
+            rooms = VideoRoom.objects.filter(status=status, created_at__lt=cutoff)
+            if after is not None:
+                # Keyset on (created_at, id), so rooms sharing a timestamp aren't skipped.
+                after_id, after_at = after
+                rooms = rooms.filter(Q(created_at__gt=after_at) | Q(created_at=after_at, id__gt=after_id))
+            batch = list(rooms.order_by('created_at', 'id').values_list('id', 'created_at')[:BATCH_SIZE])
+            if not batch:
+                break
+            after = batch[-1]
+            room_ids = [room_id for room_id, _ in batch]
+            if spare_alive:
+                alive = registry.alive(room_ids)
+                room_ids = [room_id for room_id in room_ids if room_id not in alive]
+            if room_ids and not dry_run:
+                _expire(room_ids, now)
+            expired += len(room_ids)
+            if len(batch) < BATCH_SIZE:
+                break
+    if expired and not dry_run:
+        stats.recount()
+    return expired
+
+
+def archive_ended(now=None, dry_run=False):
+    """Move rooms ended before VIDEO_ARCHIVE_AFTER into the archive tables."""
+    cutoff = (now or timezone.now()) - _setting('VIDEO_ARCHIVE_AFTER', 24 * 60 * 60)
+    rooms = VideoRoom.objects.filter(status='ended', ended_at__lt=cutoff)
+    if dry_run:
+        return rooms.count()
+    archived = 0
+    while True:
+        batch = list(rooms.order_by('ended_at')[:BATCH_SIZE])
+        if not batch:
+            return archived
+        room_ids = [room.pk for room in batch]
+        members = {}
+        for room_id, user_id in RoomParticipant.objects.filter(room_id__in=room_ids).values_list('room_id', 'user_id'):
+            members.setdefault(room_id, []).append(user_id)
+        with transaction.atomic():
+            ArchivedVideoRoom.objects.bulk_create([
+                ArchivedVideoRoom(
+                    id=room.pk, name=room.name, room_type=room.room_type, created_by_id=room.created_by_id,
+                    participant_ids=members.get(room.pk, []), skip_count=room.skip_count,
+                    created_at=room.created_at, ended_at=room.ended_at,
+                )
+                for room in batch
+            ], ignore_conflicts=True)
+            messages = ChatMessage.objects.filter(room_id__in=room_ids).values_list(
+                'room_id', 'user_id', 'message', 'message_type', 'timestamp'
+            )
+            ArchivedChatMessage.objects.bulk_create([
+                ArchivedChatMessage(room_id=room_id, user_id=user_id, message=text, message_type=kind, timestamp=at)
+                for room_id, user_id, text, kind, at in messages.iterator()
+            ], batch_size=BATCH_SIZE)
+            ChatMessage.objects.filter(room_id__in=room_ids).delete()
+            RoomParticipant.objects.filter(room_id__in=room_ids).delete()
+            VideoRoom.objects.filter(pk__in=room_ids).delete()
+        archived += len(batch)
+
+
+def run(dry_run=False):
+    return expire_stale(dry_run=dry_run), archive_ended(dry_run=dry_run)
+
+
+def start_scheduler(interval):
+    def tick():
+        try:
+            if cache.add('video_reaper:lock', 1, interval):
+                expired, archived = run()
+                if expired or archived:
+                    logger.info('Video reaper expired %d rooms and archived %d', expired, archived)
+        except Exception:
+            logger.exception('Video reaper failed')
+        finally:
+            close_old_connections()
+        schedule()
+
+    def schedule():
+        timer = threading.Timer(interval, tick)
+        timer.daemon = True
+        timer.start()
+
+    schedule()
@@ -0,0 +1,275 @@
+# videocall/registry.py
+# Live state of a video room (status, host, members and their sockets' channel names)
+# kept as one cache entry, so VideoCallConsumer connects and disconnects
+# without reading the room back from the database. Updates take a short
+# cache lock (an atomic add) around the read-modify-write; a lock left by a
+# crashed worker expires after LOCK_TIMEOUT seconds. The entry is
+# seeded from VideoRoom/RoomParticipant on first use. When a view changes
+# those rows, the signals in videocall/models.py merge them into the entry
+# under the same lock (refresh), so sockets' channel names are never lost.
+#
+# The consumer writes its own changes back in the background. A member whose
+# last socket closes is only removed after VIDEO_LEAVE_GRACE seconds, so a
+# flaky connection that drops and reconnects costs no database writes.
+import asyncio
+import logging
+import time
+import uuid
+from contextlib import contextmanager
+
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import RoomParticipant, VideoRoom
+
+logger = logging.getLogger(__name__)
+
+STATE_TTL = 6 * 60 * 60
+LOCK_TIMEOUT = 5
+LOCK_POLL = 0.01
+
+
+class RoomBusy(Exception):
+    """The room's lock could not be taken within LOCK_TIMEOUT seconds."""
+
+
+def leave_grace():
+    return getattr(settings, 'VIDEO_LEAVE_GRACE', 5)
+
+
+def _key(room_id):
+    return f'video_room:{room_id}'
+
+
+def _member(user_id, username, profile_picture):
+    return {'id': user_id, 'username': username, 'profile_picture': profile_picture or '', 'channels': []}
+
+
+def seed(room_id):
+    room = (
+        VideoRoom.objects.filter(pk=room_id)
+        .values('name', 'status', 'room_type', 'max_participants', 'created_by_id').first()
+    )
+    if room is None:
+        return None
+    members = RoomParticipant.objects.filter(room_id=room_id, left_at__isnull=True).values_list(
+        'user_id', 'user__username', 'user__profile_picture'
+    )
+    return {**room, 'members': {user_id: _member(user_id, *rest) for user_id, *rest in members}}
+
+
+def load(room_id):
+    """The room's state, seeding it from the database if it is not cached."""
+    state = cache.get(_key(room_id))
+    if state is None:
+        state = seed(room_id)
+        if state is not None:
+            cache.add(_key(room_id), state, STATE_TTL)  # never over a locked update
+    return state
+
+
+def forget_many(room_ids):
+    cache.delete_many([_key(room_id) for room_id in room_ids])
+
+
+def heartbeat_interval():
+    return getattr(settings, 'VIDEO_HEARTBEAT_INTERVAL', 30)
+
+
+def _alive_key(room_id):
+    return f'video_room_alive:{room_id}'
+
+
+async def heartbeat(room_id):
+    """Mark the room as having an open socket; consumers call this every heartbeat_interval()."""
+    await cache.aset(_alive_key(room_id), 1, heartbeat_interval() * 3)
+
+
+def alive(room_ids):
+    """
+    The rooms among ``room_ids`` with a socket heartbeat in the last three
+    intervals. Kept apart from the room state, so reseeds and its TTL don't
+    make a busy room look abandoned.
+    """
+    found = cache.get_many([_alive_key(room_id) for room_id in room_ids])
+    return {room_id for room_id in room_ids if _alive_key(room_id) in found}
+
+
+def _lock_key(room_id):
+    return f'{_key(room_id)}:lock'
+
+
+@contextmanager
+def locked(room_id):
+    """The room's lock for sync code (views, signal handlers); raises RoomBusy."""
+    lock, token = _lock_key(room_id), uuid.uuid4().hex
+    deadline = time.monotonic() + LOCK_TIMEOUT + 1
+    while not cache.add(lock, token, LOCK_TIMEOUT):
+        if time.monotonic() > deadline:
+            raise RoomBusy(room_id)
+        time.sleep(LOCK_POLL)
+    try:
+        yield
+    finally:
+        if cache.get(lock) == token:
+            cache.delete(lock)
+
+
+def refresh(room_id):
+    """
+    Bring a cached state in line with the room's rows after a view changed
+    them: status and membership come from the database, while members keep
+    their sockets' channel names and members with open sockets are never
+    dropped. A room that is not cached is left to be seeded on first use.
+    """
+    try:
+        with locked(room_id):
+            state = cache.get(_key(room_id))
+            if state is None:
+                return
+            fresh = seed(room_id)
+            if fresh is None:
+                cache.delete(_key(room_id))
+                return
+            for user_id, member in state['members'].items():
+                if user_id in fresh['members']:
+                    fresh['members'][user_id]['channels'] = member['channels']
+                elif member['channels']:
+                    # Connected before persist_join committed, or left in a view with a
+                    # socket still open; remove_if_gone drops them once it closes.
+                    fresh['members'][user_id] = member
+            cache.set(_key(room_id), fresh, STATE_TTL)
+    except RoomBusy:
+        logger.warning('Video room %s stayed locked; cached state not refreshed', room_id)
+
+
+async def update(room_id, change):
+    """
+    Apply ``change(state)`` under the room's lock and store the result.
+    Returns ``(state, change's return value)``, or ``(None, None)`` for a
+    room that does not exist. Raises RoomBusy if the lock cannot be taken.
+    """
+    lock, token = _lock_key(room_id), uuid.uuid4().hex
+    # Waiting a little longer than LOCK_TIMEOUT outlasts any holder that died.
+    deadline = asyncio.get_running_loop().time() + LOCK_TIMEOUT + 1
+    while not await cache.aadd(lock, token, LOCK_TIMEOUT):
+        if asyncio.get_running_loop().time() > deadline:
+            raise RoomBusy(room_id)
+        await asyncio.sleep(LOCK_POLL)
+    try:
+        state = await cache.aget(_key(room_id))
+        if state is None:
+            state = await database_sync_to_async(seed)(room_id)
+            if state is None:
+                return None, None
+        result = change(state)
+        await cache.aset(_key(room_id), state, STATE_TTL)
+        return state, result
+    finally:
+        # Only release our own lock, not one taken after ours expired.
+        if await cache.aget(lock) == token:
+            await cache.adelete(lock)
+
+
+def peer_channels(state, user_id):
+    """Channel names of the other members' sockets, for direct signaling."""
+    return {
+        channel for member_id, member in state['members'].items() if member_id != user_id
+        for channel in member['channels']
+    }
+
+
+def participants(state):
+    return [
+        {'id': member['id'], 'username': member['username'], 'profile_picture': member['profile_picture']}
+        for member in state['members'].values()
+    ]
+
+
+async def connect(room_id, user, channel_name):
+    """Add a socket of the user; the result is True if this made them a member."""
+    def change(state):
+        member = state['members'].get(user.id)
+        new = member is None
+        if new:
+            picture = user.profile_picture.name if user.profile_picture else ''
+            member = state['members'][user.id] = _member(user.id, user.username, picture)
+        member['channels'].append(channel_name)
+        return new
+
+    return await update(room_id, change)
+
+
+async def disconnect(room_id, user_id, channel_name):
+    def change(state):
+        member = state['members'].get(user_id)
+        if member is not None and channel_name in member['channels']:
+            member['channels'].remove(channel_name)
+
+    return await update(room_id, change)
+
+
+async def remove_if_gone(room_id, user_id):
+    """
+    Drop the member if none of their sockets came back. Returns the room's new
+    status when the member was removed, otherwise None.
+    """
+    def change(state):
+        member = state['members'].get(user_id)
+        if member is None or member['channels']:
+            return None
+        del state['members'][user_id]
+        if not state['members']:
+            state['status'] = 'ended'
+        elif len(state['members']) == 1 and state['room_type'] == 'random':
+            state['status'] = 'waiting'
+        return state['status']
+
+    return await update(room_id, change)
+
+
+_tasks = set()
+
+
+def in_background(coroutine):
+    # Keep a reference so the task is not collected before it finishes.
+    task = asyncio.ensure_future(coroutine)
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+    return task
+
+
+def persist_join(room_id, user_id):
+    participant = RoomParticipant.objects.filter(room_id=room_id, user_id=user_id).first()
+    if participant is None:
+        participant = RoomParticipant(room_id=room_id, user_id=user_id)
+    elif participant.left_at is None:
+        return
+    participant.left_at = None
+    participant._from_registry = True
+    participant.save()
+
+
+def persist_leave(room_id, user_id, status):
+    participant = RoomParticipant.objects.filter(room_id=room_id, user_id=user_id, left_at__isnull=True).first()
+    if participant is not None:
+        participant.left_at = timezone.now()
+        participant._from_registry = True
+        participant.save(update_fields=['left_at'])
+    room = VideoRoom.objects.filter(pk=room_id).first()
+    if room is None or room.status == status:
+        return
+    room.status = status
+    fields = ['status']
+    if status == 'waiting' and room.room_type == 'random':
+        from .matchmaking import requeue
+        requeue(room)
+        fields += ['created_at', 'location_filter', 'match_bucket', 'interests', 'interest_bits']
+    if status == 'ended':
+        room.ended_at = timezone.now()
+        room.is_active = False
+        fields += ['ended_at', 'is_active']
+    room._from_registry = True
+    room.save(update_fields=fields)
@@ -0,0 +1,99 @@
+# videocall/stats.py
+# Lobby counters kept in the cache and moved by the signals in
+# videocall/models.py: "online" as RoomParticipant rows join and leave (which
+# VideoCallConsumer does on connect and disconnect), "active"/"waiting" as
+# rooms change status. Reading the lobby is one get_many. Missing keys (cold
+# cache, or expired after LOBBY_STATS_TTL so drift cannot build up) are
+# recounted from the database once. Changes are pushed to the lobby socket
+# group at most once per LOBBY_PUSH_INTERVAL seconds; changes made during that
+# window are sent in one trailing push when it closes.
+import threading
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections
+
+from .models import RoomParticipant, VideoRoom
+
+LOBBY_GROUP = 'videocall_lobby'
+KEYS = {
+    'online_users': 'lobby_stats:online',
+    'active_chats': 'lobby_stats:active',
+    'waiting_users': 'lobby_stats:waiting',
+}
+PUSHED_KEY = 'lobby_stats:pushed'
+PENDING_KEY = 'lobby_stats:pending'
+STATUS_KEYS = {'active': 'active_chats', 'waiting': 'waiting_users'}
+
+
+def ttl():
+    return getattr(settings, 'LOBBY_STATS_TTL', 3600)
+
+
+def recount():
+    stats = {
+        'online_users': RoomParticipant.objects.filter(left_at__isnull=True).count(),
+        'active_chats': VideoRoom.objects.filter(status='active').count(),
+        'waiting_users': VideoRoom.objects.filter(status='waiting').count(),
+    }
+    cache.set_many({KEYS[name]: value for name, value in stats.items()}, ttl())
+    return stats
+
+
+def snapshot():
+    found = cache.get_many(KEYS.values())
+    if len(found) < len(KEYS):
+        return recount()
+    return {name: max(found[key], 0) for name, key in KEYS.items()}
+
+
+def adjust(changes):
+    """Apply ``{'active_chats': +1, ...}``; a missing key means a recount is due anyway."""
+    for name, delta in changes.items():
+        if not delta:
+            continue
+        try:
+            cache.incr(KEYS[name], delta)
+        except ValueError:
+            recount()
+            break
+    publish()
+
+
+def status_changed(old, new):
+    changes = {}
+    if old in STATUS_KEYS:
+        changes[STATUS_KEYS[old]] = -1
+    if new in STATUS_KEYS:
+        changes[STATUS_KEYS[new]] = changes.get(STATUS_KEYS[new], 0) + 1
+    adjust(changes)
+
+
+def push_interval():
+    return getattr(settings, 'LOBBY_PUSH_INTERVAL', 1)
+
+
+def _send():
+    async_to_sync(get_channel_layer().group_send)(LOBBY_GROUP, {'type': 'lobby_stats', 'stats': snapshot()})
+
+
+def _send_trailing():
+    try:
+        cache.delete(PENDING_KEY)
+        cache.set(PUSHED_KEY, 1, push_interval())
+        _send()
+    finally:
+        close_old_connections()
+
+
+def publish():
+    interval = push_interval()
+    if cache.add(PUSHED_KEY, 1, interval):
+        _send()
+    elif cache.add(PENDING_KEY, 1, interval * 2):
+        # Throttled: one process sends the numbers again once the window closes.
+        timer = threading.Timer(interval, _send_trailing)
+        timer.daemon = True
+        timer.start()
@@ -1,3 +1,317 @@
-from django.test import TestCase
+import asyncio
+from datetime import timedelta
+from unittest.mock import patch
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.core.cache import cache
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import User
+from core.testing import LocalServicesTestCase, LocalServicesTransactionTestCase
+
+from . import matchmaking, reaper, registry, stats
+from .models import ArchivedChatMessage, ArchivedVideoRoom, ChatMessage, RoomParticipant, UserPreferences, VideoRoom
+from .routing import websocket_urlpatterns
+
+
+def make_user(username, location='', interests=(), location_based=False):
+    user = User.objects.create_user(username, password='pw', location=location)
+    UserPreferences.objects.create(user=user, interests=list(interests), location_based_matching=location_based)
+    return user
+
+
+class MatchmakingTests(LocalServicesTestCase):
+    def test_first_seeker_waits_and_the_next_one_matches(self):
+        alice, bob = make_user('alice'), make_user('bob')
+        room, matched = matchmaking.find_match(alice)
+        self.assertEqual((room.status, matched), ('waiting', False))
+        self.assertEqual(matchmaking.find_match(bob), (room, True))
+        self.assertEqual(VideoRoom.objects.get(pk=room.pk).status, 'active')
+
+    def test_a_second_request_gets_the_same_room_back(self):
+        alice = make_user('alice')
+        room, _ = matchmaking.find_match(alice)
+        self.assertEqual(matchmaking.find_match(alice), (room, False))
+        self.assertEqual(VideoRoom.objects.count(), 1)
+
+    def test_location_hosts_only_take_seekers_from_their_location(self):
+        host = make_user('host', location='Pune', location_based=True)
+        room, _ = matchmaking.find_match(host)
+        self.assertEqual(room.match_bucket, 'Pune')
+        self.assertFalse(matchmaking.find_match(make_user('far', location='Delhi', location_based=True))[1])
+        self.assertEqual(matchmaking.find_match(make_user('near', location='Pune')), (room, True))
+
+    def test_find_random_view_reports_the_users_room(self):
+        alice = make_user('alice')
+        room, _ = matchmaking.find_match(alice)
+        self.client.force_login(alice)
+        for url in (reverse('videocall:find_random'), reverse('videocall:find_match_api')):
+            response = self.client.post(url)
+            self.assertEqual(response.json()['room_id'], str(room.pk))
+            self.assertEqual(response.json()['status'], 'waiting')
+
+
+class SkipChatTests(LocalServicesTestCase):
+    def test_the_room_is_requeued_for_the_participant_who_stayed(self):
+        host = make_user('host', location='Pune', location_based=True, interests=['chess'])
+        guest = make_user('guest', location='Pune', interests=['chess', 'music'])
+        room, _ = matchmaking.find_match(host)
+        self.assertEqual(matchmaking.find_match(guest), (room, True))
+
+        self.client.force_login(host)
+        self.client.post(reverse('videocall:skip_chat', args=[room.pk]))
+        room.refresh_from_db()
+        guest_preferences = UserPreferences.objects.get(user=guest)
+        self.assertEqual(
+            (room.status, room.skip_count, room.match_bucket, room.interest_bits),
+            ('waiting', 1, '', guest_preferences.interest_bits),
+        )
+        self.assertEqual(room.interests, ['chess', 'music'])
+        self.assertFalse(RoomParticipant.objects.filter(room=room, user=host, left_at__isnull=True).exists())
+
+
+class InterestScoringTests(LocalServicesTestCase):
+    def test_overlap_is_jaccard_over_the_hashed_sets(self):
+        chess, both = matchmaking.encode_interests(['chess']), matchmaking.encode_interests(['Chess ', 'music'])
+        self.assertEqual(matchmaking.score(chess, chess), 1.0)
+        self.assertEqual(matchmaking.score(chess, both), 0.5)
+        self.assertEqual(matchmaking.score(0, both), 0.0)
+
+    def test_rank_prefers_overlap_and_holds_back_strangers(self):
+        now = timezone.now()
+        chess, music = matchmaking.encode_interests(['chess']), matchmaking.encode_interests(['music'])
+        candidates = [
+            ('old-stranger', music, now - timedelta(minutes=5)),
+            ('new-stranger', music, now),
+            ('no-interests', 0, now),
+            ('match', chess, now),
+        ]
+        self.assertEqual(matchmaking.rank(chess, candidates, now), ['match', 'old-stranger', 'no-interests'])
+
+    def test_preferences_store_their_bits(self):
+        user = make_user('alice', interests=['chess'])
+        self.assertEqual(user.chat_preferences.interest_bits, matchmaking.encode_interests(['chess']))
+
+    def test_seekers_take_the_best_overlap_not_the_oldest_room(self):
+        stranger_room, _ = matchmaking.find_match(make_user('stranger', interests=['music']))
+        friend_room, matched = matchmaking.find_match(make_user('friend', interests=['chess']))
+        self.assertFalse(matched)  # no shared interest and the stranger has not waited long enough
+        self.assertEqual(matchmaking.find_match(make_user('seeker', interests=['chess'])), (friend_room, True))
+
+        VideoRoom.objects.filter(pk=stranger_room.pk).update(created_at=timezone.now() - timedelta(minutes=1))
+        self.assertEqual(matchmaking.find_match(make_user('artist', interests=['art']))[0], stranger_room)
+
+    def test_preferences_view_cleans_interests(self):
+        user = make_user('alice')
+        self.client.force_login(user)
+        self.client.post(reverse('videocall:preferences'), {'interests': ['Chess, music', 'chess']})
+        self.assertEqual(UserPreferences.objects.get(user=user).interests, ['chess', 'music'])
+
+
+class LobbyStatsTests(LocalServicesTestCase):
+    def setUp(self):
+        super().setUp()
+        # Trailing pushes run on a timer thread; here they are only recorded.
+        self.timer = self.enterContext(patch('videocall.stats.threading.Timer'))
+
+    def test_a_cold_cache_is_recounted_once(self):
+        matchmaking.find_match(make_user('alice'))
+        with self.assertNumQueries(3):
+            self.assertEqual(stats.snapshot(), {'online_users': 1, 'active_chats': 0, 'waiting_users': 1})
+        with self.assertNumQueries(0):
+            stats.snapshot()
+
+    def test_counters_follow_a_match(self):
+        stats.snapshot()
+        with self.captureOnCommitCallbacks(execute=True):
+            matchmaking.find_match(make_user('alice'))
+        with self.captureOnCommitCallbacks(execute=True):
+            matchmaking.find_match(make_user('bob'))
+        with self.assertNumQueries(0):
+            self.assertEqual(stats.snapshot(), {'online_users': 2, 'active_chats': 1, 'waiting_users': 0})
+
+    def test_pushes_are_throttled_with_one_trailing_push(self):
+        layer = get_channel_layer()
+        channel = async_to_sync(layer.new_channel)()
+        async_to_sync(layer.group_add)(stats.LOBBY_GROUP, channel)
+        stats.snapshot()
+        for _ in range(3):
+            stats.adjust({'online_users': 1})
+        self.assertEqual(async_to_sync(layer.receive)(channel)['stats']['online_users'], 1)
+        self.timer.assert_called_once_with(stats.push_interval(), stats._send_trailing)
+
+    def test_lobby_renders_the_counters(self):
+        user = make_user('alice')
+        self.client.force_login(user)
+        response = self.client.get(reverse('videocall:lobby'))
+        self.assertEqual(response.context['stats'], {'online_users': 0, 'active_chats': 0, 'waiting_users': 0})
+
+
+class RoomRegistryTests(LocalServicesTestCase):
+    def setUp(self):
+        super().setUp()
+        self.host, self.guest = make_user('host'), make_user('guest')
+        self.room, _ = matchmaking.find_match(self.host)
+        registry.load(self.room.pk)  # seeded here, so the async updates below don't touch the database
+
+    def connect(self, user, channel):
+        return async_to_sync(registry.connect)(self.room.pk, user, channel)
+
+    def test_sockets_join_and_leave_without_queries(self):
+        with self.assertNumQueries(0):
+            state, new = self.connect(self.host, 'host-1')
+            self.assertFalse(new)  # already a participant
+            state, new = self.connect(self.guest, 'guest-1')
+            self.assertTrue(new)
+            self.assertEqual(registry.peer_channels(state, self.guest.pk), {'host-1'})
+            async_to_sync(registry.disconnect)(self.room.pk, self.guest.pk, 'guest-1')
+            _, status = async_to_sync(registry.remove_if_gone)(self.room.pk, self.guest.pk)
+        self.assertEqual(status, 'waiting')
+
+    def test_a_member_with_a_socket_back_is_kept(self):
+        self.connect(self.host, 'host-1')
+        self.connect(self.host, 'host-2')
+        async_to_sync(registry.disconnect)(self.room.pk, self.host.pk, 'host-1')
+        self.assertEqual(async_to_sync(registry.remove_if_gone)(self.room.pk, self.host.pk)[1], None)
+
+    def test_view_changes_are_merged_without_losing_sockets(self):
+        self.connect(self.host, 'host-1')
+        with self.captureOnCommitCallbacks(execute=True):
+            VideoRoom.objects.get(pk=self.room.pk).save()  # a view saving the room
+            RoomParticipant.objects.create(room=self.room, user=self.guest)
+            VideoRoom.objects.filter(pk=self.room.pk).update(status='active')
+        state = registry.load(self.room.pk)
+        self.assertEqual(state['status'], 'active')
+        self.assertEqual(state['members'][self.host.pk]['channels'], ['host-1'])
+        self.assertEqual(set(state['members']), {self.host.pk, self.guest.pk})
+
+    def test_updates_wait_for_the_lock(self):
+        cache.add(registry._lock_key(self.room.pk), 'someone else', registry.LOCK_TIMEOUT)
+        with patch.object(registry, 'LOCK_TIMEOUT', 0), self.assertLogs('videocall.registry', 'WARNING'):
+            registry.refresh(self.room.pk)
+        with patch.object(registry, 'LOCK_TIMEOUT', 0), self.assertRaises(registry.RoomBusy):
+            self.connect(self.host, 'host-1')
+
+    def test_sockets_that_are_not_saved_yet_survive_a_refresh(self):
+        self.connect(self.guest, 'guest-1')  # persist_join still pending
+        with self.captureOnCommitCallbacks(execute=True):
+            VideoRoom.objects.get(pk=self.room.pk).save()
+        self.assertEqual(registry.load(self.room.pk)['members'][self.guest.pk]['channels'], ['guest-1'])
+
+
+class SignalingTests(LocalServicesTransactionTestCase):
+    def setUp(self):
+        super().setUp()
+        self.enterContext(patch('videocall.stats.threading.Timer'))
+        self.host, self.guest = make_user('host'), make_user('guest')
+
+    async def join(self, user, room):
+        communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), f'/ws/videocall/{room.pk}/')
+        communicator.scope['user'] = user
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        return communicator
+
+    async def receive_type(self, communicator, frame_type):
+        while True:
+            frame = await communicator.receive_json_from()
+            if frame['type'] == frame_type:
+                return frame
+
+    async def test_peers_can_signal_after_a_match(self):
+        room, _ = await database_sync_to_async(matchmaking.find_match)(self.host)
+        host = await self.join(self.host, room)
+        await self.receive_type(host, 'room_info')
+
+        # The match saves the room and a participant row, which refreshes the cached state.
+        self.assertEqual(await database_sync_to_async(matchmaking.find_match)(self.guest), (room, True))
+        guest = await self.join(self.guest, room)
+        info = await self.receive_type(guest, 'room_info')
+        self.assertEqual(info['room']['status'], 'active')
+
+        await guest.send_to(text_data='{"type": "offer", "sdp": "guest-offer"}')
+        self.assertEqual((await self.receive_type(host, 'offer'))['sdp'], 'guest-offer')
+        await host.send_to(text_data='{"type": "answer", "sdp": "host-answer"}')
+        self.assertEqual((await self.receive_type(guest, 'answer'))['sdp'], 'host-answer')
+
+        await guest.disconnect()
+        await host.disconnect()
+
+    async def test_open_sockets_keep_the_room_alive(self):
+        room, _ = await database_sync_to_async(matchmaking.find_match)(self.host)
+        host = await self.join(self.host, room)
+        await self.receive_type(host, 'room_info')
+        for _ in range(50):  # the heartbeat is written from a background task
+            if registry.alive([room.pk]):
+                break
+            await asyncio.sleep(0.02)
+        self.assertEqual(registry.alive([room.pk]), {room.pk})
+        await host.disconnect()
+
+
+class ReaperTests(LocalServicesTestCase):
+    def setUp(self):
+        super().setUp()
+        self.enterContext(patch('videocall.stats.threading.Timer'))
+        self.later = timezone.now() + timedelta(hours=1)
+
+    def waiting_room(self, username):
+        return matchmaking.find_match(make_user(username))[0]
+
+    def test_abandoned_waiting_rooms_are_ended_and_their_sockets_told(self):
+        room = self.waiting_room('alice')
+        layer = get_channel_layer()
+        channel = async_to_sync(layer.new_channel)()
+        async_to_sync(layer.group_add)(f'videocall_{room.pk}', channel)
+
+        self.assertEqual(reaper.expire_stale(self.later), 1)
+        room.refresh_from_db()
+        self.assertEqual((room.status, room.is_active), ('ended', False))
+        self.assertFalse(RoomParticipant.objects.filter(room=room, left_at__isnull=True).exists())
+        self.assertEqual(async_to_sync(layer.receive)(channel)['type'], 'room_ended')
+
+    def test_rooms_with_a_heartbeat_are_spared_even_without_cached_state(self):
+        room = self.waiting_room('alice')
+        async_to_sync(registry.heartbeat)(room.pk)
+        cache.delete(registry._key(room.pk))
+        self.assertEqual(reaper.expire_stale(self.later), 0)
+
+    def test_rooms_sharing_a_timestamp_are_all_paged(self):
+        for n in range(3):
+            VideoRoom.objects.create(created_by=make_user(f'user{n}'))
+        VideoRoom.objects.update(created_at=timezone.now())
+        with patch.object(reaper, 'BATCH_SIZE', 1):
+            self.assertEqual(reaper.expire_stale(self.later), 3)
+
+    def test_a_skipped_room_queues_from_now(self):
+        host, guest = make_user('host'), make_user('guest')
+        room, _ = matchmaking.find_match(host)
+        matchmaking.find_match(guest)
+        VideoRoom.objects.filter(pk=room.pk).update(created_at=timezone.now() - timedelta(hours=1))
+        self.client.force_login(host)
+        self.client.post(reverse('videocall:skip_chat', args=[room.pk]))
+        self.assertEqual(reaper.expire_stale(timezone.now() + timedelta(minutes=5)), 0)
+
+    def test_a_partner_leaving_over_the_socket_requeues_the_room(self):
+        host, guest = make_user('host', interests=['chess']), make_user('guest', interests=['chess', 'go'])
+        room, _ = matchmaking.find_match(host)
+        self.assertEqual(matchmaking.find_match(guest), (room, True))
+        registry.persist_leave(room.pk, host.pk, 'waiting')
+        room.refresh_from_db()
+        self.assertEqual((room.status, room.interests), ('waiting', ['chess', 'go']))
+        self.assertGreater(room.created_at, timezone.now() - timedelta(minutes=1))
+
+    def test_ended_rooms_are_archived_with_their_chat(self):
+        room = self.waiting_room('alice')
+        ChatMessage.objects.create(room=room, user=room.created_by, message='anyone?')
+        reaper.expire_stale(self.later)
+        self.assertEqual(reaper.archive_ended(self.later + timedelta(days=2)), 1)
+        self.assertFalse(VideoRoom.objects.exists())
+        archived = ArchivedVideoRoom.objects.get(pk=room.pk)
+        self.assertEqual(archived.participant_ids, [room.created_by_id])
+        self.assertEqual(list(ArchivedChatMessage.objects.values_list('message', flat=True)), ['anyone?'])
@@ -2,89 +2,36 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib import messages
 from django.http import JsonResponse
-from django.db.models import Q
 from django.utils import timezone
 from .models import VideoRoom, RoomParticipant, ChatMessage, UserPreferences, User
 import uuid
-from django.db import models
+from django.urls import reverse
 
-import random
 from accounts.views import jwt_auth
+from . import matchmaking, stats
 from django.views.decorators.http import require_GET, require_POST
 
 @jwt_auth
 def lobby(request):
     """Enhanced lobby with statistics"""
-    current_room = VideoRoom.objects.filter(
-        participants=request.user,
-        status__in=['waiting', 'active'],
-        roomparticipant__left_at__isnull=True
-    ).first()
-
-    stats = {
-        'online_users': VideoRoom.objects.filter(
-            status__in=['waiting', 'active']
-        ).aggregate(count=models.Count('participants'))['count'] or 0,
-        'active_chats': VideoRoom.objects.filter(status='active').count(),
-        'waiting_users': VideoRoom.objects.filter(status='waiting').count(),
-    }
+    current_room = matchmaking.current_room(request.user)
 
     context = {
         'current_room': current_room,
-        'stats': stats,
+        'stats': stats.snapshot(),
     }
     return render(request, 'videocall/lobby.html', context)
 
 @jwt_auth
 def find_random_chat(request):
-    """Enhanced random matching algorithm"""
-    existing_room = VideoRoom.objects.filter(
-        participants=request.user,
-        status__in=['waiting', 'active'],
-        roomparticipant__left_at__isnull=True
-    ).first()
-
-    if existing_room:
-        return redirect('videocall:room', room_id=existing_room.id)
-
-    preferences, created = UserPreferences.objects.get_or_create(user=request.user)
-
-    available_rooms = VideoRoom.objects.filter(
-        room_type='random',
-        status='waiting',
-        is_active=True
-    ).exclude(participants=request.user)
-
-    if preferences.location_based_matching and request.user.location:
-        available_rooms = available_rooms.filter(
-            Q(location_filter=request.user.location) | Q(location_filter='')
-        )
-
-    if available_rooms.exists():
-        matched_room = random.choice(available_rooms)
-        RoomParticipant.objects.create(user=request.user, room=matched_room)
-        matched_room.status = 'active'
-        matched_room.save()
-        return JsonResponse({
-            'status': 'matched',
-            'room_id': str(matched_room.id),
-            'redirect_url': f'/video/room/{matched_room.id}/'
-        })
-    else:
-        new_room = VideoRoom.objects.create(
-            name="Random Chat",
-            created_by=request.user,
-            room_type='random',
-            location_filter=request.user.location or '',
-            max_participants=2,
-            status='waiting'
-        )
-        RoomParticipant.objects.create(user=request.user, room=new_room, is_host=True)
-        return JsonResponse({
-            'status': 'waiting',
-            'room_id': str(new_room.id),
-            'redirect_url': f'/video/room/{new_room.id}/'
-        })
+    """Pair with a waiting partner or join the matchmaking queue"""
+    # find_match hands back a room the user is already in, checked under its lock.
+    room, matched = matchmaking.find_match(request.user)
+    return JsonResponse({
+        'status': 'matched' if matched else 'waiting',
+        'room_id': str(room.id),
+        'redirect_url': reverse('videocall:room', args=[room.id])
+    })
 
 @jwt_auth
 def room(request, room_id):
@@ -133,8 +80,11 @@ def skip_chat(request, room_id):
             room.ended_at = timezone.now()
             room.save()
         elif room.current_participants_count == 1:
-            room.status = 'waiting'
-            room.save()
+            if room.room_type == 'random':
+                matchmaking.requeue(room)
+            else:
+                room.status = 'waiting'
+                room.created_at = timezone.now()  # the reaper's waiting TTL starts over
         room.skip_count += 1
         room.save()
 
@@ -166,8 +116,7 @@ def preferences(request):
     """User chat preferences"""
     preferences, created = UserPreferences.objects.get_or_create(user=request.user)
     if request.method == 'POST':
-        interests = request.POST.getlist('interests')
-        preferences.interests = interests
+        preferences.interests = matchmaking.clean_interests(request.POST.getlist('interests'))
         preferences.preferred_age_min = int(request.POST.get('age_min', 18))
         preferences.preferred_age_max = int(request.POST.get('age_max', 100))
         preferences.location_based_matching = bool(request.POST.get('location_based'))
@@ -196,17 +145,6 @@ def room_status_api(request, room_id):
 @require_POST
 def find_match_api(request):
     """Finds or creates a random match"""
-    existing = VideoRoom.objects.filter(
-        participants=request.user,
-        status__in=['waiting', 'active'],
-        roomparticipant__left_at__isnull=True
-    ).first()
-    if existing:
-        return JsonResponse({
-            "status": "matched",
-            "room_id": str(existing.id),
-            "redirect_url": f"/video/room/{existing.id}/"
-        })
     return find_random_chat(request)
 
 